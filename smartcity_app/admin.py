@@ -5,7 +5,9 @@ from .models import (
     MoistureSensor, Room, Boiler, Facility, AirSensor, SOSColumn,
     EcoViolation, ConstructionMission, ConstructionSite, LightROI,
     LightPole, Bus, ResponsibleOrg, CallRequest, CallRequestTimeline,
-    Notification, ReportEntry, UtilityNode, DeviceHealth, IoTDevice
+    Notification, ReportEntry, UtilityNode, DeviceHealth, IoTDevice,
+    ReportEntryAggregate, SyncChange, ModelVersion, VehicleTrackPoint,
+    BusRoute, BusStop, VehicleTrackChunk, CallRequestBand, FaceEmbedding, ConstructionObservation
 )
 
 # Import Room separately to avoid admin issues
@@ -102,6 +104,13 @@ class ConstructionSiteAdmin(admin.ModelAdmin):
     search_fields = ['name', 'id']
 
 
+@admin.register(ConstructionObservation)
+class ConstructionObservationAdmin(admin.ModelAdmin):
+    list_display = ['id', 'site', 'observed_at', 'stage', 'progress', 'confidence']
+    list_filter = ['stage']
+    search_fields = ['site__name', 'site__id']
+
+
 @admin.register(LightPole)
 class LightPoleAdmin(admin.ModelAdmin):
     list_display = ['id', 'address', 'status', 'luminance']
@@ -118,8 +127,8 @@ class BusAdmin(admin.ModelAdmin):
 
 @admin.register(CallRequest)
 class CallRequestAdmin(admin.ModelAdmin):
-    list_display = ['id', 'citizen_name', 'category', 'status', 'timestamp']
-    list_filter = ['status', 'category', 'timestamp']
+    list_display = ['id', 'citizen_name', 'category', 'status', 'responsible_org', 'duplicate_of', 'timestamp']
+    list_filter = ['status', 'category', 'responsible_org', 'timestamp']
     search_fields = ['citizen_name', 'category', 'id']
 
 
@@ -219,9 +228,9 @@ class CallRequestTimelineAdmin(admin.ModelAdmin):
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
-    list_display = ['id', 'title', 'user', 'type', 'read', 'timestamp']
+    list_display = ['id', 'title', 'user', 'type', 'read', 'occurrences', 'timestamp']
     list_filter = ['type', 'read', 'timestamp']
-    search_fields = ['title', 'user__username', 'id']
+    search_fields = ['title', 'user__username', 'id', 'dedup_key']
 
 
 @admin.register(ReportEntry)
@@ -231,6 +240,54 @@ class ReportEntryAdmin(admin.ModelAdmin):
     search_fields = ['location_name', 'metric_label', 'id']
 
 
+@admin.register(ReportEntryAggregate)
+class ReportEntryAggregateAdmin(admin.ModelAdmin):
+    list_display = ['day', 'mfy', 'category', 'status', 'entry_count']
+    list_filter = ['status', 'category', 'day']
+    search_fields = ['mfy', 'category']
+
+
+@admin.register(SyncChange)
+class SyncChangeAdmin(admin.ModelAdmin):
+    list_display = ['seq', 'model', 'object_id', 'organization_id', 'deleted', 'timestamp']
+    list_filter = ['model', 'deleted']
+    search_fields = ['object_id']
+
+
+@admin.register(ModelVersion)
+class ModelVersionAdmin(admin.ModelAdmin):
+    list_display = ['model', 'version', 'updated_at']
+    search_fields = ['model']
+
+
+class BusStopInline(admin.TabularInline):
+    model = BusStop
+    extra = 0
+    readonly_fields = ['travel_seconds_mean', 'travel_seconds_std', 'travel_samples']
+
+
+@admin.register(BusRoute)
+class BusRouteAdmin(admin.ModelAdmin):
+    list_display = ['route_number', 'name', 'stats_updated_at']
+    search_fields = ['route_number', 'name']
+    inlines = [BusStopInline]
+
+
+@admin.register(VehicleTrackPoint)
+class VehicleTrackPointAdmin(admin.ModelAdmin):
+    list_display = ['id', 'vehicle_type', 'vehicle_id', 'timestamp', 'lat', 'lng', 'speed']
+    list_filter = ['vehicle_type']
+    search_fields = ['vehicle_id']
+
+
+@admin.register(VehicleTrackChunk)
+class VehicleTrackChunkAdmin(admin.ModelAdmin):
+    list_display = ['id', 'vehicle_type', 'vehicle_id', 'hour', 'point_count', 'raw_point_count']
+    list_filter = ['vehicle_type']
+    search_fields = ['vehicle_id']
+    exclude = ['data']
+
+
 @admin.register(UtilityNode)
 class UtilityNodeAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'type', 'mfy', 'status', 'load', 'capacity', 'active_tickets']
@@ -242,4 +299,17 @@ class UtilityNodeAdmin(admin.ModelAdmin):
 class IoTDeviceAdmin(admin.ModelAdmin):
     list_display = ['id', 'device_id', 'device_type', 'is_active', 'last_seen', 'room', 'boiler', 'current_temperature', 'current_humidity']
     list_filter = ['device_type', 'is_active']
-    search_fields = ['device_id', 'id']
\ No newline at end of file
+    search_fields = ['device_id', 'id']
+
+
+@admin.register(CallRequestBand)
+class CallRequestBandAdmin(admin.ModelAdmin):
+    list_display = ['id', 'call_request', 'band', 'created_at']
+    search_fields = ['call_request__id']
+
+
+@admin.register(FaceEmbedding)
+class FaceEmbeddingAdmin(admin.ModelAdmin):
+    list_display = ['id', 'violation']
+    search_fields = ['violation__id']
+    exclude = ['vector']
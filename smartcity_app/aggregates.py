@@ -0,0 +1,119 @@
+"""
+Incrementally maintained ReportEntry aggregation cube.
+
+Every ReportEntry insert/update/delete adjusts a single counter row keyed by
+(day, mfy, category, status), so dashboards can read summary rows instead
+of scanning the full ReportEntry table.
+"""
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from . import versioning
+from .models import ReportEntry, ReportEntryAggregate
+
+AGGREGATE_DIMENSIONS = ('day', 'mfy', 'category', 'status')
+
+
+def aggregate_key(timestamp, mfy, category, status):
+    if timezone.is_aware(timestamp):
+        timestamp = timezone.localtime(timestamp)
+    return (timestamp.date(), mfy, category, status)
+
+
+def entry_key(entry):
+    return aggregate_key(entry.timestamp, entry.mfy, entry.category, entry.status)
+
+
+def apply_delta(key, delta):
+    """
+    Add ``delta`` to the counter row for ``key``, creating it when needed
+    """
+    day, mfy, category, status = key
+    lookup = {'day': day, 'mfy': mfy, 'category': category, 'status': status}
+
+    with transaction.atomic():
+        updated = ReportEntryAggregate.objects.filter(**lookup).update(entry_count=F('entry_count') + delta)
+        if delta < 0:
+            # Drop cells that no longer count anything
+            ReportEntryAggregate.objects.filter(entry_count__lte=0, **lookup).delete()
+            return
+        if updated:
+            return
+        try:
+            with transaction.atomic():
+                ReportEntryAggregate.objects.create(entry_count=delta, **lookup)
+        except IntegrityError:
+            # Another writer created the row first
+            ReportEntryAggregate.objects.filter(**lookup).update(entry_count=F('entry_count') + delta)
+
+
+def rebuild(start=None, end=None):
+    """
+    Recompute the cube from ReportEntry, optionally for a day range only.
+    Returns the number of aggregate rows written.
+    """
+    entries = ReportEntry.objects.all()
+    aggregates = ReportEntryAggregate.objects.all()
+    if start:
+        entries = entries.filter(timestamp__date__gte=start)
+        aggregates = aggregates.filter(day__gte=start)
+    if end:
+        entries = entries.filter(timestamp__date__lte=end)
+        aggregates = aggregates.filter(day__lte=end)
+
+    rows = (
+        entries.annotate(day=TruncDate('timestamp'))
+        .values('day', 'mfy', 'category', 'status')
+        .annotate(entry_count=Count('id'))
+        .order_by()
+    )
+
+    with transaction.atomic():
+        aggregates.delete()
+        objs = [ReportEntryAggregate(**row) for row in rows.iterator()]
+        ReportEntryAggregate.objects.bulk_create(objs, batch_size=1000)
+        # The aggregates endpoint is versioned on ReportEntry; refresh its ETags
+        versioning.bump_version(ReportEntry)
+    return len(objs)
+
+
+def _day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise ValueError(f"Invalid '{name}': expected YYYY-MM-DD")
+    return day
+
+
+def slice_aggregates(params):
+    """
+    Filter the cube by day range / mfy / category / status and roll it up
+    to the dimensions listed in ``group_by`` (comma separated).
+    """
+    group_by = [d.strip() for d in params.get('group_by', ','.join(AGGREGATE_DIMENSIONS)).split(',') if d.strip()]
+    invalid = [d for d in group_by if d not in AGGREGATE_DIMENSIONS]
+    if invalid:
+        raise ValueError(f"Invalid group_by dimension(s): {', '.join(invalid)}")
+
+    start, end = _day(params, 'start'), _day(params, 'end')
+    queryset = ReportEntryAggregate.objects.all()
+    if start:
+        queryset = queryset.filter(day__gte=start)
+    if end:
+        queryset = queryset.filter(day__lte=end)
+    for dimension in ('mfy', 'category', 'status'):
+        if params.get(dimension):
+            queryset = queryset.filter(**{dimension: params[dimension]})
+
+    if group_by:
+        return queryset.values(*group_by).annotate(total=Sum('entry_count')).order_by(*group_by)
+    return {'total': queryset.aggregate(total=Sum('entry_count'))['total'] or 0}
@@ -0,0 +1,209 @@
+"""
+Streaming alert rules for Room and Boiler readings.
+
+Every sensor reading is checked as it arrives against the room or boiler
+the device measures:
+
+- threshold: humidity deviating from target_humidity by more than
+  ALERT_HUMIDITY_WARNING_DELTA / ALERT_HUMIDITY_CRITICAL_DELTA points;
+- anomaly: a humidity or temperature z-score of ALERT_ZSCORE or more
+  against the entity's exponentially weighted mean and variance;
+- rate of change: humidity or temperature moving faster per minute than
+  ALERT_MAX_RATE.
+
+Statistics are updated in O(1) per reading and never re-read history. The
+most severe rule sets the entity status (OPTIMAL/WARNING/CRITICAL); when it
+changes, the status is written through the write-behind buffer and
+operators are notified. Statistics live in the worker process and start
+over after a restart (anomaly checks wait for ALERT_MIN_SAMPLES readings).
+"""
+
+import threading
+
+from django.conf import settings
+from django.utils import timezone
+
+from .iot_buffer import get_buffer
+from .notifications import Message, notify_operators
+
+SEVERITY = {'OPTIMAL': 0, 'WARNING': 1, 'CRITICAL': 2}
+METRICS = ('humidity', 'temperature')
+METRIC_NAMES = {'humidity': 'namlik', 'temperature': 'harorat'}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class RunningStats:
+    """Exponentially weighted mean and variance, updated in O(1)"""
+
+    __slots__ = ('alpha', 'count', 'mean', 'variance', 'last_value', 'last_time')
+
+    def __init__(self, alpha):
+        self.alpha = alpha
+        self.count = 0
+        self.mean = 0.0
+        self.variance = 0.0
+        self.last_value = None
+        self.last_time = None
+
+    def zscore(self, value):
+        if self.variance <= 0:
+            return 0.0
+        return (value - self.mean) / self.variance ** 0.5
+
+    def rate_per_minute(self, value, seen_at):
+        if self.last_time is None:
+            return 0.0
+        minutes = (seen_at - self.last_time).total_seconds() / 60
+        if minutes <= 0:
+            return 0.0
+        return (value - self.last_value) / minutes
+
+    def add(self, value, seen_at):
+        self.count += 1
+        if self.count == 1:
+            self.mean = value
+        else:
+            diff = value - self.mean
+            increment = self.alpha * diff
+            self.mean += increment
+            self.variance = (1 - self.alpha) * (self.variance + diff * increment)
+        self.last_value = value
+        self.last_time = seen_at
+
+
+class EntityState:
+    __slots__ = ('status', 'threshold_level', 'stats')
+
+    def __init__(self, status, alpha):
+        self.status = status if status in SEVERITY else 'OPTIMAL'
+        self.threshold_level = 'OPTIMAL'
+        self.stats = {metric: RunningStats(alpha) for metric in METRICS}
+
+
+class AlertEngine:
+    def __init__(self, warning_delta=10.0, critical_delta=20.0, hysteresis=2.0, zscore=3.0,
+                 min_samples=10, alpha=0.1, max_rate=None):
+        self.warning_delta = warning_delta
+        self.critical_delta = critical_delta
+        self.hysteresis = hysteresis
+        self.zscore = zscore
+        self.min_samples = min_samples
+        self.alpha = alpha
+        self.max_rate = max_rate or {'humidity': 5.0, 'temperature': 2.0}
+        self._lock = threading.Lock()
+        self._states = {}  # (model name, pk) -> EntityState
+
+    def _threshold_level(self, deviation, previous):
+        # A level is left only once the deviation is ``hysteresis`` points
+        # inside its band, so a reading hovering on a boundary does not flap
+        critical = self.critical_delta - (self.hysteresis if previous == 'CRITICAL' else 0)
+        warning = self.warning_delta - (self.hysteresis if previous != 'OPTIMAL' else 0)
+        if deviation > critical:
+            return 'CRITICAL'
+        if deviation > warning:
+            return 'WARNING'
+        return 'OPTIMAL'
+
+    def evaluate(self, entity, readings, seen_at):
+        """
+        Check ``readings`` ({metric: value}) of a Room or Boiler and update
+        its statistics. Returns ``(previous status, new status, reasons)``.
+        """
+        key = (type(entity).__name__, str(entity.pk))
+        reasons = []
+        with self._lock:
+            state = self._states.get(key)
+            if state is None:
+                state = self._states[key] = EntityState(entity.status, self.alpha)
+
+            level = 'OPTIMAL'
+            humidity = readings.get('humidity')
+            if humidity is not None and entity.target_humidity is not None:
+                deviation = abs(humidity - entity.target_humidity)
+                state.threshold_level = self._threshold_level(deviation, state.threshold_level)
+                if state.threshold_level != 'OPTIMAL':
+                    level = state.threshold_level
+                    reasons.append(f"namlik {humidity:g}% (me'yor {entity.target_humidity:g}%)")
+
+            for metric, value in readings.items():
+                stats = state.stats[metric]
+                name = METRIC_NAMES[metric]
+                if stats.count >= self.min_samples:
+                    z = stats.zscore(value)
+                    if abs(z) >= self.zscore:
+                        reasons.append(f"{name} odatiy emas: {value:g} (o'rtacha {stats.mean:.1f}, z={z:.1f})")
+                rate = stats.rate_per_minute(value, seen_at)
+                if abs(rate) > self.max_rate[metric]:
+                    reasons.append(f"{name} tez o'zgarmoqda: {rate:+.1f}/daq")
+                stats.add(value, seen_at)
+
+            if reasons and level == 'OPTIMAL':
+                level = 'WARNING'
+            previous, state.status = state.status, level
+        return previous, level, reasons
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = AlertEngine(
+                warning_delta=_setting('ALERT_HUMIDITY_WARNING_DELTA', 10.0),
+                critical_delta=_setting('ALERT_HUMIDITY_CRITICAL_DELTA', 20.0),
+                hysteresis=_setting('ALERT_HYSTERESIS', 2.0),
+                zscore=_setting('ALERT_ZSCORE', 3.0),
+                min_samples=_setting('ALERT_MIN_SAMPLES', 10),
+                alpha=_setting('ALERT_EWMA_ALPHA', 0.1),
+                max_rate=_setting('ALERT_MAX_RATE', None),
+            )
+        return _engine
+
+
+def _to_float(value):
+    if value in (None, ''):
+        return None
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def check_reading(device, temperature, humidity, seen_at=None):
+    """
+    Run the alert rules for a reading of ``device`` (with its room and
+    boiler loaded); returns the new status of the entity, or None if the
+    device is not linked to one
+    """
+    entity = device.room if device.room_id else device.boiler if device.boiler_id else None
+    if entity is None:
+        return None
+
+    readings = {
+        metric: value
+        for metric, value in (('humidity', _to_float(humidity)), ('temperature', _to_float(temperature)))
+        if value is not None
+    }
+    if not readings:
+        return entity.status
+
+    seen_at = seen_at or timezone.now()
+    previous, status, reasons = get_engine().evaluate(entity, readings, seen_at)
+    if status == previous:
+        return status
+
+    get_buffer().update(type(entity), entity.pk, {'status': status})
+    # One key per entity: a flapping status updates the unread alert instead of adding rows
+    dedup_key = f'status:{type(entity).__name__}:{entity.pk}'
+    if status == 'OPTIMAL':
+        message = Message(f"{entity.name}: me'yorga qaytdi", f"{entity.name} ko'rsatkichlari me'yorda", 'INFO', dedup_key)
+    else:
+        message = Message(f"{entity.name}: {status}", '; '.join(reasons), status, dedup_key)
+    notify_operators([message])
+    return status
@@ -9,12 +9,40 @@ class SmartcityAppConfig(AppConfig):
     name = 'smartcity_app'
 
     def ready(self):
-        # Start the background task to analyze waste bins every 30 minutes
+        # Register model signal receivers
+        from . import signals  # noqa: F401
+
         from django.conf import settings
+        if settings.REFERENCE_CACHE_WARM_ON_STARTUP:
+            # Warm on the first request a process serves rather than here:
+            # management commands (migrate, check, tests) never query for it
+            from django.core.signals import request_started
+            request_started.connect(self.start_reference_cache_warm_up, dispatch_uid='reference_cache_warm_up')
+
+        # Start the background task to analyze waste bins every 30 minutes
         if settings.DEBUG:  # Only run in development
             thread = threading.Thread(target=self.run_periodic_analysis, daemon=True)
             thread.start()
 
+    def start_reference_cache_warm_up(self, **kwargs):
+        from django.core.signals import request_started
+        # Only the first request of the process starts it
+        if request_started.disconnect(dispatch_uid='reference_cache_warm_up'):
+            threading.Thread(target=self.warm_reference_cache, daemon=True).start()
+
+    def warm_reference_cache(self):
+        """Pre-render the reference data lists"""
+        from django.db import DatabaseError, connection
+        from . import refcache
+
+        try:
+            refcache.warm()
+        except DatabaseError as e:
+            # e.g. migrations not applied yet
+            print(f"Reference cache warm-up skipped: {e}")
+        finally:
+            connection.close()
+
     def run_periodic_analysis(self):
         """Run waste bin analysis every 30 minutes"""
         import time
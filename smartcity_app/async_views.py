@@ -0,0 +1,174 @@
+"""
+Async views for endpoints that mostly wait on other services (image
+download, Google AI). Under ASGI the wait happens on the event loop, so a
+slow analysis no longer occupies a worker thread; only the short database
+reads and writes run in a thread via sync_to_async.
+
+DRF views are synchronous, so these are plain Django async views that
+authenticate with the DRF authentication classes and answer with the same
+JSON shapes as their synchronous counterparts.
+"""
+
+import base64
+import functools
+import json
+
+import httpx
+from asgiref.sync import sync_to_async
+from django.core.exceptions import ValidationError
+from django.http import HttpResponse, HttpResponseNotAllowed
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, NotAuthenticated
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from .bin_analysis import (
+    AI_HEADERS, AI_REQUEST_TIMEOUT, IMAGE_DOWNLOAD_TIMEOUT, apply_analysis,
+    build_analysis_request, error_result, no_api_key_result, parse_analysis_response
+)
+from .models import WasteBin
+from .serializers import WasteBinSerializer
+from .streaming import json_encoder
+
+
+def _json_response(data, status=status.HTTP_200_OK):
+    return HttpResponse(json_encoder().encode(data), content_type='application/json', status=status)
+
+
+def _authenticate(request):
+    """
+    Authenticate with the configured DRF authentication classes (token,
+    session) and return ``(user, organization_id)``. Raises APIException.
+    """
+    drf_request = Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+    if not drf_request.user or not drf_request.user.is_authenticated:
+        raise NotAuthenticated()
+    return drf_request.user, request.session.get('organization_id')
+
+
+def async_api_view(http_method_names):
+    """
+    Async analogue of DRF's @api_view for plain async views: restricts the
+    HTTP methods, exempts from Django's CSRF middleware (session-authenticated
+    requests are CSRF-checked by DRF's SessionAuthentication instead) and
+    requires an authenticated user. Sets ``request.user`` and
+    ``request.organization_id`` for the view.
+    """
+    def decorator(view_func):
+        @functools.wraps(view_func)
+        async def wrapper(request, *args, **kwargs):
+            if request.method not in http_method_names:
+                return HttpResponseNotAllowed(http_method_names)
+            try:
+                request.user, request.organization_id = await sync_to_async(_authenticate)(request)
+            except APIException as exc:
+                return _json_response({'error': str(exc.detail)}, status=exc.status_code)
+            return await view_func(request, *args, **kwargs)
+        wrapper.csrf_exempt = True
+        return wrapper
+    return decorator
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except json.JSONDecodeError:
+            return None
+    return request.POST
+
+
+async def download_image_base64(client, image_url):
+    """Download an image and return it base64 encoded, or None if it is unavailable"""
+    response = await client.get(image_url, timeout=IMAGE_DOWNLOAD_TIMEOUT, follow_redirects=True)
+    if response.status_code != 200:
+        return None
+    return base64.b64encode(response.content).decode('utf-8')
+
+
+async def analyze_bin_image_async(client, base64_image):
+    """
+    Async counterpart of views.analyze_bin_image_backend
+    """
+    ai_request = build_analysis_request(base64_image)
+    if ai_request is None:
+        return no_api_key_result()
+    ai_url, ai_payload = ai_request
+
+    try:
+        response = await client.post(ai_url, headers=AI_HEADERS, json=ai_payload, timeout=AI_REQUEST_TIMEOUT)
+        body = response.json() if response.status_code == 200 else {}
+        return parse_analysis_response(response.status_code, body, response.text)
+    except Exception as e:
+        # If any error occurs, return default values
+        return error_result(e)
+
+
+@async_api_view(['POST'])
+async def update_bin_with_camera_image_async(request, pk):
+    """
+    Async version of update_bin_with_camera_image: update a waste bin with a
+    camera image and AI analysis
+    """
+    try:
+        bin = await WasteBin.objects.aget(pk=pk)
+    except (WasteBin.DoesNotExist, ValidationError):
+        return _json_response({'error': 'Waste bin not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Check if user has permission to access this bin
+    org_id = request.organization_id
+    if org_id and str(bin.organization_id) != org_id:
+        return _json_response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    data = _request_data(request)
+    if data is None:
+        return _json_response({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+    image_data = data.get('image_url', None)
+    if image_data:
+        bin.image_url = image_data
+        bin.image_source = data.get('image_source', 'CCTV')
+        bin.last_analysis = data.get('last_analysis', f'Kamera tahlili {timezone.now().strftime("%Y-%m-%d %H:%M:%S")}')
+
+        try:
+            async with httpx.AsyncClient() as client:
+                image_base64 = await download_image_base64(client, image_data)
+                if image_base64:
+                    apply_analysis(bin, await analyze_bin_image_async(client, image_base64))
+        except Exception as e:
+            # If AI analysis fails, log the error but continue with existing values
+            print(f"AI analysis failed: {e}")
+
+        await bin.asave()
+
+    data = await sync_to_async(lambda: WasteBinSerializer(bin).data)()
+    return _json_response(data)
+
+
+@async_api_view(['POST'])
+async def analyze_bin_image(request):
+    """
+    Analyze a waste bin image with AI without updating any bin.
+    Accepts ``image_base64`` or ``image_url``.
+    """
+    data = _request_data(request)
+    if data is None:
+        return _json_response({'error': 'Invalid JSON'}, status=status.HTTP_400_BAD_REQUEST)
+
+    image_base64 = data.get('image_base64')
+    image_url = data.get('image_url')
+    if not image_base64 and not image_url:
+        return _json_response({'error': 'image_base64 or image_url is required'}, status=status.HTTP_400_BAD_REQUEST)
+
+    async with httpx.AsyncClient() as client:
+        if not image_base64:
+            try:
+                image_base64 = await download_image_base64(client, image_url)
+            except httpx.HTTPError as e:
+                return _json_response({'error': f'Image download failed: {e}'}, status=status.HTTP_502_BAD_GATEWAY)
+            if not image_base64:
+                return _json_response({'error': 'Image could not be downloaded'}, status=status.HTTP_502_BAD_GATEWAY)
+        result = await analyze_bin_image_async(client, image_base64)
+
+    return _json_response(result)
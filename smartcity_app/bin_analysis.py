@@ -0,0 +1,125 @@
+"""
+Waste bin image analysis with Google Gemini.
+
+Builds the request and interprets the response independently of the HTTP
+client, so the blocking view (requests) and the async views (httpx) share
+the same prompt and the same fallback values.
+"""
+
+import json
+import os
+import re
+
+GEMINI_URL = 'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent?key={api_key}'
+
+# Seconds to wait for the image download and the AI service
+IMAGE_DOWNLOAD_TIMEOUT = float(os.getenv('IMAGE_DOWNLOAD_TIMEOUT', '15'))
+AI_REQUEST_TIMEOUT = float(os.getenv('AI_REQUEST_TIMEOUT', '60'))
+
+ANALYSIS_PROMPT = '''Siz tajriboli atrof-muhitni kuzatuv tizimi ekspertisiz. Rasmni tahlil qiling va quyidagilarni aniqlang:
+    1. Rasmda chiqindi konteyneri bormi? Javob: HA yoki YO'Q.
+    2. Agar HA bo'lsa, konteyner to'la bo'limi? Javob: HA yoki YO'Q.
+    3. Agar HA bo'lsa, to'ldirish darajasini % (0-100) ko'rsating.
+    4. Rasm sifatini baholang (yaxshi, o'rtacha, yomon).
+
+    Javobni quyidagi JSON formatda bering:
+    {
+        "isFull": boolean,
+        "fillLevel": number (0 dan 100 gacha foiz),
+        "confidence": number (O'z qaroringga ishonch darajasi 0-100),
+        "notes": string (Qisqa izoh o'zbek tilida: Masalan "Konteyner toshib ketgan" yoki "Yarmi bo'sh")
+    }
+    '''
+
+AI_HEADERS = {
+    'Content-Type': 'application/json',
+}
+
+
+def analysis_result(is_full, fill_level, confidence, notes):
+    return {
+        'isFull': is_full,
+        'fillLevel': fill_level,
+        'confidence': confidence,
+        'notes': notes,
+    }
+
+
+def build_analysis_request(base64_image):
+    """
+    Return ``(url, payload)`` for the AI request, or None when no API key is configured
+    """
+    api_key = os.getenv('GEMINI_API_KEY', 'YOUR_API_KEY_HERE')
+    if api_key == 'YOUR_API_KEY_HERE':
+        return None
+
+    payload = {
+        'contents': [{
+            'parts': [
+                {'text': ANALYSIS_PROMPT},
+                {
+                    'inlineData': {
+                        'mimeType': 'image/jpeg',
+                        'data': base64_image
+                    }
+                }
+            ]
+        }]
+    }
+    return GEMINI_URL.format(api_key=api_key), payload
+
+
+def no_api_key_result():
+    # If no API key is set, return a basic response
+    return analysis_result(True, 90, 70, 'API kaliti ornatilmagan, oddiy tahlil amalga oshirildi')
+
+
+def error_result(error):
+    print(f"AI analysis error: {error}")
+    return analysis_result(True, 50, 25, f'AI tahlilida xatolik yuz berdi: {str(error)}')
+
+
+def parse_analysis_response(status_code, body, text=''):
+    """
+    Turn the AI service response (status code, decoded JSON body, raw text)
+    into an analysis result, falling back to default values on any problem
+    """
+    if status_code != 200:
+        print(f"AI API request failed: {status_code}, {text}")
+        return analysis_result(True, 60, 30, f'AI tahlilida xatolik: {status_code}')
+
+    candidates = body.get('candidates') or []
+    if candidates:
+        content = candidates[0].get('content') or {}
+        for part in content.get('parts', []):
+            if 'text' not in part:
+                continue
+            text_content = part['text'].strip()
+
+            # Remove any markdown code block markers
+            if text_content.startswith('```'):
+                json_match = re.search(r'\{.*\}', text_content, re.DOTALL)
+                if not json_match:
+                    return analysis_result(True, 80, 60, 'Tahlil natijasini tahlil qilishda xatolik yuz berdi')
+                text_content = json_match.group()
+
+            try:
+                ai_result = json.loads(text_content)
+            except json.JSONDecodeError:
+                return analysis_result(True, 75, 50, 'JSON javobini tahlil qilishda xatolik yuz berdi')
+            return analysis_result(
+                ai_result.get('isFull', False),
+                ai_result.get('fillLevel', 50),
+                ai_result.get('confidence', 50),
+                ai_result.get('notes', 'AI tahlili tugadi'),
+            )
+
+    # If no candidates found, return default values
+    return analysis_result(True, 70, 40, 'AI javob topilmadi')
+
+
+def apply_analysis(bin, ai_result):
+    """Update bin status and last analysis text from an analysis result"""
+    bin.fill_level = ai_result['fillLevel']
+    bin.is_full = ai_result['isFull']
+    bin.last_analysis = f"AI tahlili: {ai_result['notes']}, IsFull: {ai_result['isFull']}, FillLevel: {ai_result['fillLevel']}%, Conf: {ai_result['confidence']}%"
@@ -0,0 +1,356 @@
+"""
+Bus ETA and delay estimation per route.
+
+A BusRoute has ordered BusStops. For every stop, build_route_stats learns
+the typical travel time from the previous stop (arrival to arrival) from
+the track history (compacted chunks and raw points, see track_store.py);
+stops without history fall back to the distance at BUS_DEFAULT_SPEED_KMH.
+
+Every BUS_ETA_TICK_SECONDS the engine takes the live positions of all
+buses from the telemetry store and, per route, places all of its buses on
+the route at once with numpy: the segment a bus is on is the one whose
+two stops it is least out of the way between, and the fraction covered
+follows from the distances to both stops. ETAs to every stop ahead are the
+remaining part of the segment plus the cumulative typical times.
+
+Delay is the sum of how much longer than typical each completed segment
+of the current trip took, plus the overrun on the current one. Buses more
+than BUS_DELAY_SECONDS late are set DELAYED, others ON_TIME (SOS and
+STOPPED are left alone); next_stop is kept current as well. Statuses are
+written with one bulk_update per tick.
+
+The engine thread runs in the workers that ingest telemetry. Any worker
+can answer ETA requests: when its ETAs are older than a tick it refreshes
+them on the spot from the positions persisted by all workers (without
+writing statuses, which stay with the engine thread).
+"""
+
+import threading
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .bus_telemetry import get_store
+from .models import Bus, BusRoute, BusStop
+from .signals import bulk_saved
+from .track_store import densify, replay
+from .versioning import current_versions
+
+EARTH_RADIUS_METERS = 6371000.0
+MANAGED_STATUSES = ('ON_TIME', 'DELAYED')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def distance_matrix(lat1, lng1, lat2, lng2):
+    """Haversine distances in meters between every point of set 1 (rows) and set 2 (columns)"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(values, dtype=float)) for values in (lat1, lng1, lat2, lng2))
+    dlat = lat2[None, :] - lat1[:, None]
+    dlng = lng2[None, :] - lng1[:, None]
+    a = np.sin(dlat / 2) ** 2 + np.cos(lat1)[:, None] * np.cos(lat2)[None, :] * np.sin(dlng / 2) ** 2
+    return 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+class RouteModel:
+    """Stop coordinates and typical segment times of one route as arrays"""
+
+    def __init__(self, route, stops, default_speed_kmh):
+        self.route_number = route.route_number
+        self.names = [stop.name for stop in stops]
+        self.sequences = [stop.sequence for stop in stops]
+        self.lat = np.array([stop.lat for stop in stops], dtype=float)
+        self.lng = np.array([stop.lng for stop in stops], dtype=float)
+        # segment_length[k] / segment_seconds[k]: from stop k-1 to stop k (0 for the first stop)
+        self.segment_length = np.zeros(len(stops))
+        if len(stops) > 1:
+            self.segment_length[1:] = np.diagonal(distance_matrix(self.lat[:-1], self.lng[:-1], self.lat[1:], self.lng[1:]))
+        fallback = self.segment_length / (default_speed_kmh / 3.6)
+        learned = np.array([stop.travel_seconds_mean if stop.travel_seconds_mean else np.nan for stop in stops])
+        self.segment_seconds = np.where(np.isnan(learned), fallback, learned)
+        self.segment_seconds[0] = 0.0
+        self.cumulative_seconds = np.cumsum(self.segment_seconds)
+
+    def locate(self, lat, lng):
+        """
+        Place buses on the route. Returns ``(next stop index, fraction of
+        that segment covered, meters off the route)`` arrays.
+        """
+        distances = distance_matrix(lat, lng, self.lat, self.lng)
+        # How much longer going through the bus is than the segment itself
+        detour = distances[:, :-1] + distances[:, 1:] - self.segment_length[None, 1:]
+        segment = np.argmin(detour, axis=1)
+        rows = np.arange(len(segment))
+        before = distances[rows, segment]
+        after = distances[rows, segment + 1]
+        fraction = np.where(before + after > 0, before / np.maximum(before + after, 1e-9), 0.0)
+        return segment + 1, fraction, detour[rows, segment] / 2
+
+    def etas(self, next_stop, fraction):
+        """Seconds from each bus to every stop; NaN for stops already passed"""
+        remaining = (1 - fraction) * self.segment_seconds[next_stop]
+        seconds = remaining[:, None] + self.cumulative_seconds[None, :] - self.cumulative_seconds[next_stop][:, None]
+        passed = np.arange(len(self.lat))[None, :] < next_stop[:, None]
+        return np.where(passed, np.nan, seconds)
+
+
+class TripProgress:
+    __slots__ = ('route_number', 'next_stop', 'passed_at', 'carried_delay')
+
+    def __init__(self, route_number, next_stop):
+        self.route_number = route_number
+        self.next_stop = next_stop
+        self.passed_at = None
+        self.carried_delay = 0.0
+
+
+class EtaEngine:
+    def __init__(self, tick_seconds=30, delay_seconds=180, off_route_meters=300, stale_seconds=300,
+                 default_speed_kmh=20):
+        self.tick_seconds = tick_seconds
+        self.delay_seconds = delay_seconds
+        self.off_route_meters = off_route_meters
+        self.stale_seconds = stale_seconds
+        self.default_speed_kmh = default_speed_kmh
+        self._lock = threading.Lock()
+        self._routes = {}  # route_number -> RouteModel
+        self._routes_version = None
+        self._progress = {}  # bus id -> TripProgress
+        self._etas = {}  # bus id -> ETA payload of the last tick
+        self._computed_at = None
+        self._tick_lock = threading.Lock()
+        self._thread = None
+
+    def _load_routes(self):
+        versions = current_versions((BusRoute, BusStop))
+        if versions == self._routes_version:
+            return
+        routes = {}
+        for route in BusRoute.objects.prefetch_related('stops'):
+            stops = sorted(route.stops.all(), key=lambda stop: stop.sequence)
+            if len(stops) >= 2:
+                routes[route.route_number] = RouteModel(route, stops, self.default_speed_kmh)
+        self._routes, self._routes_version = routes, versions
+
+    def _advance(self, bus_id, route_number, next_stop, seen_at, model):
+        """Update the trip progress of a bus; returns it"""
+        progress = self._progress.get(bus_id)
+        if progress is None or progress.route_number != route_number or next_stop < progress.next_stop:
+            # First sighting, another route, or a new trip
+            progress = self._progress[bus_id] = TripProgress(route_number, next_stop)
+        elif next_stop > progress.next_stop:
+            if progress.passed_at is not None and next_stop == progress.next_stop + 1:
+                took = (seen_at - progress.passed_at).total_seconds()
+                progress.carried_delay += took - model.segment_seconds[progress.next_stop]
+            progress.next_stop = next_stop
+            progress.passed_at = seen_at
+        return progress
+
+    def tick(self, now=None, save=True):
+        """Refresh ETAs and statuses of all buses; returns the number of status changes"""
+        with self._tick_lock:
+            return self._tick(now or timezone.now(), save)
+
+    def _tick(self, now, save):
+        store = get_store()
+        # Positions persisted by other workers
+        store.refresh()
+        self._load_routes()
+
+        by_route = {}
+        for bus_id, route_number, status, lat, lng, updated_at in store.positions():
+            if route_number in self._routes and (now - updated_at).total_seconds() <= self.stale_seconds:
+                by_route.setdefault(route_number, []).append((bus_id, status, lat, lng, updated_at))
+
+        etas = {}
+        changes = {}  # bus id -> (status, next stop name)
+        with self._lock:
+            for route_number, buses in by_route.items():
+                model = self._routes[route_number]
+                lat = np.array([bus[2] for bus in buses])
+                lng = np.array([bus[3] for bus in buses])
+                next_stop, fraction, off_route = model.locate(lat, lng)
+                seconds = model.etas(next_stop, fraction)
+
+                for row, (bus_id, status, _, _, updated_at) in enumerate(buses):
+                    if off_route[row] > self.off_route_meters:
+                        continue
+                    index = int(next_stop[row])
+                    progress = self._advance(bus_id, route_number, index, updated_at, model)
+                    delay = progress.carried_delay
+                    if progress.passed_at is not None:
+                        elapsed = (updated_at - progress.passed_at).total_seconds()
+                        delay += max(elapsed - fraction[row] * model.segment_seconds[index], 0.0)
+
+                    etas[bus_id] = {
+                        'bus_id': bus_id,
+                        'route_number': route_number,
+                        'next_stop': model.names[index],
+                        'delay_seconds': round(delay),
+                        'computed_at': now,
+                        'stops': [
+                            {
+                                'sequence': model.sequences[k],
+                                'name': model.names[k],
+                                'seconds': round(float(seconds[row, k])),
+                                'eta': updated_at + timedelta(seconds=float(seconds[row, k])),
+                            }
+                            for k in range(index, len(model.names))
+                        ],
+                    }
+                    if status in MANAGED_STATUSES:
+                        new_status = 'DELAYED' if delay > self.delay_seconds else 'ON_TIME'
+                        changes[bus_id] = (new_status, model.names[index])
+            self._etas = etas
+            self._computed_at = now
+            # Forget buses that stopped reporting
+            for bus_id in set(self._progress) - set(etas):
+                del self._progress[bus_id]
+
+        return self._save(changes, store) if save else 0
+
+    def _refresh_if_stale(self):
+        computed_at = self._computed_at
+        if computed_at is None or (timezone.now() - computed_at).total_seconds() > self.tick_seconds:
+            self.tick(save=False)
+
+    def _save(self, changes, store):
+        if not changes:
+            return 0
+        current = Bus.objects.filter(pk__in=list(changes)).values_list('pk', 'status', 'next_stop')
+        updated = [
+            Bus(pk=pk, status=changes[str(pk)][0], next_stop=changes[str(pk)][1])
+            for pk, status, next_stop in current
+            if status in MANAGED_STATUSES and (status, next_stop) != changes[str(pk)]
+        ]
+        if not updated:
+            return 0
+        with transaction.atomic():
+            Bus.objects.bulk_update(updated, ['status', 'next_stop'], batch_size=500)
+            bulk_saved(Bus, updated)
+        for bus in updated:
+            store.set_status(bus.pk, bus.status)
+        return len(updated)
+
+    def eta(self, bus_id):
+        self._refresh_if_stale()
+        return self._etas.get(str(bus_id))
+
+    def route_etas(self, route_number):
+        self._refresh_if_stale()
+        return [eta for eta in self._etas.values() if eta['route_number'] == route_number]
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='bus-eta', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        stop = threading.Event()
+        while True:
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Bus ETA refresh failed: {e}")
+            stop.wait(self.tick_seconds)
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = EtaEngine(
+                tick_seconds=_setting('BUS_ETA_TICK_SECONDS', 30),
+                delay_seconds=_setting('BUS_DELAY_SECONDS', 180),
+                off_route_meters=_setting('BUS_OFF_ROUTE_METERS', 300),
+                stale_seconds=_setting('BUS_ETA_STALE_SECONDS', 300),
+                default_speed_kmh=_setting('BUS_DEFAULT_SPEED_KMH', 20),
+            )
+        return _engine
+
+
+# Learning segment times from the track history
+
+def stop_visits(timestamps, lat, lng, model, radius):
+    """
+    ``[(stop index, arrival time)]`` of one vehicle's track (sorted by
+    time): the first point of every run of points within ``radius`` of a
+    stop
+    """
+    if not len(timestamps):
+        return []
+    distances = distance_matrix(lat, lng, model.lat, model.lng)
+    nearest = np.argmin(distances, axis=1)
+    near = distances[np.arange(len(nearest)), nearest] <= radius
+    stop = np.where(near, nearest, -1)
+    starts = np.flatnonzero(near & np.concatenate(([True], stop[1:] != stop[:-1])))
+    return [(int(stop[i]), timestamps[i]) for i in starts]
+
+
+def segment_samples(visits, max_seconds):
+    """Travel times ``{stop index: [seconds]}`` between consecutive stops of the visits"""
+    samples = {}
+    for (previous, left_at), (current, arrived_at) in zip(visits, visits[1:]):
+        if current == previous + 1:
+            seconds = (arrived_at - left_at).total_seconds()
+            if 0 < seconds <= max_seconds:
+                samples.setdefault(current, []).append(seconds)
+    return samples
+
+
+def build_route_stats(days=14, radius=None, max_segment_seconds=3600):
+    """
+    Learn the travel time between consecutive stops of every route from the
+    last ``days`` of bus tracks. Returns ``{route_number: segments learned}``.
+    """
+    radius = radius or _setting('BUS_STOP_RADIUS_METERS', 50)
+    now = timezone.now()
+    since = now - timedelta(days=days)
+    default_speed = _setting('BUS_DEFAULT_SPEED_KMH', 20)
+    result = {}
+
+    for route in BusRoute.objects.prefetch_related('stops'):
+        stops = sorted(route.stops.all(), key=lambda stop: stop.sequence)
+        if len(stops) < 2:
+            continue
+        model = RouteModel(route, stops, default_speed)
+        samples = {}
+        bus_ids = Bus.objects.filter(route_number=route.route_number).values_list('pk', flat=True)
+        for bus_id in bus_ids:
+            points = replay('BUS', bus_id, since, now)
+            if not points:
+                continue
+            # Simplified runs past a stop may have no point within the radius of it
+            seconds, lat, lng = densify(points, radius / 2, max_segment_seconds)
+            visits = [
+                (index, datetime.fromtimestamp(arrived_at, tz=dt_timezone.utc))
+                for index, arrived_at in stop_visits(seconds, lat, lng, model, radius)
+            ]
+            for index, values in segment_samples(visits, max_segment_seconds).items():
+                samples.setdefault(index, []).extend(values)
+
+        for index, stop in enumerate(stops):
+            values = np.array(samples.get(index, []))
+            if len(values):
+                # Drop trips interrupted on the way (breakdowns, end of shift)
+                values = values[values <= 3 * np.median(values)]
+            stop.travel_samples = len(values)
+            stop.travel_seconds_mean = float(values.mean()) if len(values) else None
+            stop.travel_seconds_std = float(values.std()) if len(values) else None
+        with transaction.atomic():
+            BusStop.objects.bulk_update(stops, ['travel_seconds_mean', 'travel_seconds_std', 'travel_samples'])
+            bulk_saved(BusStop, stops)
+            route.stats_updated_at = timezone.now()
+            route.save(update_fields=['stats_updated_at'])
+        result[route.route_number] = sum(1 for stop in stops if stop.travel_samples)
+    return result
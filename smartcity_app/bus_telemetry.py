@@ -0,0 +1,350 @@
+"""
+Live bus telemetry.
+
+Trackers post readings (position, bearing, speed, rpm, engine and fuel
+data, passengers) to buses/telemetry/. Readings only update a compact
+in-memory state per bus and are queued as track points; every
+BUS_TELEMETRY_FLUSH_SECONDS a background thread persists the latest state
+of the buses that moved (one bulk_update each for Bus and Coordinate) and
+appends the queued VehicleTrackPoint rows with one bulk insert. Readings
+of the last interval are lost if the process crashes.
+
+The live map (buses/live/) is served from memory: the JSON body is
+rendered once per change and reused, without touching the database.
+Each flush also pulls in the readings other worker processes persisted
+(Bus.last_telemetry_at), so every worker's live map is at most one
+interval behind.
+"""
+
+import atexit
+import threading
+from datetime import datetime, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Bus, Coordinate, VehicleTrackPoint
+from .signals import bulk_saved
+from .streaming import json_encoder
+
+TELEMETRY_FIELDS = ('bearing', 'speed', 'rpm', 'engine_temp', 'fuel_level', 'passengers')
+
+
+class TelemetryError(ValueError):
+    """Raised for an invalid tracker reading"""
+
+
+class BusState:
+    __slots__ = (
+        'id', 'location_id', 'route_number', 'plate_number', 'status', 'lat', 'lng',
+        'bearing', 'speed', 'rpm', 'engine_temp', 'fuel_level', 'passengers', 'updated_at', 'dirty',
+    )
+
+    def __init__(self, bus):
+        self.id = str(bus.pk)
+        self.location_id = bus.location_id
+        self.lat = bus.location.lat
+        self.lng = bus.location.lng
+        for name in TELEMETRY_FIELDS:
+            setattr(self, name, getattr(bus, name))
+        self.updated_at = bus.last_telemetry_at
+        self.dirty = False
+        self.set_details(bus)
+
+    def set_details(self, bus):
+        self.route_number = bus.route_number
+        self.plate_number = bus.plate_number
+        self.status = bus.status
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'route_number': self.route_number,
+            'plate_number': self.plate_number,
+            'status': self.status,
+            'location': {'lat': self.lat, 'lng': self.lng},
+            'bearing': self.bearing,
+            'speed': self.speed,
+            'rpm': self.rpm,
+            'engine_temp': self.engine_temp,
+            'fuel_level': self.fuel_level,
+            'passengers': self.passengers,
+            'updated_at': self.updated_at,
+        }
+
+
+def _parse_reading(reading):
+    """Validate a tracker reading; returns (bus id, timestamp, {field: value})"""
+    if not isinstance(reading, dict):
+        raise TelemetryError('Each reading must be an object')
+    bus_id = reading.get('bus_id')
+    if not bus_id:
+        raise TelemetryError('bus_id is required')
+
+    values = {}
+    for name in ('lat', 'lng') + TELEMETRY_FIELDS:
+        value = reading.get(name)
+        if value in (None, ''):
+            if name in ('lat', 'lng'):
+                raise TelemetryError(f'{name} is required')
+            continue
+        try:
+            values[name] = int(value) if name == 'passengers' else float(value)
+        except (TypeError, ValueError):
+            raise TelemetryError(f'{name} must be a number')
+    if not (-90 <= values['lat'] <= 90 and -180 <= values['lng'] <= 180):
+        raise TelemetryError('lat/lng out of range')
+
+    timestamp = reading.get('timestamp')
+    if timestamp in (None, ''):
+        seen_at = timezone.now()
+    else:
+        try:
+            seen_at = datetime.fromtimestamp(float(timestamp), tz=dt_timezone.utc)
+        except (TypeError, ValueError, OverflowError, OSError):
+            raise TelemetryError('timestamp must be a Unix timestamp')
+    return str(bus_id), seen_at, values
+
+
+class BusTelemetryStore:
+    def __init__(self, flush_interval=5.0):
+        self.flush_interval = flush_interval
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._states = {}  # bus id -> BusState
+        self._track = []  # VehicleTrackPoint rows not written yet
+        self._loaded = False
+        self._synced_until = None  # newest last_telemetry_at seen in the database
+        self._version = 0
+        self._rendered = (None, b'[]')
+        self._thread = None
+
+    def _load(self):
+        if self._loaded:
+            return
+        buses = list(Bus.objects.select_related('location'))
+        with self._lock:
+            if self._loaded:
+                return
+            for bus in buses:
+                self._states[str(bus.pk)] = BusState(bus)
+            self._synced_until = max((bus.last_telemetry_at for bus in buses if bus.last_telemetry_at), default=None)
+            self._loaded = True
+            self._version += 1
+
+    def _state(self, bus_id):
+        state = self._states.get(bus_id)
+        if state is None:
+            # A bus created after the store was loaded
+            bus = Bus.objects.select_related('location').filter(pk=bus_id).first()
+            if bus is None:
+                return None
+            with self._lock:
+                state = self._states.setdefault(bus_id, BusState(bus))
+        return state
+
+    def ingest(self, readings):
+        """
+        Apply tracker readings to the live state. Returns
+        ``(accepted count, [{'index', 'error'}])``.
+        """
+        self._load()
+        accepted = 0
+        errors = []
+        for index, reading in enumerate(readings):
+            try:
+                bus_id, seen_at, values = _parse_reading(reading)
+                state = self._state(bus_id)
+            except TelemetryError as e:
+                errors.append({'index': index, 'error': str(e)})
+                continue
+            except ValidationError:
+                state = None  # malformed id
+            if state is None:
+                errors.append({'index': index, 'error': f'Bus with ID {reading.get("bus_id")} not found'})
+                continue
+
+            with self._lock:
+                self._track.append(VehicleTrackPoint(
+                    vehicle_type='BUS', vehicle_id=state.id, timestamp=seen_at,
+                    lat=values['lat'], lng=values['lng'],
+                    speed=values.get('speed'), bearing=values.get('bearing'),
+                ))
+                # Late or replayed readings only extend the track
+                if state.updated_at is None or seen_at >= state.updated_at:
+                    for name, value in values.items():
+                        setattr(state, name, value)
+                    state.updated_at = seen_at
+                    state.dirty = True
+                    self._version += 1
+            accepted += 1
+
+        if accepted:
+            self._ensure_started()
+        return accepted, errors
+
+    def live_json(self):
+        """The live map as JSON bytes, rendered once per change"""
+        self._load()
+        version, body = self._rendered
+        if version == self._version:
+            return body
+        with self._lock:
+            version = self._version
+            data = [state.as_dict() for state in self._states.values()]
+        body = json_encoder().encode(data).encode('utf-8')
+        self._rendered = (version, body)
+        return body
+
+    def set_details(self, bus):
+        """Keep route, plate and status current after a Bus is saved through the API"""
+        with self._lock:
+            state = self._states.get(str(bus.pk))
+            if state is not None:
+                state.set_details(bus)
+                self._version += 1
+
+    def set_status(self, bus_id, status):
+        with self._lock:
+            state = self._states.get(str(bus_id))
+            if state is not None and state.status != status:
+                state.status = status
+                self._version += 1
+
+    def positions(self):
+        """``[(id, route_number, status, lat, lng, updated_at)]`` of every bus that has reported"""
+        self._load()
+        with self._lock:
+            return [
+                (state.id, state.route_number, state.status, state.lat, state.lng, state.updated_at)
+                for state in self._states.values() if state.updated_at is not None
+            ]
+
+    def remove(self, bus_id):
+        with self._lock:
+            if self._states.pop(str(bus_id), None) is not None:
+                self._version += 1
+
+    def flush(self):
+        """Persist changed bus states and queued track points; returns (buses, points) written"""
+        with self._flush_lock:
+            with self._lock:
+                dirty = [state for state in self._states.values() if state.dirty]
+                snapshot = [
+                    (state.id, state.location_id, state.lat, state.lng, state.updated_at,
+                     {name: getattr(state, name) for name in TELEMETRY_FIELDS})
+                    for state in dirty
+                ]
+                for state in dirty:
+                    state.dirty = False
+                track, self._track = self._track, []
+
+            try:
+                self._write(snapshot, track)
+            except Exception:
+                with self._lock:
+                    for state in dirty:
+                        state.dirty = True
+                    self._track[:0] = track
+                raise
+            self._pull()
+            return len(snapshot), len(track)
+
+    def _write(self, snapshot, track):
+        if not snapshot and not track:
+            return
+        buses = []
+        locations = []
+        for bus_id, location_id, lat, lng, updated_at, values in snapshot:
+            buses.append(Bus(pk=bus_id, last_telemetry_at=updated_at, **values))
+            locations.append(Coordinate(pk=location_id, lat=lat, lng=lng))
+
+        with transaction.atomic():
+            if buses:
+                Bus.objects.bulk_update(buses, list(TELEMETRY_FIELDS) + ['last_telemetry_at'], batch_size=500)
+                Coordinate.objects.bulk_update(locations, ['lat', 'lng'], batch_size=500)
+                # Bus responses are versioned on Bus too; not bumping Coordinate
+                # keeps the ETags of bins, trucks and other located objects
+                bulk_saved(Bus, buses)
+            if track:
+                VehicleTrackPoint.objects.bulk_create(track, batch_size=1000)
+        if buses:
+            newest = max(updated_at for _, _, _, _, updated_at, _ in snapshot)
+            with self._lock:
+                if self._synced_until is None or newest > self._synced_until:
+                    self._synced_until = newest
+
+    def refresh(self):
+        """Load the state if needed and apply readings other processes persisted"""
+        self._load()
+        with self._flush_lock:
+            self._pull()
+
+    def _pull(self):
+        """Apply readings other processes persisted since the last flush"""
+        if not self._loaded:
+            return
+        buses = Bus.objects.select_related('location')
+        if self._synced_until is not None:
+            buses = buses.filter(last_telemetry_at__gt=self._synced_until)
+        else:
+            buses = buses.filter(last_telemetry_at__isnull=False)
+        with self._lock:
+            for bus in buses:
+                state = self._states.get(str(bus.pk))
+                if state is None:
+                    self._states[str(bus.pk)] = BusState(bus)
+                elif not state.dirty and (state.updated_at is None or bus.last_telemetry_at > state.updated_at):
+                    state.lat, state.lng = bus.location.lat, bus.location.lng
+                    for name in TELEMETRY_FIELDS:
+                        setattr(state, name, getattr(bus, name))
+                    state.updated_at = bus.last_telemetry_at
+                else:
+                    continue
+                self._version += 1
+                if self._synced_until is None or bus.last_telemetry_at > self._synced_until:
+                    self._synced_until = bus.last_telemetry_at
+
+    # Background flushing
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='bus-telemetry', daemon=True)
+        self._thread.start()
+        atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        stop = threading.Event()
+        while True:
+            stop.wait(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Bus telemetry flush failed: {e}")
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"Bus telemetry flush at exit failed: {e}")
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = BusTelemetryStore(flush_interval=getattr(settings, 'BUS_TELEMETRY_FLUSH_SECONDS', 5.0))
+        return _store
+
+
+def loaded_store():
+    """The store if this process has loaded it, else None"""
+    return _store if _store is not None and _store._loaded else None
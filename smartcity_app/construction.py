@@ -0,0 +1,180 @@
+"""
+Construction site history and mission delay prediction.
+
+Every save of a ConstructionSite that changes its AI readings
+(current_ai_stage, overall_progress, ai_confidence, detected_objects)
+appends a ConstructionObservation, so the readings are kept over time
+instead of only the last one. Rows are packed into small integers (see
+the model); detected object kinds other than workers, cranes and trucks
+are not kept.
+
+``predict_delays()`` checks every unfinished mission of every site in one
+pass: one query each for the sites, their mission links and the missions,
+one grouped query for the first time each site was seen in each stage and
+one bulk_update.
+
+- A site's pace is the average time per stage so far: from start_date to
+  the first observation of its current stage, divided by the stages
+  before it (CONSTRUCTION_DEFAULT_STAGE_DAYS while in the first stage).
+- A mission's stage is predicted to end when the site has gone through
+  the stages up to and including it at that pace. Time already spent in
+  the current stage counts, and a stage running over is assumed to end
+  no sooner than now.
+- A mission is DELAYED when its deadline has passed or its predicted end
+  is more than CONSTRUCTION_DELAY_GRACE_DAYS after the deadline. Otherwise
+  it is IN_PROGRESS while the site is in its stage and COMPLETED once the
+  site is past it; a DELAYED mission back on schedule before its stage
+  becomes PENDING again. A mission shared by several sites takes the latest
+  prediction.
+
+Run it with the predict_construction_delays command (e.g. from cron).
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Min
+from django.utils import timezone
+
+from .models import ConstructionMission, ConstructionObservation, ConstructionSite
+from .signals import bulk_saved
+
+STAGES = [stage for stage, _ in ConstructionMission.CONSTRUCTION_STAGE_CHOICES]
+STAGE_INDEX = {stage: index for index, stage in enumerate(STAGES)}
+OBSERVED_FIELDS = ('current_ai_stage', 'overall_progress', 'ai_confidence', 'detected_objects')
+DETECTED_KINDS = ('workers', 'cranes', 'trucks')
+SMALL_INT_MAX = 32767
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def _clamp(value, high=SMALL_INT_MAX):
+    try:
+        return max(0, min(int(round(float(value))), high))
+    except (TypeError, ValueError):
+        return 0
+
+
+def observation(site, observed_at=None):
+    """An unsaved ConstructionObservation of the site's current readings"""
+    detected = site.detected_objects if isinstance(site.detected_objects, dict) else {}
+    return ConstructionObservation(
+        site=site,
+        observed_at=observed_at or timezone.now(),
+        stage=STAGE_INDEX.get(site.current_ai_stage, 0),
+        progress=_clamp((site.overall_progress or 0) * 10, 1000),
+        confidence=_clamp((site.ai_confidence or 0) * 1000, 1000),
+        **{kind: _clamp(detected.get(kind)) for kind in DETECTED_KINDS},
+    )
+
+
+def decode(row):
+    """The readings of an observation in the units of ConstructionSite"""
+    return {
+        'observed_at': row.observed_at,
+        'current_ai_stage': STAGES[row.stage] if row.stage < len(STAGES) else None,
+        'overall_progress': row.progress / 10,
+        'ai_confidence': row.confidence / 1000,
+        'detected_objects': {kind: getattr(row, kind) for kind in DETECTED_KINDS},
+    }
+
+
+def record(sites, observed_at=None):
+    """Append one observation per site; returns them"""
+    rows = ConstructionObservation.objects.bulk_create(
+        [observation(site, observed_at) for site in sites], batch_size=1000)
+    bulk_saved(ConstructionObservation, rows)
+    return rows
+
+
+def readings_changed(site, previous):
+    """Whether ``previous`` (values of OBSERVED_FIELDS) differs from the site's readings"""
+    return previous is None or any(getattr(site, field) != previous[field] for field in OBSERVED_FIELDS)
+
+
+# Delay prediction
+
+def _stage_entries(site_ids):
+    """``{site id: {stage index: first observed_at}}``"""
+    entries = {}
+    rows = (
+        ConstructionObservation.objects.filter(site_id__in=site_ids)
+        .values_list('site_id', 'stage').annotate(first=Min('observed_at')).order_by()
+    )
+    for site_id, stage, first in rows:
+        entries.setdefault(site_id, {})[stage] = first
+    return entries
+
+
+def stage_end(site, entered, target, now, default_stage):
+    """When the site is expected to finish stage ``target`` (an index)"""
+    current = STAGE_INDEX.get(site.current_ai_stage, 0)
+    per_stage = (entered - site.start_date) / current if current and entered > site.start_date else default_stage
+    # The current stage ends a full stage after it began, but not before now
+    current_end = max(entered + per_stage, now)
+    return current_end + per_stage * (target - current)
+
+
+def predict_delays(now=None):
+    """
+    Update status and predicted_completion of the unfinished missions of
+    all sites; returns ``{'missions': checked, 'updated': n, 'delayed': n}``
+    """
+    now = now or timezone.now()
+    default_stage = timedelta(days=_setting('CONSTRUCTION_DEFAULT_STAGE_DAYS', 30))
+    grace = timedelta(days=_setting('CONSTRUCTION_DELAY_GRACE_DAYS', 3))
+
+    sites = {site.pk: site for site in ConstructionSite.objects.only('id', 'start_date', 'current_ai_stage')}
+    links = ConstructionSite.missions.through.objects.filter(
+        constructionmission__status__in=('PENDING', 'IN_PROGRESS', 'DELAYED'),
+    ).values_list('constructionsite_id', 'constructionmission_id')
+    sites_of = {}
+    for site_id, mission_id in links:
+        sites_of.setdefault(mission_id, []).append(site_id)
+    missions = list(ConstructionMission.objects.filter(pk__in=list(sites_of)))
+    entries = _stage_entries(list({site_id for ids in sites_of.values() for site_id in ids}))
+
+    changed = []
+    delayed = 0
+    for mission in missions:
+        target = STAGE_INDEX.get(mission.stage_type, 0)
+        predicted = None  # stays None when every site is past the stage
+        in_stage = False
+        for site_id in sites_of[mission.pk]:
+            site = sites[site_id]
+            current = STAGE_INDEX.get(site.current_ai_stage, 0)
+            if current > target:
+                continue
+            in_stage = in_stage or current == target
+            entered = entries.get(site_id, {}).get(current, now)
+            end = stage_end(site, entered, target, now, default_stage)
+            predicted = end if predicted is None else max(predicted, end)
+
+        if predicted is None:
+            new_status = 'COMPLETED'
+        elif mission.deadline < now or predicted > mission.deadline + grace:
+            new_status = 'DELAYED'
+        elif in_stage:
+            new_status = 'IN_PROGRESS'
+        else:
+            new_status = 'PENDING' if mission.status == 'DELAYED' else mission.status
+        if new_status == 'DELAYED':
+            delayed += 1
+
+        moved = (predicted is None) != (mission.predicted_completion is None) or (
+            predicted is not None and abs(predicted - mission.predicted_completion) >= timedelta(hours=1))
+        if new_status != mission.status or moved:
+            mission.status = new_status
+            mission.predicted_completion = predicted
+            if new_status == 'COMPLETED':
+                mission.progress = 100.0
+            changed.append(mission)
+
+    with transaction.atomic():
+        ConstructionMission.objects.bulk_update(
+            changed, ['status', 'predicted_completion', 'progress'], batch_size=500)
+        bulk_saved(ConstructionMission, changed)
+    return {'missions': len(missions), 'updated': len(changed), 'delayed': delayed}
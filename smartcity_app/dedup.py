@@ -0,0 +1,242 @@
+"""
+Near-duplicate detection of call requests.
+
+Citizens call repeatedly about the same outage. Each new request is
+linked to the canonical request of its incident (duplicate_of) when an
+open request of the last CALL_DEDUP_WINDOW_HOURS:
+
+- has a transcript with a character 5-gram Jaccard similarity of at least
+  CALL_DEDUP_THRESHOLD, and
+- is in the same mfy, with a similar address when both have one.
+
+Candidates are found with MinHash LSH instead of comparing against every
+recent request: a transcript's 128 MinHash values are cut into 32 bands
+of 4, every band is hashed into a CallRequestBand row, and requests
+sharing a band value are candidates (one indexed lookup). With 32x4
+bands, pairs from a similarity of about 0.4 are almost always caught.
+The 20 candidates sharing the most bands are then checked exactly, so
+the cost per request does not grow with the number of recent requests.
+
+Dedup runs at the start of every triage batch. Dispatch skips
+duplicates; resolving or closing the canonical request closes its open
+duplicates too. Bands older than the window are deleted as batches run.
+"""
+
+import hashlib
+import threading
+import time
+from collections import Counter
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import DateTimeField, F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .dispatch import move_load
+from .models import CallRequest, CallRequestBand
+from .signals import bulk_saved
+from .sla import DONE_STATUSES, OPEN_STATUSES
+from .triage import tokenize
+
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+SHINGLE = 5
+PRIME = 4294967311  # smallest prime above 2**32
+
+# Fixed seed: band values are stored, so every process must hash alike
+_rng = np.random.default_rng(20240611)
+_A = _rng.integers(1, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_B = _rng.integers(0, 2 ** 32, size=NUM_PERM, dtype=np.uint64)
+_EMPTY = np.full(NUM_PERM, PRIME, dtype=np.uint64)
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def shingles(text):
+    """Character 5-grams of the normalized words of ``text``"""
+    normalized = ' '.join(tokenize(text))
+    if len(normalized) <= SHINGLE:
+        return {normalized} if normalized else set()
+    return {normalized[i:i + SHINGLE] for i in range(len(normalized) - SHINGLE + 1)}
+
+
+def jaccard(first, second):
+    if not first or not second:
+        return 0.0
+    return len(first & second) / len(first | second)
+
+
+def signature(shingle_set):
+    """MinHash signature (NUM_PERM uint64 values) of a set of shingles"""
+    if not shingle_set:
+        return _EMPTY
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+         for shingle in shingle_set),
+        dtype=np.uint64, count=len(shingle_set),
+    )
+    # (a * x + b) mod p stays below 2**64 since a, b, x < 2**32
+    return ((_A[:, None] * hashes[None, :] + _B[:, None]) % PRIME).min(axis=1)
+
+
+def bands(sig):
+    """The BANDS signed 64-bit band values of a signature"""
+    values = []
+    for band in range(BANDS):
+        digest = hashlib.blake2b(sig[band * ROWS:(band + 1) * ROWS].tobytes(), digest_size=8,
+                                 person=band.to_bytes(2, 'little')).digest()
+        values.append(int.from_bytes(digest, 'little', signed=True))
+    return values
+
+
+def _address_words(call_request):
+    return set(tokenize(call_request.address)) if call_request.address else set()
+
+
+def same_place(first, second, address_threshold=0.5):
+    """Same mfy, and similar addresses when both are known"""
+    if first.mfy and second.mfy and first.mfy.strip().lower() != second.mfy.strip().lower():
+        return False
+    first_words, second_words = _address_words(first), _address_words(second)
+    if first_words and second_words:
+        return jaccard(first_words, second_words) >= address_threshold
+    return True
+
+
+class DedupIndex:
+    """Links a batch of new requests to earlier ones through the band table"""
+
+    def __init__(self, threshold=0.5, window_hours=72, max_candidates=20):
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        self.window = timedelta(hours=window_hours)
+        self._last_prune = 0.0
+        self._prune_lock = threading.Lock()
+
+    def link_batch(self, call_requests, now=None):
+        """
+        Set duplicate_of of the near-duplicates among ``call_requests``
+        (new requests, oldest first) and index all of them. Returns the
+        requests that were linked; saving them is up to the caller.
+        """
+        now = now or timezone.now()
+        if not call_requests:
+            return []
+        prepared = []
+        wanted = set()
+        for call_request in call_requests:
+            shingle_set = shingles(call_request.transcript)
+            band_values = bands(signature(shingle_set)) if shingle_set else []
+            prepared.append((call_request, shingle_set, band_values))
+            wanted.update(band_values)
+
+        # Earlier open requests of the batch's mfys sharing a band, in one query
+        since = now - self.window
+        bands_found = CallRequestBand.objects.filter(
+            band__in=list(wanted), created_at__gte=since, call_request__status__in=OPEN_STATUSES,
+        )
+        mfys = {call_request.mfy for call_request in call_requests}
+        if '' not in mfys:
+            bands_found = bands_found.filter(Q(call_request__mfy__in=mfys) | Q(call_request__mfy=''))
+        matches = {}
+        for band, call_request_id in bands_found.values_list('band', 'call_request_id'):
+            matches.setdefault(band, []).append(str(call_request_id))
+
+        shortlists = [self._shortlist(matches, band_values) for _, _, band_values in prepared]
+        known = {
+            str(candidate.pk): candidate
+            for candidate in CallRequest.objects.filter(pk__in=set().union(*shortlists))
+            .only('id', 'transcript', 'mfy', 'address', 'duplicate_of_id', 'timestamp')
+        }
+        shingle_cache = {}
+        batch_matches = {}  # band -> ids of this batch's requests seen so far
+
+        linked = []
+        rows = []
+        for (call_request, shingle_set, band_values), candidates in zip(prepared, shortlists):
+            candidates = candidates + self._shortlist(batch_matches, band_values)
+            best, best_score = None, self.threshold
+            for candidate_id in candidates:
+                candidate = known.get(candidate_id)
+                if candidate is None or candidate_id == str(call_request.pk) or candidate.timestamp > call_request.timestamp:
+                    continue
+                if not same_place(call_request, candidate):
+                    continue
+                if candidate_id not in shingle_cache:
+                    shingle_cache[candidate_id] = shingles(candidate.transcript)
+                score = jaccard(shingle_set, shingle_cache[candidate_id])
+                if score >= best_score:
+                    best, best_score = candidate, score
+            if best is not None and call_request.duplicate_of_id is None:
+                call_request.duplicate_of_id = best.duplicate_of_id or best.pk
+                linked.append(call_request)
+
+            # Later requests of the batch can match this one
+            for band in band_values:
+                batch_matches.setdefault(band, []).append(str(call_request.pk))
+            known[str(call_request.pk)] = call_request
+            shingle_cache[str(call_request.pk)] = shingle_set
+            rows.extend(CallRequestBand(call_request=call_request, band=band, created_at=now) for band in band_values)
+
+        CallRequestBand.objects.bulk_create(rows, batch_size=1000)
+        self._maybe_prune(now)
+        return linked
+
+    def _shortlist(self, matches, band_values):
+        # Requests sharing more bands are likelier to be similar; only the top ones are checked
+        shared = Counter()
+        for band in band_values:
+            shared.update(matches.get(band, ()))
+        return [candidate_id for candidate_id, _ in shared.most_common(self.max_candidates)]
+
+    def _maybe_prune(self, now):
+        with self._prune_lock:
+            if time.monotonic() - self._last_prune < 3600:
+                return
+            self._last_prune = time.monotonic()
+        prune(now - self.window)
+
+
+def prune(before):
+    """Delete bands created before ``before``; returns the number deleted"""
+    # Nothing listens for band rows, so this is a single DELETE
+    return CallRequestBand.objects.filter(created_at__lt=before).delete()[0]
+
+
+def close_duplicates(canonical):
+    """Give the open duplicates of a resolved or closed request its status"""
+    if canonical.status not in DONE_STATUSES:
+        return 0
+    duplicates = list(canonical.duplicates.filter(status__in=OPEN_STATUSES).only('id', 'responsible_org_id'))
+    if duplicates:
+        now = timezone.now()
+        CallRequest.objects.filter(pk__in=[row.pk for row in duplicates]).update(
+            status=canonical.status,
+            resolved_at=canonical.resolved_at or now,
+            assigned_at=Coalesce(F('assigned_at'), Value(now, output_field=DateTimeField())),
+        )
+        for duplicate in duplicates:
+            if duplicate.responsible_org_id:
+                move_load(duplicate.responsible_org_id, None)
+        bulk_saved(CallRequest, duplicates)
+    return len(duplicates)
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DedupIndex(
+                threshold=_setting('CALL_DEDUP_THRESHOLD', 0.5),
+                window_hours=_setting('CALL_DEDUP_WINDOW_HOURS', 72),
+            )
+        return _index
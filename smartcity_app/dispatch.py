@@ -0,0 +1,263 @@
+"""
+Automatic dispatch of call requests to responsible organizations.
+
+Triaged NEW requests without a responsible organization (duplicates
+excepted, see dedup.py) are assigned in
+batches of up to CALL_DISPATCH_BATCH_SIZE, right after triage in the
+triage worker (or with the dispatch_call_requests command):
+
+- eligible organizations handle the request's category (categories) and
+  have active brigades;
+- per category, a heap keyed by load per active brigade
+  (current_load / active_brigades) gives the least-loaded organization;
+  organizations within CALL_DISPATCH_LOAD_SLACK of it are equally good,
+  and among those the nearest to the request wins (when both have
+  coordinates, from one distance matrix per batch);
+- a request further than CALL_DISPATCH_MAX_DISTANCE_KM from an
+  organization is not given to it while a closer candidate exists.
+
+A batch costs one bulk_update of the requests, one UPDATE of current_load
+for all organizations it touched, and one bulk insert of timeline
+entries. current_load counts open (NEW/ASSIGNED/PROCESSING) requests; it
+goes down when a request is resolved, closed, moved or deleted (see the
+CallRequest signal receivers) and can be recomputed with
+``dispatch_call_requests --rebuild-load``.
+"""
+
+import heapq
+from datetime import timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.utils import timezone
+
+from .bus_eta import distance_matrix
+from .models import CallRequest, CallRequestTimeline, ResponsibleOrg
+from .signals import bulk_saved
+from .sla import OPEN_STATUSES
+
+TIMELINE_ACTOR = 'Dispetcher'
+DEFAULT_DEADLINE_HOURS = {
+    'HEALTH': 2, 'GAS': 4, 'ELECTRICITY': 12, 'WATER': 12, 'INTERIOR': 24, 'WASTE': 24, 'OTHER': 72,
+}
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class Candidate:
+    __slots__ = ('org', 'load', 'brigades')
+
+    def __init__(self, org):
+        self.org = org
+        self.load = org.current_load or 0.0
+        self.brigades = org.active_brigades
+
+    @property
+    def key(self):
+        return self.load / self.brigades
+
+
+class Dispatcher:
+    """Least-loaded assignment over per-category heaps of one batch"""
+
+    def __init__(self, orgs, load_slack=0.5, max_distance_km=None):
+        self.load_slack = load_slack
+        self.max_distance = max_distance_km * 1000 if max_distance_km else None
+        self.candidates = [Candidate(org) for org in orgs]
+        self._heaps = {}  # category -> [(key, index)]
+        for index, candidate in enumerate(self.candidates):
+            for category in candidate.org.categories or ():
+                self._heaps.setdefault(category, []).append((candidate.key, index))
+        for heap in self._heaps.values():
+            heapq.heapify(heap)
+        self.columns = [index for index, candidate in enumerate(self.candidates)
+                        if candidate.org.lat is not None and candidate.org.lng is not None]
+
+    def categories(self):
+        return set(self._heaps)
+
+    def distances(self, requests):
+        """Meters from each request (rows) to each located organization (columns), NaN when unknown"""
+        matrix = np.full((len(requests), len(self.candidates)), np.nan)
+        rows = [row for row, request in enumerate(requests) if request.lat is not None and request.lng is not None]
+        if rows and self.columns:
+            located = [self.candidates[index].org for index in self.columns]
+            matrix[np.ix_(rows, self.columns)] = distance_matrix(
+                [requests[row].lat for row in rows], [requests[row].lng for row in rows],
+                [org.lat for org in located], [org.lng for org in located],
+            )
+        return matrix
+
+    def _pop(self, heap):
+        # Entries are not removed when a load changes; stale ones are skipped
+        while heap:
+            key, index = heapq.heappop(heap)
+            if key == self.candidates[index].key:
+                return key, index
+        return None
+
+    def _too_far(self, distance):
+        return self.max_distance is not None and distance > self.max_distance  # False for NaN
+
+    def assign(self, category, distances):
+        """The candidate for a request of ``category``, with its load already taken; None if nobody handles it"""
+        heap = self._heaps.get(category)
+        if not heap:
+            return None
+        popped = []
+        entry = self._pop(heap)
+        while entry is not None:
+            popped.append(entry)
+            if entry[0] > popped[0][0] + self.load_slack:
+                break
+            entry = self._pop(heap)
+        if not popped:
+            return None
+        within_slack = [index for key, index in popped if key <= popped[0][0] + self.load_slack]
+
+        def rank(index):
+            distance = distances[index]
+            known = distance == distance  # not NaN
+            return (self._too_far(distance), not known, distance if known else 0.0, self.candidates[index].key)
+
+        chosen = min(within_slack, key=rank)
+        if self._too_far(distances[chosen]):
+            # Everyone close in load is too far away: take the least-loaded one in range, if any
+            if popped[-1][1] not in within_slack and not self._too_far(distances[popped[-1][1]]):
+                chosen = popped[-1][1]
+            else:
+                entry = self._pop(heap)
+                while entry is not None:
+                    popped.append(entry)
+                    if not self._too_far(distances[entry[1]]):
+                        chosen = entry[1]
+                        break
+                    entry = self._pop(heap)
+
+        for key, index in popped:
+            if index != chosen:
+                heapq.heappush(heap, (key, index))
+        candidate = self.candidates[chosen]
+        candidate.load += 1
+        # The new load goes into every heap of the organization; older entries turn stale
+        for org_category in candidate.org.categories:
+            heapq.heappush(self._heaps[org_category], (candidate.key, chosen))
+        return candidate
+
+
+def _deadline(category, now):
+    hours = _setting('CALL_DISPATCH_DEADLINE_HOURS', DEFAULT_DEADLINE_HOURS)
+    return now + timedelta(hours=hours.get(category, hours.get('OTHER', 72)))
+
+
+def dispatch_batch(limit=None):
+    """
+    Assign up to ``limit`` (default CALL_DISPATCH_BATCH_SIZE) triaged NEW
+    requests, oldest first. Returns the number assigned.
+    """
+    limit = limit or _setting('CALL_DISPATCH_BATCH_SIZE', 200)
+    now = timezone.now()
+    with transaction.atomic():
+        # Locking the organizations serializes dispatchers of other processes (PostgreSQL)
+        orgs = list(ResponsibleOrg.objects.select_for_update().filter(active_brigades__gt=0).exclude(categories=[]))
+        dispatcher = Dispatcher(
+            orgs,
+            load_slack=_setting('CALL_DISPATCH_LOAD_SLACK', 0.5),
+            max_distance_km=_setting('CALL_DISPATCH_MAX_DISTANCE_KM', 0),
+        )
+        if not dispatcher.categories():
+            return 0
+        requests = list(
+            CallRequest.objects.select_for_update(skip_locked=True)
+            .filter(status='NEW', responsible_org__isnull=True, triaged_at__isnull=False,
+                    duplicate_of__isnull=True, category__in=dispatcher.categories())
+            .order_by('timestamp')[:limit]
+        )
+        if not requests:
+            return 0
+
+        distances = dispatcher.distances(requests)
+        assigned = []
+        timeline = []
+        taken = {}  # org id -> requests assigned
+        for row, call_request in enumerate(requests):
+            candidate = dispatcher.assign(call_request.category, distances[row])
+            if candidate is None:
+                continue
+            org = candidate.org
+            call_request.responsible_org = org
+            call_request.status = 'ASSIGNED'
+            call_request.assigned_at = now
+            if call_request.deadline is None:
+                call_request.deadline = _deadline(call_request.category, now)
+            assigned.append(call_request)
+            taken[org.pk] = taken.get(org.pk, 0) + 1
+            timeline.append(CallRequestTimeline(
+                call_request=call_request, step=f"Biriktirildi: {org.name}"[:100], timestamp=now,
+                actor=TIMELINE_ACTOR, status='DONE',
+            ))
+
+        CallRequest.objects.bulk_update(
+            assigned, ['responsible_org', 'status', 'assigned_at', 'deadline'], batch_size=500)
+        _add_load(taken)
+        created = CallRequestTimeline.objects.bulk_create(timeline, batch_size=500)
+        bulk_saved(CallRequest, assigned)
+        bulk_saved(CallRequestTimeline, created)
+    return len(assigned)
+
+
+def dispatch_pending():
+    """Assign every dispatchable request; returns the number assigned"""
+    total = 0
+    while True:
+        count = dispatch_batch()
+        total += count
+        if not count:
+            return total
+
+
+def _add_load(changes):
+    """Apply ``{org id: delta}`` to current_load in one UPDATE"""
+    changes = {pk: delta for pk, delta in changes.items() if pk and delta}
+    if not changes:
+        return
+    ResponsibleOrg.objects.filter(pk__in=list(changes)).update(
+        current_load=F('current_load') + Case(
+            *(When(pk=pk, then=Value(float(delta))) for pk, delta in changes.items()),
+            output_field=FloatField(),
+        )
+    )
+    bulk_saved(ResponsibleOrg, [ResponsibleOrg(pk=pk) for pk in changes])
+
+
+def load_key(status, responsible_org_id):
+    """The organization an open request counts against, else None"""
+    return responsible_org_id if status in OPEN_STATUSES else None
+
+
+def move_load(before, after):
+    """A request stopped counting against ``before`` and counts against ``after`` (org ids or None)"""
+    if before != after:
+        changes = {}
+        if before:
+            changes[before] = -1
+        if after:
+            changes[after] = changes.get(after, 0) + 1
+        _add_load(changes)
+
+
+def rebuild_loads():
+    """Recompute current_load of every organization from its open requests; returns the number updated"""
+    orgs = list(ResponsibleOrg.objects.annotate(
+        open_requests=Count('call_requests', filter=Q(call_requests__status__in=OPEN_STATUSES)),
+    ))
+    changed = [org for org in orgs if org.current_load != org.open_requests]
+    for org in changed:
+        org.current_load = float(org.open_requests)
+    ResponsibleOrg.objects.bulk_update(changed, ['current_load'], batch_size=500)
+    bulk_saved(ResponsibleOrg, changed)
+    return len(changed)
@@ -0,0 +1,235 @@
+"""
+In-process change-event broker for the real-time push channel.
+
+Model saves publish small entity snapshots; each connected client has a
+subscription that keeps only the latest event per entity, so a bin that
+is updated ten times within one tick is delivered once. Events are
+filtered by organization: entities without an organization (IoT devices,
+rooms, boilers) go to every subscriber, superadmin subscribers (no
+organization) receive everything.
+
+The broker lives in the worker process. With several worker processes each
+one only sees the saves it performed itself, so run the event stream on a
+single process or put a shared broker behind publish().
+
+Under ASGI a stream waits on an asyncio event instead of a thread, so idle
+connections cost no worker. Streams end after EVENT_STREAM_MAX_SECONDS;
+EventSource clients reconnect on their own, and this bounds how long a
+stream whose client went away keeps running.
+"""
+
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import transaction
+
+from .streaming import json_encoder
+
+HEARTBEAT_SECONDS = 15
+
+
+def tick_seconds():
+    return getattr(settings, 'EVENT_STREAM_TICK_SECONDS', 1.0)
+
+
+def max_stream_seconds():
+    return getattr(settings, 'EVENT_STREAM_MAX_SECONDS', 300.0)
+
+
+class Subscription:
+    def __init__(self, broker, organization_id=None):
+        self.broker = broker
+        self.organization_id = str(organization_id) if organization_id else None
+        self._pending = OrderedDict()
+        self._condition = threading.Condition()
+        # (event loop, asyncio.Event) of streams waiting asynchronously
+        self._async_waiters = set()
+
+    def wants(self, organization_id):
+        return self.organization_id is None or organization_id is None or str(organization_id) == self.organization_id
+
+    def push(self, event):
+        key = (event['type'], event['id'])
+        with self._condition:
+            # Coalesce: keep only the latest state of each entity, in the
+            # position of its latest change
+            self._pending.pop(key, None)
+            self._pending[key] = event
+            self._condition.notify()
+            waiters = list(self._async_waiters)
+        for loop, ready in waiters:
+            loop.call_soon_threadsafe(ready.set)
+
+    def wait(self, timeout):
+        """Block until at least one event is pending or ``timeout`` passes"""
+        with self._condition:
+            if not self._pending:
+                self._condition.wait(timeout)
+            return bool(self._pending)
+
+    async def wait_async(self, timeout):
+        """Like wait(), without blocking a thread"""
+        waiter = (asyncio.get_running_loop(), asyncio.Event())
+        with self._condition:
+            if self._pending:
+                return True
+            self._async_waiters.add(waiter)
+        try:
+            await asyncio.wait_for(waiter[1].wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._condition:
+                self._async_waiters.discard(waiter)
+        return bool(self._pending)
+
+    def drain(self):
+        with self._condition:
+            events = list(self._pending.values())
+            self._pending.clear()
+        return events
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+
+class EventBroker:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._subscriptions = set()
+        self._sequence = itertools.count(1)
+
+    def subscribe(self, organization_id=None):
+        subscription = Subscription(self, organization_id)
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def publish(self, entity_type, entity_id, organization_id=None, data=None, deleted=False):
+        event = {
+            'seq': next(self._sequence),
+            'type': entity_type,
+            'id': str(entity_id),
+            'deleted': deleted,
+            'data': data,
+        }
+        with self._lock:
+            subscriptions = list(self._subscriptions)
+        for subscription in subscriptions:
+            if subscription.wants(organization_id):
+                subscription.push(event)
+
+
+broker = EventBroker()
+
+
+def _location(instance):
+    location = getattr(instance, 'location', None)
+    return {'lat': location.lat, 'lng': location.lng} if location else None
+
+
+# model name -> (event type, organization id getter, compact snapshot builder)
+EVENT_SNAPSHOTS = {
+    'WasteBin': ('waste_bin', lambda bin: bin.organization_id, lambda bin: {
+        'fill_level': bin.fill_level,
+        'is_full': bin.is_full,
+        'last_analysis': bin.last_analysis,
+        'image_url': bin.image_url,
+        'image_source': bin.image_source,
+    }),
+    'Truck': ('truck', lambda truck: truck.organization_id, lambda truck: {
+        'status': truck.status,
+        'fuel_level': truck.fuel_level,
+        'location': _location(truck),
+    }),
+    'IoTDevice': ('iot_device', lambda device: None, lambda device: {
+        'device_id': device.device_id,
+        'current_temperature': device.current_temperature,
+        'current_humidity': device.current_humidity,
+        'last_seen': device.last_seen.isoformat() if device.last_seen else None,
+        'is_active': device.is_active,
+        'room': device.room_id,
+        'boiler': str(device.boiler_id) if device.boiler_id else None,
+    }),
+    'Room': ('room', lambda room: None, lambda room: {
+        'humidity': room.humidity,
+        'temperature': room.temperature,
+        'status': room.status,
+    }),
+    'Boiler': ('boiler', lambda boiler: None, lambda boiler: {
+        'humidity': boiler.humidity,
+        'temperature': boiler.temperature,
+        'status': boiler.status,
+    }),
+}
+
+
+def publish_instance(instance, deleted=False):
+    """
+    Publish the change of a model instance once the surrounding transaction
+    commits. Also used by bulk code paths that bypass model signals.
+    """
+    entity_type, get_org, snapshot = EVENT_SNAPSHOTS[instance.__class__.__name__]
+    organization_id = get_org(instance)
+    data = None if deleted else snapshot(instance)
+    transaction.on_commit(
+        lambda: broker.publish(entity_type, instance.pk, organization_id, data, deleted)
+    )
+
+
+def format_sse(event):
+    return f"id: {event['seq']}\nevent: {event['type']}\ndata: {json_encoder().encode(event)}\n\n"
+
+
+def iter_event_stream(subscription):
+    """
+    Yield server-sent-event frames for ``subscription``, one batch per
+    tick, with comment heartbeats to keep idle connections open.
+    """
+    tick = tick_seconds()
+    deadline = time.monotonic() + max_stream_seconds()
+    last_flush = 0.0
+    try:
+        yield ': connected\n\n'
+        while time.monotonic() < deadline:
+            if not subscription.wait(HEARTBEAT_SECONDS):
+                yield ': heartbeat\n\n'
+                continue
+            # Let the rest of this tick's changes coalesce before sending
+            remaining = tick - (time.monotonic() - last_flush)
+            if remaining > 0:
+                time.sleep(remaining)
+            last_flush = time.monotonic()
+            yield ''.join(format_sse(event) for event in subscription.drain())
+    finally:
+        subscription.close()
+
+
+async def aiter_event_stream(subscription):
+    """
+    Async counterpart of iter_event_stream() for ASGI deployments
+    """
+    tick = tick_seconds()
+    deadline = time.monotonic() + max_stream_seconds()
+    last_flush = 0.0
+    try:
+        yield ': connected\n\n'
+        while time.monotonic() < deadline:
+            if not await subscription.wait_async(HEARTBEAT_SECONDS):
+                yield ': heartbeat\n\n'
+                continue
+            remaining = tick - (time.monotonic() - last_flush)
+            if remaining > 0:
+                await asyncio.sleep(remaining)
+            last_flush = time.monotonic()
+            yield ''.join(format_sse(event) for event in subscription.drain())
+    finally:
+        subscription.close()
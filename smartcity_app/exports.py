@@ -0,0 +1,210 @@
+"""
+Bulk CSV / NDJSON export of reporting data.
+
+Each dataset is read with ``values_list().iterator()`` so rows never get
+materialized as model instances, and output is written chunk by chunk
+(optionally gzip-compressed on the fly) to a StreamingHttpResponse.
+"""
+
+import csv
+import io
+import uuid
+from datetime import date, datetime, time, timezone as dt_timezone
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import CallRequest, EcoViolation, IoTDevice, MoistureSensor, ReportEntry
+from .streaming import IncrementalStreamingHttpResponse, json_encoder, gzip_stream
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+class ExportError(ValueError):
+    """Raised for invalid export parameters"""
+
+
+class ExportDataset:
+    """
+    Describes how one model is exported: its columns, time field and
+    which query parameters map to which filterable columns.
+    """
+
+    def __init__(self, model, fields, time_field, filters=None, extra_columns=None):
+        self.model = model
+        self.fields = fields
+        self.time_field = time_field
+        self.filters = filters or {}
+        # name -> callable(row_dict) producing a derived column
+        self.extra_columns = extra_columns or {}
+
+    @property
+    def columns(self):
+        return list(self.fields) + list(self.extra_columns)
+
+    def queryset(self, params):
+        queryset = self.model.objects.all()
+
+        for param, lookup in self.filters.items():
+            value = params.get(param)
+            if value:
+                queryset = queryset.filter(**{lookup: value})
+
+        unsupported = [p for p in ('mfy', 'category', 'status') if params.get(p) and p not in self.filters]
+        if unsupported:
+            raise ExportError(f"Unsupported filter(s) for this dataset: {', '.join(unsupported)}")
+
+        start = _parse_bound(params.get('start'), 'start')
+        end = _parse_bound(params.get('end'), 'end', end_of_day=True)
+        if start:
+            queryset = queryset.filter(**{f'{self.time_field}__gte': start})
+        if end:
+            queryset = queryset.filter(**{f'{self.time_field}__lte': end})
+
+        return queryset.order_by(self.time_field).values_list(*self.fields)
+
+    def rows(self, params):
+        queryset = self.queryset(params)
+        for values in queryset.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+            row = dict(zip(self.fields, values))
+            for name, func in self.extra_columns.items():
+                row[name] = func(row)
+            yield row
+
+
+def _parse_bound(value, name, end_of_day=False):
+    if not value:
+        return None
+    error = ExportError(f"Invalid '{name}' value, expected ISO date or datetime")
+    try:
+        # The parsers return None when malformed and raise ValueError when out of range
+        parsed = parse_datetime(value)
+        if parsed is None:
+            parsed_date = parse_date(value)
+            if parsed_date is None:
+                raise error
+            parsed = datetime.combine(parsed_date, time.max if end_of_day else time.min)
+        if timezone.is_naive(parsed):
+            parsed = timezone.make_aware(parsed)
+        # The query compares in UTC, which must exist as well
+        return parsed.astimezone(dt_timezone.utc)
+    except (ValueError, OverflowError):
+        raise error
+
+
+def _numeric_value(row):
+    # ReportEntry.value is free text; expose a typed column alongside it
+    try:
+        return float(str(row['value']).replace(',', '.').strip().rstrip('%'))
+    except (TypeError, ValueError):
+        return None
+
+
+EXPORT_DATASETS = {
+    'report-entries': ExportDataset(
+        ReportEntry,
+        ['id', 'timestamp', 'mfy', 'location_name', 'category', 'metric_label',
+         'value', 'cost_impact', 'status', 'responsible'],
+        time_field='timestamp',
+        filters={'mfy': 'mfy', 'category': 'category', 'status': 'status'},
+        extra_columns={'value_numeric': _numeric_value},
+    ),
+    'eco-violations': ExportDataset(
+        EcoViolation,
+        ['id', 'timestamp', 'mfy', 'location_name', 'confidence', 'image_url',
+         'offender_name', 'face_id', 'match_score', 'estimated_age', 'gender'],
+        time_field='timestamp',
+        filters={'mfy': 'mfy'},
+    ),
+    'call-requests': ExportDataset(
+        CallRequest,
+        ['id', 'timestamp', 'mfy', 'address', 'category', 'status', 'citizen_name',
+         'phone', 'transcript', 'ai_summary', 'citizen_trust_score',
+         'assigned_org_id', 'deadline'],
+        time_field='timestamp',
+        filters={'mfy': 'mfy', 'category': 'category', 'status': 'status'},
+    ),
+    'iot-readings': ExportDataset(
+        IoTDevice,
+        ['device_id', 'device_type', 'room_id', 'boiler_id', 'current_temperature',
+         'current_humidity', 'last_sensor_update', 'last_seen', 'is_active'],
+        time_field='last_sensor_update',
+        filters={'category': 'device_type'},
+    ),
+    'moisture-readings': ExportDataset(
+        MoistureSensor,
+        ['id', 'last_update', 'mfy', 'status', 'moisture_level'],
+        time_field='last_update',
+        filters={'mfy': 'mfy', 'status': 'status'},
+    ),
+}
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    return value
+
+
+def iter_csv(dataset, rows):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(dataset.columns)
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(row[column]) for column in dataset.columns])
+        if count % EXPORT_CHUNK_SIZE == 0:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue().encode('utf-8')
+
+
+def iter_ndjson(dataset, rows):
+    encoder = json_encoder()
+    lines = []
+    for row in rows:
+        lines.append(encoder.encode(row))
+        if len(lines) >= EXPORT_CHUNK_SIZE:
+            yield ('\n'.join(lines) + '\n').encode('utf-8')
+            lines = []
+    if lines:
+        yield ('\n'.join(lines) + '\n').encode('utf-8')
+
+
+def build_export_response(dataset_name, params):
+    """
+    Return a streaming response exporting ``dataset_name`` filtered by ``params``.
+    Raises ExportError for unknown datasets, formats or malformed filters.
+    """
+    dataset = EXPORT_DATASETS.get(dataset_name)
+    if dataset is None:
+        raise ExportError(f"Unknown dataset '{dataset_name}'. Available: {', '.join(EXPORT_DATASETS)}")
+
+    output = params.get('output', 'csv')
+    if output not in EXPORT_FORMATS:
+        raise ExportError(f"Unknown output '{output}'. Available: {', '.join(EXPORT_FORMATS)}")
+
+    # Validate filters before streaming starts so errors can still be a 400
+    dataset.queryset(params)
+
+    rows = dataset.rows(params)
+    chunks = iter_csv(dataset, rows) if output == 'csv' else iter_ndjson(dataset, rows)
+    filename = f"{dataset_name}-{timezone.now().strftime('%Y%m%d%H%M%S')}.{output}"
+    content_type = EXPORT_FORMATS[output]
+
+    if str(params.get('gzip', '')).lower() in ('1', 'true', 'yes'):
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        content_type = 'application/gzip'
+
+    response = IncrementalStreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
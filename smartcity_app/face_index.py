@@ -0,0 +1,290 @@
+"""
+Face embedding index for repeat offender lookup.
+
+The detector sends a face embedding with an EcoViolation
+(``face_embedding``, FACE_EMBEDDING_DIM floats). It is stored L2
+normalized as float32 bytes in FaceEmbedding and kept in memory as one
+NumPy matrix, so cosine similarity is a matrix product:
+
+- brute force: every query of a batch against every row in one product;
+- IVF: from FACE_IVF_MIN_SIZE rows on (when FACE_IVF_LISTS > 0), rows are
+  clustered with k-means into FACE_IVF_LISTS lists and a query only scans
+  the FACE_IVF_PROBES lists with the nearest centroids, plus the rows
+  added since the clustering. The lists are rebuilt when the index has
+  grown by half.
+
+The index is loaded on the first search and picks up rows other processes
+inserted (FaceEmbedding.id watermark) before each search. A new
+violation without a face_id gets the face_id and offender_name of its best
+match at or above FACE_MATCH_THRESHOLD.
+
+Searches can be limited to the violations of one organization. The index
+itself is not partitioned: it is searched for FACE_SCOPE_OVERSAMPLE times
+as many matches, which are filtered in the database (dropping deleted
+violations and those of other organizations), widening the search until
+enough are left or the index runs out.
+"""
+
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import EcoViolation, FaceEmbedding
+
+
+class FaceIndexError(ValueError):
+    """Raised for an embedding of the wrong shape"""
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def normalize(vector, dim=None):
+    """A float32 unit vector from a list of numbers"""
+    dim = dim or _setting('FACE_EMBEDDING_DIM', 128)
+    try:
+        array = np.asarray(vector, dtype=np.float32)
+    except (TypeError, ValueError):
+        raise FaceIndexError('face_embedding must be a list of numbers')
+    if array.shape != (dim,):
+        raise FaceIndexError(f'face_embedding must have {dim} values')
+    norm = float(np.linalg.norm(array))
+    if not np.isfinite(norm) or norm == 0:
+        raise FaceIndexError('face_embedding must be a non-zero finite vector')
+    return array / norm
+
+
+class FaceIndex:
+    def __init__(self, dim=128, ivf_lists=0, ivf_min_size=50000, ivf_probes=8):
+        self.dim = dim
+        self.ivf_lists = ivf_lists
+        self.ivf_min_size = ivf_min_size
+        self.ivf_probes = ivf_probes
+        self._lock = threading.RLock()
+        self._vectors = np.zeros((0, dim), dtype=np.float32)
+        self._ids = []  # row -> violation id
+        self._alive = np.zeros(0, dtype=bool)
+        self._rows = {}  # violation id -> row
+        self._size = 0
+        self._loaded = False
+        self._watermark = 0  # highest FaceEmbedding.id loaded
+        # IVF state: centroids, rows ordered by list, list offsets, rows covered
+        self._centroids = None
+        self._order = None
+        self._offsets = None
+        self._clustered = 0
+
+    # Loading and updates
+
+    def _grow(self, extra):
+        needed = self._size + extra
+        if needed <= len(self._vectors):
+            return
+        capacity = max(needed, len(self._vectors) * 2, 1024)
+        vectors = np.zeros((capacity, self.dim), dtype=np.float32)
+        vectors[:self._size] = self._vectors[:self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:self._size] = self._alive[:self._size]
+        self._vectors, self._alive = vectors, alive
+
+    def _append(self, violation_ids, vectors):
+        with self._lock:
+            self._grow(len(violation_ids))
+            for violation_id, vector in zip(violation_ids, vectors):
+                old = self._rows.get(violation_id)
+                if old is not None:
+                    self._alive[old] = False
+                row = self._size
+                self._vectors[row] = vector
+                self._alive[row] = True
+                self._ids.append(violation_id)
+                self._rows[violation_id] = row
+                self._size += 1
+
+    def _refresh(self):
+        """Load embeddings inserted since the last load (all of them the first time)"""
+        with self._lock:
+            rows = list(
+                FaceEmbedding.objects.filter(id__gt=self._watermark).order_by('id')
+                .values_list('id', 'violation_id', 'vector')
+            )
+            if rows:
+                vectors = np.frombuffer(b''.join(bytes(row[2]) for row in rows), dtype=np.float32)
+                self._append([str(row[1]) for row in rows], vectors.reshape(len(rows), self.dim))
+                self._watermark = rows[-1][0]
+            self._loaded = True
+
+    def remove(self, violation_id):
+        with self._lock:
+            row = self._rows.pop(str(violation_id), None)
+            if row is not None:
+                self._alive[row] = False
+
+    # IVF
+
+    def _cluster(self):
+        """k-means over the current rows; the lists cover rows below ``_clustered``"""
+        size = self._size
+        vectors = self._vectors[:size]
+        rng = np.random.default_rng(0)
+        sample = vectors[rng.choice(size, size=min(size, self.ivf_lists * 64), replace=False)]
+        centroids = sample[rng.choice(len(sample), size=self.ivf_lists, replace=False)].copy()
+        for _ in range(10):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            filled = norms[:, 0] > 0
+            centroids[filled] = sums[filled] / norms[filled]
+
+        assignment = np.empty(size, dtype=np.int64)
+        for start in range(0, size, 65536):
+            assignment[start:start + 65536] = np.argmax(vectors[start:start + 65536] @ centroids.T, axis=1)
+        self._order = np.argsort(assignment, kind='stable')
+        self._offsets = np.concatenate(([0], np.cumsum(np.bincount(assignment, minlength=self.ivf_lists))))
+        self._centroids = centroids
+        self._clustered = size
+
+    def _ivf_ready(self):
+        if not self.ivf_lists or self._size < max(self.ivf_min_size, self.ivf_lists * 4):
+            return False
+        if self._centroids is None or self._size > self._clustered * 1.5:
+            self._cluster()
+        return True
+
+    # Search
+
+    def search(self, queries, k=10, min_score=None, exclude=()):
+        """
+        Top ``k`` matches of every query vector (unit vectors, one per row)
+        as ``[[(violation id, score)]]``, best first
+        """
+        self._refresh()
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        exclude = {str(violation_id) for violation_id in exclude}
+        with self._lock:
+            size = self._size
+            if not size:
+                return [[] for _ in queries]
+            vectors = self._vectors[:size]
+            alive = self._alive[:size]
+            if self._ivf_ready():
+                probes = min(self.ivf_probes, self.ivf_lists)
+                nearest_lists = np.argsort(-(queries @ self._centroids.T), axis=1)[:, :probes]
+                recent = np.arange(self._clustered, size)
+                candidates = [
+                    np.concatenate([self._order[self._offsets[lst]:self._offsets[lst + 1]] for lst in lists] + [recent])
+                    for lists in nearest_lists
+                ]
+                scores = [vectors[rows] @ query for rows, query in zip(candidates, queries)]
+            else:
+                all_scores = queries @ vectors.T
+                candidates = [None] * len(queries)
+                scores = list(all_scores)
+
+            results = []
+            for rows, row_scores in zip(candidates, scores):
+                row_ids = rows if rows is not None else np.arange(size)
+                row_scores = np.where(alive[row_ids], row_scores, -np.inf)
+                wanted = min(k + len(exclude), len(row_scores))
+                top = np.argpartition(-row_scores, wanted - 1)[:wanted] if wanted < len(row_scores) else np.arange(len(row_scores))
+                top = top[np.argsort(-row_scores[top])]
+                matches = []
+                for position in top:
+                    score = float(row_scores[position])
+                    if score == -np.inf or (min_score is not None and score < min_score):
+                        break
+                    violation_id = self._ids[row_ids[position]]
+                    if violation_id in exclude:
+                        continue
+                    matches.append((violation_id, score))
+                    if len(matches) == k:
+                        break
+                results.append(matches)
+            return results
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def get_index():
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = FaceIndex(
+                dim=_setting('FACE_EMBEDDING_DIM', 128),
+                ivf_lists=_setting('FACE_IVF_LISTS', 0),
+                ivf_min_size=_setting('FACE_IVF_MIN_SIZE', 50000),
+                ivf_probes=_setting('FACE_IVF_PROBES', 8),
+            )
+        return _index
+
+
+def loaded_index():
+    """The index if this process has loaded it, else None"""
+    return _index if _index is not None and _index._loaded else None
+
+
+def store(violation, vector):
+    """Save the normalized embedding of a violation, replacing an earlier one"""
+    with transaction.atomic():
+        # A new row rather than an update, so other processes see it past their watermark
+        FaceEmbedding.objects.filter(violation=violation).delete()
+        FaceEmbedding.objects.create(violation=violation, vector=vector.astype(np.float32).tobytes())
+    index = loaded_index()
+    if index is not None:
+        index._refresh()
+
+
+def stored_face(violation):
+    """The stored embedding of a violation, or None"""
+    vector = FaceEmbedding.objects.filter(violation=violation).values_list('vector', flat=True).first()
+    return np.frombuffer(bytes(vector), dtype=np.float32) if vector is not None else None
+
+
+def best_match(vector, exclude=(), organization_id=None):
+    """
+    ``(violation id, score)`` of the closest known face at or above
+    FACE_MATCH_THRESHOLD (within the organization if given), or None
+    """
+    matches = similar_violations(
+        vector, k=1, min_score=_setting('FACE_MATCH_THRESHOLD', 0.6), exclude=exclude,
+        organization_id=organization_id,
+    )[0]
+    return (str(matches[0][0].pk), matches[0][1]) if matches else None
+
+
+def similar_violations(queries, k=10, min_score=None, exclude=(), organization_id=None):
+    """
+    For each query vector, ``[(EcoViolation, score)]`` of its top ``k``
+    matches (of the organization if given); violations deleted in another
+    process are skipped
+    """
+    index = get_index()
+    queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+    violations = EcoViolation.objects.all()
+    if organization_id:
+        violations = violations.filter(organization_id=organization_id)
+    # Candidates are oversampled, as some are deleted or of other organizations
+    fetch = k * _setting('FACE_SCOPE_OVERSAMPLE', 4)
+    pending = list(range(len(queries)))
+    found = [[] for _ in queries]
+    while pending:
+        results = index.search(queries[pending], k=fetch, min_score=min_score, exclude=exclude)
+        ids = {violation_id for matches in results for violation_id, _ in matches}
+        by_id = {str(pk): violation for pk, violation in violations.in_bulk(list(ids)).items()}
+        retry = []
+        for position, matches in zip(pending, results):
+            found[position] = [
+                (by_id[violation_id], score) for violation_id, score in matches if violation_id in by_id
+            ][:k]
+            # A full page of candidates may hide further matches
+            if len(found[position]) < k and len(matches) == fetch and fetch < index._size:
+                retry.append(position)
+        pending = retry
+        fetch *= 4
+    return found
@@ -0,0 +1,140 @@
+"""
+Eco violation heatmap: counts per area (mfy or location_name) by
+day-of-week and hour-of-day.
+
+The grouping happens in SQL (one GROUP BY area, weekday, hour query over
+the timestamp index), so a year of violations comes back as at most
+areas x 7 x 24 cells. Hours and weekdays are in the current time zone,
+weekdays are ISO (1 = Monday).
+
+Rendered responses are cached per range and grouping, keyed by the
+EcoViolation version like refcache.py: a committed write makes the next
+request recompute, older entries expire after ECO_HEATMAP_CACHE_TIMEOUT.
+"""
+
+import hashlib
+from datetime import datetime, time, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db.models import Count
+from django.db.models.functions import ExtractHour, ExtractIsoWeekDay
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from .models import EcoViolation
+from .streaming import json_encoder
+from .versioning import current_versions
+
+CACHE_KEY_PREFIX = 'eco-heatmap'
+GROUPINGS = {'mfy': 'mfy', 'location': 'location_name'}
+
+
+class HeatmapError(ValueError):
+    """Raised for invalid heatmap parameters"""
+
+
+def _day(value, name):
+    if not value:
+        return None
+    day = parse_date(value)
+    if day is None:
+        raise HeatmapError(f'{name} must be a date (YYYY-MM-DD)')
+    return day
+
+
+def parse_params(params):
+    """``(start, end, group_by, mfy)`` from request parameters"""
+    start = _day(params.get('start_date'), 'start_date')
+    end = _day(params.get('end_date'), 'end_date')
+    if start and end and start > end:
+        raise HeatmapError('start_date must not be after end_date')
+    try:
+        # The range runs from midnight of start to midnight after end; both must exist in UTC
+        for day in (start, end and end + timedelta(days=1)):
+            if day:
+                _midnight(day).astimezone(dt_timezone.utc)
+    except OverflowError:
+        raise HeatmapError('start_date and end_date must be within the supported date range')
+    group_by = params.get('group_by') or 'mfy'
+    if group_by not in GROUPINGS:
+        raise HeatmapError(f"group_by must be one of: {', '.join(GROUPINGS)}")
+    return start, end, group_by, params.get('mfy') or None
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def heatmap(start=None, end=None, group_by='mfy', mfy=None):
+    """
+    Violation counts of the days ``start`` to ``end`` (inclusive, either
+    open) per area, with per-area and overall hour/weekday totals
+    """
+    violations = EcoViolation.objects.all()
+    if start:
+        violations = violations.filter(timestamp__gte=_midnight(start))
+    if end:
+        violations = violations.filter(timestamp__lt=_midnight(end + timedelta(days=1)))
+    if mfy:
+        violations = violations.filter(mfy=mfy)
+
+    field = GROUPINGS[group_by]
+    rows = (
+        violations.annotate(weekday=ExtractIsoWeekDay('timestamp'), hour=ExtractHour('timestamp'))
+        .values_list(field, 'weekday', 'hour')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+
+    areas = {}
+    hours = [0] * 24
+    weekdays = [0] * 7
+    for area, weekday, hour, count in rows:
+        cell = areas.get(area)
+        if cell is None:
+            cell = areas[area] = {'name': area, 'total': 0, 'hours': [0] * 24, 'weekdays': [0] * 7, 'cells': []}
+        cell['total'] += count
+        cell['hours'][hour] += count
+        cell['weekdays'][weekday - 1] += count
+        cell['cells'].append([weekday, hour, count])
+        hours[hour] += count
+        weekdays[weekday - 1] += count
+
+    for cell in areas.values():
+        cell['cells'].sort()
+    return {
+        'start_date': start.isoformat() if start else None,
+        'end_date': end.isoformat() if end else None,
+        'group_by': group_by,
+        'time_zone': timezone.get_current_timezone_name(),
+        'total': sum(hours),
+        'hours': hours,
+        'weekdays': weekdays,
+        'areas': sorted(areas.values(), key=lambda cell: (-cell['total'], cell['name'])),
+    }
+
+
+def _cache():
+    return caches[getattr(settings, 'ECO_HEATMAP_CACHE_ALIAS', 'default')]
+
+
+def cache_key(start, end, group_by, mfy):
+    version = current_versions((EcoViolation,))
+    stamp = '.'.join(str(value) for value in version.values())
+    # mfy and the time zone name are free text; hashed to keep the key memcached-safe
+    scope = hashlib.md5(
+        f'{start or ""}|{end or ""}|{mfy or ""}|{timezone.get_current_timezone_name()}'.encode('utf-8')
+    ).hexdigest()
+    return f'{CACHE_KEY_PREFIX}:{group_by}:{scope}:{stamp}'
+
+
+def render(start=None, end=None, group_by='mfy', mfy=None):
+    """The heatmap as JSON bytes, from cache when current"""
+    key = cache_key(start, end, group_by, mfy)
+    cache = _cache()
+    body = cache.get(key)
+    if body is None:
+        body = json_encoder().encode(heatmap(start, end, group_by, mfy)).encode('utf-8')
+        cache.set(key, body, getattr(settings, 'ECO_HEATMAP_CACHE_TIMEOUT', 60 * 60))
+    return body
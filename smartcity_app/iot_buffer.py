@@ -0,0 +1,280 @@
+"""
+Write-behind buffer for high-frequency IoT sensor updates.
+
+Every sensor POST used to rewrite its IoTDevice row and the Room or Boiler
+it measures. Instead, the latest fields per row are kept in memory and
+written out with one ``bulk_update`` per model every
+IOT_WRITE_BEHIND_INTERVAL seconds, or sooner once
+IOT_WRITE_BEHIND_MAX_PENDING rows are pending. A device reporting ten
+times in a window costs one row write.
+
+Crash safety: each update is appended to a per-process log file before
+it is acknowledged, and the file is deleted only after its updates are
+committed. Log files left behind by a crashed process are no longer locked
+and are replayed on the next flush of any process (or by the
+flush_iot_buffer command). Pending updates are also flushed at exit. With
+IOT_WRITE_BEHIND_FSYNC off, the log survives a process crash but not a
+power loss.
+
+``bulk_update`` bypasses model signals, so the flush bumps table
+versions, journals sync changes and publishes push events itself.
+"""
+
+import atexit
+import glob
+import json
+import os
+import threading
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.utils import timezone
+
+from .models import Boiler, DeviceHealth, IoTDevice, Room
+from .signals import bulk_saved
+from .streaming import json_encoder
+
+try:
+    import fcntl
+except ImportError:  # Windows: no lock, logs of running processes may be replayed early
+    fcntl = None
+
+BUFFERED_MODELS = {model.__name__: model for model in (IoTDevice, Room, Boiler, DeviceHealth)}
+LOG_PATTERN = 'iot-buffer-*.log'
+
+
+def _lock(fd):
+    """Try to take the exclusive lock of a log file; False if another process holds it"""
+    if fcntl is None:
+        return True
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        return True
+    except OSError:
+        return False
+
+
+class WriteBehindBuffer:
+    def __init__(self, log_dir, flush_interval=5.0, max_pending=500, fsync=False):
+        self.log_dir = str(log_dir)
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.fsync = fsync
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending = {}  # (model name, str(pk)) -> {field: value}
+        self._log = None
+        self._log_seq = 0
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    @property
+    def write_through(self):
+        return self.flush_interval <= 0
+
+    def update(self, model, pk, fields):
+        """Buffer ``fields`` for row ``pk`` of ``model``, newer values replace older ones"""
+        key = (model.__name__, str(pk))
+        if self.write_through:
+            self._write({key: dict(fields)})
+            return
+
+        line = json_encoder().encode([key[0], key[1], fields]) + '\n'
+        with self._lock:
+            self._ensure_started()
+            os.write(self._log.fileno(), line.encode('utf-8'))
+            if self.fsync:
+                os.fsync(self._log.fileno())
+            self._pending.setdefault(key, {}).update(fields)
+            pending = len(self._pending)
+        if pending >= self.max_pending:
+            self._wakeup.set()
+
+    def flush(self):
+        """Write all pending updates, plus those of logs abandoned by crashed processes"""
+        with self._flush_lock:
+            orphans = self._claim_orphan_logs()
+            with self._lock:
+                pending, self._pending = self._pending, {}
+                written_log = self._rotate_log() if self._log and pending else None
+
+            batch = {}
+            for _, entries in orphans:
+                for key, fields in entries.items():
+                    batch.setdefault(key, {}).update(fields)
+            for key, fields in pending.items():
+                batch.setdefault(key, {}).update(fields)
+
+            try:
+                self._write(batch)
+            except Exception:
+                # Keep the updates (newer buffered values win) and the log files for the next attempt
+                with self._lock:
+                    for key, fields in self._pending.items():
+                        batch.setdefault(key, {}).update(fields)
+                    self._pending = batch
+                for log, _ in orphans:
+                    log.close()
+                if written_log:
+                    written_log.close()
+                raise
+
+            for log, _ in orphans:
+                self._discard(log)
+            if written_log:
+                self._discard(written_log)
+            return len(batch)
+
+    def _write(self, batch):
+        by_model = {}
+        for (model_name, pk), fields in batch.items():
+            by_model.setdefault(model_name, {})[pk] = fields
+
+        with transaction.atomic():
+            for model_name, rows in by_model.items():
+                model = BUFFERED_MODELS[model_name]
+                instances = []
+                field_names = set()
+                for instance in model.objects.in_bulk(list(rows)).values():
+                    fields = rows[str(instance.pk)]
+                    try:
+                        for name, value in fields.items():
+                            setattr(instance, name, model._meta.get_field(name).to_python(value))
+                        instance.clean_fields(exclude=[
+                            field.name for field in model._meta.fields if field.name not in fields])
+                    except ValidationError as e:
+                        # One bad row must not keep the rest of the batch from being written
+                        print(f"IoT write-behind dropped {model_name} {instance.pk}: {e}")
+                        continue
+                    instances.append(instance)
+                    field_names.update(fields)
+                if not instances or not field_names:
+                    continue
+                model.objects.bulk_update(instances, sorted(field_names), batch_size=500)
+                bulk_saved(model, instances)
+
+    # Log files
+
+    def _log_path(self, seq):
+        return os.path.join(self.log_dir, f'iot-buffer-{os.getpid()}-{seq}.log')
+
+    def _open_log(self):
+        os.makedirs(self.log_dir, exist_ok=True)
+        self._log_seq += 1
+        log = open(self._log_path(self._log_seq), 'ab')
+        _lock(log.fileno())
+        return log
+
+    def _rotate_log(self):
+        # Called with self._lock held: new updates go to a fresh file while
+        # the current one is kept until its updates are committed
+        written, self._log = self._log, self._open_log()
+        return written
+
+    def _discard(self, log):
+        try:
+            os.remove(log.name)
+        except FileNotFoundError:
+            pass
+        log.close()
+
+    def _claim_orphan_logs(self):
+        """Return ``[(file, entries)]`` of unlocked logs (their process is gone)"""
+        own = {self._log.name} if self._log else set()
+        orphans = []
+        for path in sorted(glob.glob(os.path.join(self.log_dir, LOG_PATTERN))):
+            if path in own:
+                continue
+            try:
+                log = open(path, 'rb+')
+            except FileNotFoundError:
+                continue
+            if not _lock(log.fileno()):
+                log.close()
+                continue
+            orphans.append((log, self._read_log(log)))
+        return orphans
+
+    def _read_log(self, log):
+        entries = {}
+        for raw in log:
+            try:
+                model_name, pk, fields = json.loads(raw)
+            except ValueError:
+                continue  # torn last line of a crashed write
+            if model_name in BUFFERED_MODELS:
+                entries.setdefault((model_name, pk), {}).update(fields)
+        return entries
+
+    # Background flushing
+
+    def _ensure_started(self):
+        if self._log is None:
+            self._log = self._open_log()
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name='iot-write-behind', daemon=True)
+            self._thread.start()
+            atexit.register(self._flush_at_exit)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"IoT write-behind flush failed: {e}")
+
+    def _flush_at_exit(self):
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"IoT write-behind flush at exit failed, updates stay in {self.log_dir}: {e}")
+            return
+        with self._lock:
+            if self._log and not self._pending:
+                self._discard(self._log)
+                self._log = None
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_buffer():
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(
+                log_dir=getattr(settings, 'IOT_WRITE_BEHIND_LOG_DIR', os.path.join(settings.BASE_DIR, 'iot_buffer')),
+                flush_interval=getattr(settings, 'IOT_WRITE_BEHIND_INTERVAL', 5.0),
+                max_pending=getattr(settings, 'IOT_WRITE_BEHIND_MAX_PENDING', 500),
+                fsync=getattr(settings, 'IOT_WRITE_BEHIND_FSYNC', False),
+            )
+        return _buffer
+
+
+def record_reading(device, temperature, humidity, seen_at=None):
+    """
+    Buffer a sensor reading: the device's readings and last_seen, and the
+    temperature/humidity of the room or boiler it is linked to
+    """
+    seen_at = seen_at or timezone.now()
+    buffer = get_buffer()
+    buffer.update(IoTDevice, device.pk, {
+        'last_seen': seen_at,
+        'current_temperature': temperature,
+        'current_humidity': humidity,
+        'last_sensor_update': seen_at,
+    })
+
+    target = {'last_updated': seen_at}
+    if temperature:
+        target['temperature'] = temperature
+    if humidity is not None:
+        target['humidity'] = humidity
+    if device.room_id:
+        buffer.update(Room, device.room_id, target)
+    elif device.boiler_id:
+        buffer.update(Boiler, device.boiler_id, target)
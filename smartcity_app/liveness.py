@@ -0,0 +1,176 @@
+"""
+Device liveness: offline detection for IoT devices.
+
+Each report announces how long the device will sleep (``sleep_seconds``).
+The tracker keeps a min-heap of the time each device is expected to
+report again, so a sweep only pops the devices whose deadline has passed.
+It never scans the device table. Expired devices are flipped offline
+(IoTDevice.is_active, DeviceHealth.is_online of their boiler) and
+operators get a notification; the next report brings them back online.
+
+The heap lives in the worker process. Before flipping a device, the sweep
+re-checks its last_seen in the database, so a device whose reports went
+to another worker is re-armed instead of being marked offline.
+"""
+
+import heapq
+import itertools
+import threading
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .iot_buffer import get_buffer
+from .models import DeviceHealth, IoTDevice
+from .notifications import Message, notify_operators
+from .signals import bulk_saved
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+class LivenessTracker:
+    def __init__(self, grace_factor=1.5, grace_seconds=120, default_interval=2000):
+        self.grace_factor = grace_factor
+        self.grace_seconds = grace_seconds
+        self.default_interval = default_interval
+        self._lock = threading.Lock()
+        self._heap = []  # (deadline timestamp, tie breaker, device pk)
+        self._deadlines = {}  # device pk -> current deadline; older heap entries are stale
+        self._counter = itertools.count()
+        self._thread = None
+        self._seeded = False
+
+    def deadline(self, seen_at, interval):
+        interval = interval or self.default_interval
+        return seen_at.timestamp() + interval * self.grace_factor + self.grace_seconds
+
+    def arm(self, device_pk, deadline):
+        with self._lock:
+            self._deadlines[device_pk] = deadline
+            heapq.heappush(self._heap, (deadline, next(self._counter), device_pk))
+
+    def report(self, device, sleep_seconds=None, seen_at=None):
+        """
+        Record a report of ``device`` (an IoTDevice with its boiler loaded):
+        re-arm its deadline and mark it and its boiler's health online
+        """
+        seen_at = seen_at or timezone.now()
+        interval = sleep_seconds or device.sleep_seconds
+        self.arm(device.pk, self.deadline(seen_at, interval))
+
+        buffer = get_buffer()
+        fields = {'is_active': True}
+        if sleep_seconds and sleep_seconds != device.sleep_seconds:
+            fields['sleep_seconds'] = sleep_seconds
+        buffer.update(IoTDevice, device.pk, fields)
+        if device.boiler_id:
+            buffer.update(DeviceHealth, device.boiler.device_health_id, {'is_online': True, 'last_ping': seen_at})
+
+    def seed(self):
+        """Arm every active device from its last_seen; done once per process"""
+        rows = IoTDevice.objects.filter(is_active=True).values_list('pk', 'last_seen', 'sleep_seconds')
+        for pk, last_seen, sleep_seconds in rows.iterator():
+            if pk not in self._deadlines:
+                self.arm(pk, self.deadline(last_seen, sleep_seconds))
+        self._seeded = True
+
+    def _pop_expired(self, now):
+        expired = []
+        with self._lock:
+            while self._heap and self._heap[0][0] <= now:
+                deadline, _, pk = heapq.heappop(self._heap)
+                if self._deadlines.get(pk) == deadline:
+                    del self._deadlines[pk]
+                    expired.append(pk)
+        return expired
+
+    def next_deadline(self):
+        with self._lock:
+            return self._heap[0][0] if self._heap else None
+
+    def sweep(self, now=None):
+        """Flip devices whose deadline passed offline; returns them"""
+        now = now or timezone.now()
+        expired = self._pop_expired(now.timestamp())
+        if not expired:
+            return []
+
+        offline = []
+        devices = IoTDevice.objects.select_related('boiler').filter(pk__in=expired, is_active=True)
+        for device in devices:
+            deadline = self.deadline(device.last_seen, device.sleep_seconds)
+            if deadline > now.timestamp():
+                # Reported through another worker in the meantime
+                self.arm(device.pk, deadline)
+            else:
+                offline.append(device)
+        if not offline:
+            return []
+
+        health_ids = [device.boiler.device_health_id for device in offline if device.boiler_id]
+        with transaction.atomic():
+            IoTDevice.objects.filter(pk__in=[device.pk for device in offline]).update(is_active=False)
+            for device in offline:
+                device.is_active = False
+            bulk_saved(IoTDevice, offline)
+            if health_ids:
+                DeviceHealth.objects.filter(pk__in=health_ids).update(is_online=False)
+                bulk_saved(DeviceHealth, [DeviceHealth(pk=pk) for pk in health_ids])
+            notify_operators([
+                Message(
+                    f"Qurilma oflayn: {device.device_id}",
+                    f"{device.device_id} qurilmasi {int((now - device.last_seen).total_seconds() // 60)} daqiqadan beri ma'lumot yubormadi",
+                    'WARNING',
+                    dedup_key=f'device-offline:{device.pk}',
+                )
+                for device in offline
+            ])
+        return offline
+
+    def start(self):
+        """Seed from the database and sweep in a background thread"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name='device-liveness', daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        tick = _setting('LIVENESS_TICK_SECONDS', 30)
+        stop = threading.Event()
+        while True:
+            try:
+                if not self._seeded:
+                    self.seed()
+                self.sweep()
+            except Exception as e:
+                print(f"Device liveness sweep failed: {e}")
+            # Wake up for the next deadline, but at least every tick
+            next_deadline = self.next_deadline()
+            wait = tick if next_deadline is None else min(tick, max(next_deadline - timezone.now().timestamp(), 0.5))
+            stop.wait(wait)
+
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+
+def get_tracker():
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = LivenessTracker(
+                grace_factor=_setting('LIVENESS_GRACE_FACTOR', 1.5),
+                grace_seconds=_setting('LIVENESS_GRACE_SECONDS', 120),
+                default_interval=_setting('LIVENESS_DEFAULT_INTERVAL', 2000),
+            )
+        return _tracker
+
+
+def record_report(device, sleep_seconds=None, seen_at=None):
+    tracker = get_tracker()
+    tracker.report(device, sleep_seconds, seen_at)
+    tracker.start()
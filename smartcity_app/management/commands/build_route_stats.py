@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.bus_eta import build_route_stats
+
+
+class Command(BaseCommand):
+    help = 'Learn the typical travel time between consecutive stops of every bus route from the track history'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=14, help='How many days of track history to use')
+
+    def handle(self, *args, **options):
+        result = build_route_stats(days=options['days'])
+        for route_number, segments in result.items():
+            self.stdout.write(f'Route {route_number}: {segments} segment(s) learned')
+        self.stdout.write(
+            self.style.SUCCESS(f'Updated travel times of {len(result)} route(s)')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.track_store import compact
+
+
+class Command(BaseCommand):
+    help = 'Simplify and encode the raw vehicle track points of complete hours into compact chunks (run hourly)'
+
+    def handle(self, *args, **options):
+        removed, written = compact()
+        self.stdout.write(
+            self.style.SUCCESS(f'Compacted {removed} track points into {written} chunks')
+        )
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.dispatch import dispatch_pending, rebuild_loads
+
+
+class Command(BaseCommand):
+    help = 'Assign triaged new call requests to the least-loaded responsible organization of their category'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-load', action='store_true',
+                            help='Recompute current_load of every organization from its open requests first')
+
+    def handle(self, *args, **options):
+        if options['rebuild_load']:
+            updated = rebuild_loads()
+            self.stdout.write(f'Recomputed the load of {updated} organizations')
+        count = dispatch_pending()
+        self.stdout.write(
+            self.style.SUCCESS(f'Dispatched {count} call requests')
+        )
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.iot_buffer import get_buffer
+
+
+class Command(BaseCommand):
+    help = 'Write buffered IoT updates, including logs left behind by stopped or crashed processes'
+
+    def handle(self, *args, **options):
+        count = get_buffer().flush()
+        self.stdout.write(
+            self.style.SUCCESS(f'Flushed {count} buffered rows')
+        )
@@ -0,0 +1,110 @@
+from contextlib import contextmanager
+from django.apps import apps
+from django.contrib.auth.models import Permission
+from django.contrib.contenttypes.models import ContentType
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connections, transaction
+from django.db.migrations.executor import MigrationExecutor
+
+
+def copyable_models():
+    """All concrete models, including auto-created many-to-many tables"""
+    models = []
+    for model in apps.get_models(include_auto_created=True):
+        opts = model._meta
+        if opts.proxy or not opts.managed:
+            continue
+        models.append(model)
+    # ContentTypes and Permissions first so their ids are settled before
+    # anything referencing them is copied
+    models.sort(key=lambda m: (m is not ContentType, m is not Permission))
+    return models
+
+
+@contextmanager
+def preserve_auto_timestamps(models):
+    """Stop auto_now/auto_now_add from overwriting the copied timestamps"""
+    changed = []
+    for model in models:
+        for field in model._meta.concrete_fields:
+            if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False):
+                changed.append((field, field.auto_now, field.auto_now_add))
+                field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in changed:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+class Command(BaseCommand):
+    help = 'Copy all data from the legacy SQLite database into the (PostgreSQL) primary database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--source', default='sqlite_legacy', help="Source database alias (default: sqlite_legacy)")
+        parser.add_argument('--target', default='default', help="Target database alias (default: default)")
+        parser.add_argument('--batch-size', type=int, default=1000, help='Rows per INSERT batch (default: 1000)')
+
+    def handle(self, *args, **options):
+        source, target = options['source'], options['target']
+        batch_size = options['batch_size']
+
+        for alias in (source, target):
+            if alias not in connections.databases:
+                raise CommandError(f"Database alias '{alias}' is not configured (set DB_ENGINE=postgresql for sqlite_legacy)")
+        if source == target:
+            raise CommandError('Source and target must be different databases')
+
+        executor = MigrationExecutor(connections[target])
+        if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+            raise CommandError(f"Target '{target}' has unapplied migrations, run: manage.py migrate --database {target}")
+
+        models = copyable_models()
+        for model in models:
+            if model in (ContentType, Permission):
+                continue
+            if model._base_manager.using(target).exists():
+                raise CommandError(f'Target table {model._meta.db_table} is not empty, refusing to overwrite data')
+
+        self.stdout.write(f'Copying {len(models)} tables from {source} to {target}...')
+
+        with transaction.atomic(using=target), preserve_auto_timestamps(models):
+            # migrate on the target created its own content types / permissions
+            Permission.objects.using(target).all().delete()
+            ContentType.objects.using(target).all().delete()
+
+            for model in models:
+                copied = self.copy_model(model, source, target, batch_size)
+                self.stdout.write(f'  {model._meta.db_table}: {copied} rows')
+
+            # Move sequences past the copied ids (no-op on SQLite)
+            connection = connections[target]
+            statements = connection.ops.sequence_reset_sql(no_style(), models)
+            with connection.cursor() as cursor:
+                for sql in statements:
+                    cursor.execute(sql)
+
+        self.stdout.write(
+            self.style.SUCCESS('Data migration completed')
+        )
+
+    def copy_model(self, model, source, target, batch_size):
+        rows = model._base_manager.using(source).order_by('pk').iterator(chunk_size=batch_size)
+        manager = model._base_manager.using(target)
+        batch = []
+        copied = 0
+        for obj in rows:
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                manager.bulk_create(batch, batch_size=batch_size)
+                copied += len(batch)
+                batch = []
+        if batch:
+            manager.bulk_create(batch, batch_size=batch_size)
+            copied += len(batch)
+
+        expected = model._base_manager.using(source).count()
+        if copied != expected:
+            raise CommandError(f'{model._meta.db_table}: copied {copied} rows but source has {expected}')
+        return copied
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.construction import predict_delays
+
+
+class Command(BaseCommand):
+    help = 'Compare the stage progression of every construction site with its mission deadlines and mark late missions DELAYED'
+
+    def handle(self, *args, **options):
+        result = predict_delays()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Checked {result['missions']} missions: {result['updated']} updated, {result['delayed']} delayed"
+            )
+        )
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils.dateparse import parse_date
+from smartcity_app import aggregates
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the ReportEntry aggregation cube from scratch (or for a day range)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', type=str, help='First day to rebuild (YYYY-MM-DD)')
+        parser.add_argument('--end', type=str, help='Last day to rebuild (YYYY-MM-DD)')
+
+    def handle(self, *args, **options):
+        start = parse_date(options['start']) if options['start'] else None
+        end = parse_date(options['end']) if options['end'] else None
+
+        count = aggregates.rebuild(start=start, end=end)
+        self.stdout.write(
+            self.style.SUCCESS(f'Report aggregates rebuilt: {count} rows')
+        )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.liveness import get_tracker
+
+
+class Command(BaseCommand):
+    help = 'Mark IoT devices that missed their next report as offline (for deployments without a long-running worker)'
+
+    def handle(self, *args, **options):
+        tracker = get_tracker()
+        tracker.seed()
+        offline = tracker.sweep()
+        self.stdout.write(
+            self.style.SUCCESS(f'{len(offline)} device(s) marked offline')
+        )
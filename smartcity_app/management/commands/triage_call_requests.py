@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from smartcity_app.triage import triage_pending
+
+
+class Command(BaseCommand):
+    help = 'Classify, summarize and extract keywords of every call request not triaged yet'
+
+    def handle(self, *args, **options):
+        count = triage_pending()
+        self.stdout.write(
+            self.style.SUCCESS(f'Triaged {count} call requests')
+        )
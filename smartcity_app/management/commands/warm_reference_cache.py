@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from smartcity_app import refcache
+
+
+class Command(BaseCommand):
+    help = 'Pre-render the cached reference data lists (regions, districts, organizations, ...)'
+
+    def handle(self, *args, **options):
+        count = refcache.warm()
+        self.stdout.write(
+            self.style.SUCCESS(f'Warmed {count} reference data entries')
+        )
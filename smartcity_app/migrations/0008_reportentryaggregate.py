@@ -0,0 +1,48 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:38
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncDate
+
+
+def seed_report_aggregates(apps, schema_editor):
+    ReportEntry = apps.get_model('smartcity_app', 'ReportEntry')
+    ReportEntryAggregate = apps.get_model('smartcity_app', 'ReportEntryAggregate')
+    rows = (
+        ReportEntry.objects.annotate(day=TruncDate('timestamp'))
+        .values('day', 'mfy', 'category', 'status')
+        .annotate(entry_count=Count('id'))
+        .order_by()
+    )
+    ReportEntryAggregate.objects.bulk_create(
+        [ReportEntryAggregate(**row) for row in rows], batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0007_change_room_id_to_charfield'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReportEntryAggregate',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('day', models.DateField()),
+                ('mfy', models.CharField(max_length=100)),
+                ('category', models.CharField(max_length=100)),
+                ('status', models.CharField(choices=[('OPTIMAL', 'Optimal'), ('WARNING', 'Warning'), ('CRITICAL', 'Critical')], max_length=20)),
+                ('entry_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['mfy', 'day'], name='report_agg_mfy_day_idx'), models.Index(fields=['category', 'day'], name='report_agg_category_day_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='reportentryaggregate',
+            constraint=models.UniqueConstraint(fields=('day', 'mfy', 'category', 'status'), name='unique_report_aggregate_key'),
+        ),
+        migrations.RunPython(seed_report_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,93 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0008_reportentryaggregate'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='airsensor',
+            index=models.Index(fields=['status'], name='airsensor_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bus',
+            index=models.Index(fields=['status'], name='bus_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='callrequest',
+            index=models.Index(fields=['status', 'timestamp'], name='callrequest_status_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='callrequest',
+            index=models.Index(fields=['timestamp'], name='callrequest_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='constructionsite',
+            index=models.Index(fields=['status'], name='constructionsite_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ecoviolation',
+            index=models.Index(fields=['timestamp'], name='ecoviolation_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ecoviolation',
+            index=models.Index(fields=['mfy', 'timestamp'], name='ecoviolation_mfy_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='facility',
+            index=models.Index(fields=['type'], name='facility_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notification',
+            index=models.Index(condition=models.Q(('read', False)), fields=['user', 'timestamp'], name='notification_unread_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportentry',
+            index=models.Index(fields=['timestamp'], name='reportentry_timestamp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reportentry',
+            index=models.Index(fields=['mfy', 'timestamp'], name='reportentry_mfy_ts_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='soscolumn',
+            index=models.Index(fields=['status'], name='soscolumn_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='truck',
+            index=models.Index(fields=['organization', 'status'], name='truck_org_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='truck',
+            index=models.Index(fields=['status'], name='truck_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='truck',
+            index=models.Index(fields=['toza_hudud'], name='truck_toza_hudud_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='truck',
+            index=models.Index(fields=['login'], name='truck_login_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utilitynode',
+            index=models.Index(fields=['status'], name='utilitynode_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='utilitynode',
+            index=models.Index(fields=['type'], name='utilitynode_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wastebin',
+            index=models.Index(condition=models.Q(('is_full', False)), fields=['organization'], name='wastebin_org_not_full_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='wastebin',
+            index=models.Index(fields=['toza_hudud'], name='wastebin_toza_hudud_idx'),
+        ),
+    ]
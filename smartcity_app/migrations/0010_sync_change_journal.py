@@ -0,0 +1,52 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:50
+
+from django.db import migrations, models
+
+# journal key -> (model name, organization field)
+SYNC_MODELS = {
+    'waste_bins': ('WasteBin', 'organization_id'),
+    'trucks': ('Truck', 'organization_id'),
+    'call_requests': ('CallRequest', 'assigned_org_id'),
+    'notifications': ('Notification', None),
+    'iot_devices': ('IoTDevice', None),
+}
+
+
+def seed_sync_journal(apps, schema_editor):
+    # Journal the existing rows so a sync from token 0 returns everything
+    SyncChange = apps.get_model('smartcity_app', 'SyncChange')
+    for key, (model_name, organization_field) in SYNC_MODELS.items():
+        model = apps.get_model('smartcity_app', model_name)
+        fields = ['pk'] + ([organization_field] if organization_field else [])
+        SyncChange.objects.bulk_create(
+            [
+                SyncChange(model=key, object_id=str(row[0]), organization_id=row[1] if organization_field else None)
+                for row in model.objects.order_by('pk').values_list(*fields).iterator()
+            ],
+            batch_size=1000,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0009_hot_column_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SyncChange',
+            fields=[
+                ('seq', models.BigAutoField(primary_key=True, serialize=False)),
+                ('model', models.CharField(max_length=50)),
+                ('object_id', models.CharField(max_length=64)),
+                ('organization_id', models.UUIDField(blank=True, null=True)),
+                ('deleted', models.BooleanField(default=False)),
+                ('timestamp', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['model', 'object_id'], name='syncchange_object_idx')],
+            },
+        ),
+        migrations.RunPython(seed_sync_journal, migrations.RunPython.noop),
+    ]
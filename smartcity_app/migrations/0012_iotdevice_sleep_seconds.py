@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 17:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0011_model_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iotdevice',
+            name='sleep_seconds',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0013_notification_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleTrackPoint',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vehicle_type', models.CharField(choices=[('BUS', 'Bus'), ('TRUCK', 'Truck')], max_length=10)),
+                ('vehicle_id', models.UUIDField()),
+                ('timestamp', models.DateTimeField()),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('speed', models.FloatField(blank=True, null=True)),
+                ('bearing', models.FloatField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='bus',
+            name='last_telemetry_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='bus',
+            index=models.Index(fields=['last_telemetry_at'], name='bus_telemetry_at_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vehicletrackpoint',
+            index=models.Index(fields=['vehicle_type', 'vehicle_id', 'timestamp'], name='trackpoint_vehicle_ts_idx'),
+        ),
+    ]
@@ -0,0 +1,45 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:05
+
+from django.db import migrations, models
+import django.db.models.deletion
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0014_bus_telemetry'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BusRoute',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('route_number', models.CharField(max_length=20, unique=True)),
+                ('name', models.CharField(blank=True, max_length=255)),
+                ('stats_updated_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BusStop',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('sequence', models.PositiveIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('travel_seconds_mean', models.FloatField(blank=True, null=True)),
+                ('travel_seconds_std', models.FloatField(blank=True, null=True)),
+                ('travel_samples', models.PositiveIntegerField(default=0)),
+                ('route', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stops', to='smartcity_app.busroute')),
+            ],
+            options={
+                'ordering': ['route', 'sequence'],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='busstop',
+            constraint=models.UniqueConstraint(fields=('route', 'sequence'), name='busstop_route_sequence_uniq'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0015_bus_routes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='VehicleTrackChunk',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vehicle_type', models.CharField(choices=[('BUS', 'Bus'), ('TRUCK', 'Truck')], max_length=10)),
+                ('vehicle_id', models.UUIDField()),
+                ('hour', models.DateTimeField()),
+                ('point_count', models.PositiveIntegerField()),
+                ('raw_point_count', models.PositiveIntegerField()),
+                ('data', models.BinaryField()),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='vehicletrackchunk',
+            constraint=models.UniqueConstraint(fields=('vehicle_type', 'vehicle_id', 'hour'), name='trackchunk_vehicle_hour_uniq'),
+        ),
+    ]
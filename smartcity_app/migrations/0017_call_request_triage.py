@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:13
+
+from django.db import migrations, models
+
+
+def mark_existing_triaged(apps, schema_editor):
+    # Existing requests carry client-supplied results; triage only new ones
+    CallRequest = apps.get_model('smartcity_app', 'CallRequest')
+    CallRequest.objects.update(triaged_at=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0016_vehicle_track_chunks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callrequest',
+            name='triage_confidence',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callrequest',
+            name='triaged_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_existing_triaged, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='callrequest',
+            name='ai_summary',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AlterField(
+            model_name='callrequest',
+            name='category',
+            field=models.CharField(blank=True, choices=[('HEALTH', 'Health'), ('INTERIOR', 'Interior'), ('WASTE', 'Waste'), ('ELECTRICITY', 'Electricity'), ('WATER', 'Water'), ('GAS', 'Gas'), ('OTHER', 'Other')], max_length=20),
+        ),
+        migrations.AlterField(
+            model_name='callrequest',
+            name='keywords',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddIndex(
+            model_name='callrequest',
+            index=models.Index(condition=models.Q(('triaged_at__isnull', True)), fields=['timestamp'], name='callrequest_untriaged_idx'),
+        ),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:16
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+CATEGORIES = {'HEALTH', 'INTERIOR', 'WASTE', 'ELECTRICITY', 'WATER', 'GAS', 'OTHER'}
+
+
+def seed_categories(apps, schema_editor):
+    # Organizations whose type already names a request category handle that category
+    ResponsibleOrg = apps.get_model('smartcity_app', 'ResponsibleOrg')
+    orgs = [org for org in ResponsibleOrg.objects.all() if (org.type or '').strip().upper() in CATEGORIES]
+    for org in orgs:
+        org.categories = [org.type.strip().upper()]
+    ResponsibleOrg.objects.bulk_update(orgs, ['categories'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0017_call_request_triage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callrequest',
+            name='assigned_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callrequest',
+            name='lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callrequest',
+            name='lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='callrequest',
+            name='responsible_org',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='call_requests', to='smartcity_app.responsibleorg'),
+        ),
+        migrations.AddField(
+            model_name='responsibleorg',
+            name='categories',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.AddField(
+            model_name='responsibleorg',
+            name='lat',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='responsibleorg',
+            name='lng',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.RunPython(seed_categories, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0018_call_request_dispatch'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callrequest',
+            name='resolved_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
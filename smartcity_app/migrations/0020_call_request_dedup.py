@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:21
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0019_call_request_resolved_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='callrequest',
+            name='duplicate_of',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='duplicates', to='smartcity_app.callrequest'),
+        ),
+        migrations.CreateModel(
+            name='CallRequestBand',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('band', models.BigIntegerField()),
+                ('created_at', models.DateTimeField()),
+                ('call_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lsh_bands', to='smartcity_app.callrequest')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band'], name='callrequestband_band_idx'), models.Index(fields=['created_at'], name='callrequestband_created_idx')],
+            },
+        ),
+    ]
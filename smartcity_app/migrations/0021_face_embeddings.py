@@ -0,0 +1,22 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:31
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0020_call_request_dedup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FaceEmbedding',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('vector', models.BinaryField()),
+                ('violation', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='face_embedding', to='smartcity_app.ecoviolation')),
+            ],
+        ),
+    ]
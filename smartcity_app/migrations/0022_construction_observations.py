@@ -0,0 +1,68 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:37
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.utils import timezone
+
+STAGES = ['KOTLOVAN', 'FUNDAMENT', 'KARKAS_1', 'KARKAS_FULL', 'TOM_YOPISH', 'PARDOZLASH']
+
+
+def _small(value, high=32767):
+    try:
+        return max(0, min(int(round(float(value))), high))
+    except (TypeError, ValueError):
+        return 0
+
+
+def observe_existing_sites(apps, schema_editor):
+    # Start every site's history with its current readings
+    ConstructionSite = apps.get_model('smartcity_app', 'ConstructionSite')
+    ConstructionObservation = apps.get_model('smartcity_app', 'ConstructionObservation')
+    now = timezone.now()
+    rows = []
+    for site in ConstructionSite.objects.all().iterator():
+        detected = site.detected_objects if isinstance(site.detected_objects, dict) else {}
+        rows.append(ConstructionObservation(
+            site_id=site.pk,
+            observed_at=now,
+            stage=STAGES.index(site.current_ai_stage) if site.current_ai_stage in STAGES else 0,
+            progress=_small((site.overall_progress or 0) * 10, 1000),
+            confidence=_small((site.ai_confidence or 0) * 1000, 1000),
+            workers=_small(detected.get('workers')),
+            cranes=_small(detected.get('cranes')),
+            trucks=_small(detected.get('trucks')),
+        ))
+    ConstructionObservation.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0021_face_embeddings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='constructionmission',
+            name='predicted_completion',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='ConstructionObservation',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('observed_at', models.DateTimeField()),
+                ('stage', models.PositiveSmallIntegerField()),
+                ('progress', models.PositiveSmallIntegerField()),
+                ('confidence', models.PositiveSmallIntegerField()),
+                ('workers', models.PositiveSmallIntegerField(default=0)),
+                ('cranes', models.PositiveSmallIntegerField(default=0)),
+                ('trucks', models.PositiveSmallIntegerField(default=0)),
+                ('site', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='observations', to='smartcity_app.constructionsite')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['site', 'observed_at'], name='constructionobs_site_ts_idx')],
+            },
+        ),
+        migrations.RunPython(observe_existing_sites, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,35 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:47
+
+from django.db import migrations, models
+
+
+def scope_notification_changes(apps, schema_editor):
+    # Journaled notifications get their owner; tombstones of notifications
+    # already gone cannot be attributed and are dropped
+    SyncChange = apps.get_model('smartcity_app', 'SyncChange')
+    Notification = apps.get_model('smartcity_app', 'Notification')
+    owners = {str(pk): user_id for pk, user_id in Notification.objects.values_list('id', 'user_id')}
+    orphans = []
+    for change in SyncChange.objects.filter(model='notifications').only('seq', 'object_id').iterator():
+        owner = owners.get(change.object_id)
+        if owner is None:
+            orphans.append(change.seq)
+        else:
+            SyncChange.objects.filter(seq=change.seq).update(user_id=owner)
+    SyncChange.objects.filter(seq__in=orphans).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0022_construction_observations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='syncchange',
+            name='user_id',
+            field=models.UUIDField(blank=True, null=True),
+        ),
+        migrations.RunPython(scope_notification_changes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:05
+
+from django.db import migrations
+from django.db.models import Count, Q
+
+OPEN_STATUSES = ('NEW', 'ASSIGNED', 'PROCESSING')
+
+
+def rebuild_loads(apps, schema_editor):
+    # current_load is kept up to date by dispatch since 0018; start it from
+    # the requests already open, like dispatch_call_requests --rebuild-load
+    ResponsibleOrg = apps.get_model('smartcity_app', 'ResponsibleOrg')
+    orgs = list(ResponsibleOrg.objects.annotate(
+        open_requests=Count('call_requests', filter=Q(call_requests__status__in=OPEN_STATUSES)),
+    ))
+    changed = [org for org in orgs if org.current_load != org.open_requests]
+    for org in changed:
+        org.current_load = float(org.open_requests)
+    ResponsibleOrg.objects.bulk_update(changed, ['current_load'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0023_sync_change_user'),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_loads, migrations.RunPython.noop),
+    ]
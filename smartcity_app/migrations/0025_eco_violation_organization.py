@@ -0,0 +1,19 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:52
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('smartcity_app', '0024_rebuild_org_loads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ecoviolation',
+            name='organization',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='eco_violations', to='smartcity_app.organization'),
+        ),
+    ]
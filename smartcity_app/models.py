@@ -105,6 +105,14 @@ class WasteBin(models.Model):
     device_health = models.JSONField(default=dict)
     qr_code_url = models.URLField(blank=True, null=True)
 
+    class Meta:
+        indexes = [
+            # Partial index: boolean filters compile to "NOT is_full", which a
+            # plain index on is_full can't serve
+            models.Index(fields=['organization'], condition=models.Q(is_full=False), name='wastebin_org_not_full_idx'),
+            models.Index(fields=['toza_hudud'], name='wastebin_toza_hudud_idx'),
+        ]
+
 
 class IoTDevice(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
@@ -121,6 +129,8 @@ class IoTDevice(models.Model):
     current_temperature = models.FloatField(null=True, blank=True)
     current_humidity = models.FloatField(null=True, blank=True)
     last_sensor_update = models.DateTimeField(null=True, blank=True)
+    # Reporting interval announced by the device, used for offline detection
+    sleep_seconds = models.PositiveIntegerField(null=True, blank=True)
     
     def __str__(self):
         return f"{self.device_id} - {self.device_type}"
@@ -144,6 +154,14 @@ class Truck(models.Model):
     fuel_level = models.IntegerField(default=100)
     login = models.CharField(max_length=150)
     password = models.CharField(max_length=128)  # In production, use Django's password hashing
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['organization', 'status'], name='truck_org_status_idx'),
+            models.Index(fields=['status'], name='truck_status_idx'),
+            models.Index(fields=['toza_hudud'], name='truck_toza_hudud_idx'),
+            models.Index(fields=['login'], name='truck_login_idx'),
+        ]
     
     def __str__(self):
         return f"Truck {self.plate_number} - {self.driver_name}"
@@ -186,6 +204,11 @@ class Facility(models.Model):
     history = models.JSONField()  # Stores history as a list of values
     boilers = models.ManyToManyField('Boiler', related_name='facilities')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['type'], name='facility_type_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -240,6 +263,11 @@ class AirSensor(models.Model):
     co2 = models.FloatField()
     status = models.CharField(max_length=20, choices=MoistureSensor.SENSOR_STATUS_CHOICES)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='airsensor_status_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -265,6 +293,11 @@ class SOSColumn(models.Model):
     ai_detected_objects = models.JSONField(null=True, blank=True)  # List of detected objects
     ai_keywords = models.JSONField(null=True, blank=True)  # List of keywords
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='soscolumn_status_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -276,6 +309,9 @@ class EcoViolation(models.Model):
     ]
     
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    # Set for violations reported by an organization user; face search stays within it
+    organization = models.ForeignKey(Organization, on_delete=models.CASCADE, related_name='eco_violations',
+                                     null=True, blank=True)
     location_name = models.CharField(max_length=255)
     mfy = models.CharField(max_length=100)
     timestamp = models.DateTimeField()
@@ -290,10 +326,26 @@ class EcoViolation(models.Model):
     estimated_age = models.IntegerField(null=True, blank=True)
     gender = models.CharField(max_length=10, choices=GENDER_CHOICES, null=True, blank=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='ecoviolation_timestamp_idx'),
+            models.Index(fields=['mfy', 'timestamp'], name='ecoviolation_mfy_ts_idx'),
+        ]
+
     def __str__(self):
         return f"Eco Violation at {self.location_name}"
 
 
+class FaceEmbedding(models.Model):
+    """Detector face embedding of a violation, L2-normalized float32 bytes (see face_index.py)"""
+    id = models.BigAutoField(primary_key=True)
+    violation = models.OneToOneField(EcoViolation, on_delete=models.CASCADE, related_name='face_embedding')
+    vector = models.BinaryField()
+
+    def __str__(self):
+        return f"Face embedding of {self.violation_id}"
+
+
 class ConstructionMission(models.Model):
     CONSTRUCTION_STAGE_CHOICES = [
         ('KOTLOVAN', 'Kotlovan'),
@@ -316,6 +368,8 @@ class ConstructionMission(models.Model):
     deadline = models.DateTimeField()
     status = models.CharField(max_length=20, choices=MISSION_STATUS_CHOICES, default='PENDING')
     progress = models.FloatField()  # 0-100 percentage
+    # Expected end of the stage at the current pace, see construction.py
+    predicted_completion = models.DateTimeField(null=True, blank=True)
 
     def __str__(self):
         return self.stage_name
@@ -341,10 +395,41 @@ class ConstructionSite(models.Model):
     detected_objects = models.JSONField()  # {"workers": int, "cranes": int, "trucks": int}
     missions = models.ManyToManyField(ConstructionMission, related_name='construction_sites')
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='constructionsite_status_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
 
+class ConstructionObservation(models.Model):
+    """
+    Append-only history of a site's AI readings, one row per change, see
+    construction.py. Values are packed into small integers: stage is the
+    index in CONSTRUCTION_STAGE_CHOICES, progress is in tenths of a percent
+    and confidence in thousandths.
+    """
+    id = models.BigAutoField(primary_key=True)
+    site = models.ForeignKey(ConstructionSite, on_delete=models.CASCADE, related_name='observations')
+    observed_at = models.DateTimeField()
+    stage = models.PositiveSmallIntegerField()
+    progress = models.PositiveSmallIntegerField()
+    confidence = models.PositiveSmallIntegerField()
+    workers = models.PositiveSmallIntegerField(default=0)
+    cranes = models.PositiveSmallIntegerField(default=0)
+    trucks = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['site', 'observed_at'], name='constructionobs_site_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.site_id} @ {self.observed_at}"
+
+
 class LightROI(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     x = models.FloatField()
@@ -411,19 +496,108 @@ class Bus(models.Model):
     driver_fatigue_level = models.CharField(max_length=20, choices=DRIVER_FATIGUE_CHOICES)
     next_stop = models.CharField(max_length=100)
     cctv_urls = models.JSONField()  # {"front": url, "driver": url, "cabin": url}
+    # Time of the last tracker reading persisted from the live telemetry store
+    last_telemetry_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='bus_status_idx'),
+            models.Index(fields=['last_telemetry_at'], name='bus_telemetry_at_idx'),
+        ]
 
     def __str__(self):
         return f"Bus {self.route_number} - {self.plate_number}"
 
 
+class BusRoute(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    route_number = models.CharField(max_length=20, unique=True)
+    name = models.CharField(max_length=255, blank=True)
+    # Refreshed by the build_route_stats command
+    stats_updated_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Route {self.route_number}"
+
+
+class BusStop(models.Model):
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    route = models.ForeignKey(BusRoute, on_delete=models.CASCADE, related_name='stops')
+    sequence = models.PositiveIntegerField()
+    name = models.CharField(max_length=100)
+    lat = models.FloatField()
+    lng = models.FloatField()
+    # Travel time from the previous stop, learned from the track history
+    travel_seconds_mean = models.FloatField(null=True, blank=True)
+    travel_seconds_std = models.FloatField(null=True, blank=True)
+    travel_samples = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['route', 'sequence']
+        constraints = [
+            models.UniqueConstraint(fields=['route', 'sequence'], name='busstop_route_sequence_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.route.route_number} #{self.sequence} {self.name}"
+
+
+class VehicleTrackPoint(models.Model):
+    """Location history of buses and trucks, appended in batches by the telemetry ingest"""
+    VEHICLE_TYPE_CHOICES = [
+        ('BUS', 'Bus'),
+        ('TRUCK', 'Truck'),
+    ]
+
+    id = models.BigAutoField(primary_key=True)
+    vehicle_type = models.CharField(max_length=10, choices=VEHICLE_TYPE_CHOICES)
+    vehicle_id = models.UUIDField()
+    timestamp = models.DateTimeField()
+    lat = models.FloatField()
+    lng = models.FloatField()
+    speed = models.FloatField(null=True, blank=True)
+    bearing = models.FloatField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['vehicle_type', 'vehicle_id', 'timestamp'], name='trackpoint_vehicle_ts_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle_type} {self.vehicle_id} @ {self.timestamp}"
+
+
+class VehicleTrackChunk(models.Model):
+    """One vehicle's simplified and delta/varint encoded track of one hour, see track_store.py"""
+    id = models.BigAutoField(primary_key=True)
+    vehicle_type = models.CharField(max_length=10, choices=VehicleTrackPoint.VEHICLE_TYPE_CHOICES)
+    vehicle_id = models.UUIDField()
+    hour = models.DateTimeField()
+    point_count = models.PositiveIntegerField()
+    raw_point_count = models.PositiveIntegerField()
+    data = models.BinaryField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['vehicle_type', 'vehicle_id', 'hour'], name='trackchunk_vehicle_hour_uniq'),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle_type} {self.vehicle_id} @ {self.hour} ({self.point_count} points)"
+
+
 class ResponsibleOrg(models.Model):
     id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
     name = models.CharField(max_length=255)
     type = models.CharField(max_length=100)
     active_brigades = models.IntegerField()
     total_brigades = models.IntegerField()
-    current_load = models.FloatField()
+    current_load = models.FloatField()  # open call requests, kept up to date by dispatch.py
     contact_phone = models.CharField(max_length=20)
+    # Call request categories the organization is dispatched (see dispatch.py)
+    categories = models.JSONField(default=list, blank=True)
+    lat = models.FloatField(null=True, blank=True)
+    lng = models.FloatField(null=True, blank=True)
 
     def __str__(self):
         return self.name
@@ -451,21 +625,57 @@ class CallRequest(models.Model):
     citizen_name = models.CharField(max_length=100)
     phone = models.CharField(max_length=20)
     transcript = models.TextField()
-    category = models.CharField(max_length=20, choices=REQUEST_CATEGORY_CHOICES)
+    category = models.CharField(max_length=20, choices=REQUEST_CATEGORY_CHOICES, blank=True)  # blank: set by triage
     status = models.CharField(max_length=20, choices=REQUEST_STATUS_CHOICES, default='NEW')
     timestamp = models.DateTimeField()
     address = models.CharField(max_length=255, null=True, blank=True)
+    lat = models.FloatField(null=True, blank=True)
+    lng = models.FloatField(null=True, blank=True)
     mfy = models.CharField(max_length=100)
-    ai_summary = models.TextField()
-    keywords = models.JSONField()  # List of keywords
+    ai_summary = models.TextField(blank=True, default='')
+    keywords = models.JSONField(blank=True, default=list)  # List of keywords
     citizen_trust_score = models.FloatField()
     assigned_org = models.ForeignKey(Organization, on_delete=models.SET_NULL, null=True, blank=True, related_name='assigned_requests')
     deadline = models.DateTimeField(null=True, blank=True)
+    # Brigade organization the request was dispatched to (see dispatch.py)
+    responsible_org = models.ForeignKey(ResponsibleOrg, on_delete=models.SET_NULL, null=True, blank=True, related_name='call_requests')
+    assigned_at = models.DateTimeField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    # Server-side triage (see triage.py); null until the request has been triaged
+    triaged_at = models.DateTimeField(null=True, blank=True)
+    triage_confidence = models.FloatField(null=True, blank=True)
+    # Canonical request of the same incident (see dedup.py)
+    duplicate_of = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='duplicates')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'timestamp'], name='callrequest_status_ts_idx'),
+            models.Index(fields=['timestamp'], name='callrequest_timestamp_idx'),
+            models.Index(fields=['timestamp'], name='callrequest_untriaged_idx',
+                         condition=models.Q(triaged_at__isnull=True)),
+        ]
 
     def __str__(self):
         return f"Call Request from {self.citizen_name}"
 
 
+class CallRequestBand(models.Model):
+    """MinHash LSH band of a recent call request's transcript, looked up by value to find near-duplicates"""
+    id = models.BigAutoField(primary_key=True)
+    call_request = models.ForeignKey(CallRequest, on_delete=models.CASCADE, related_name='lsh_bands')
+    band = models.BigIntegerField()
+    created_at = models.DateTimeField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['band'], name='callrequestband_band_idx'),
+            models.Index(fields=['created_at'], name='callrequestband_created_idx'),
+        ]
+
+    def __str__(self):
+        return f"Band {self.band} of {self.call_request_id}"
+
+
 class CallRequestTimeline(models.Model):
     """
     Timeline entries for call requests
@@ -500,6 +710,15 @@ class Notification(models.Model):
     type = models.CharField(max_length=20, choices=NOTIFICATION_TYPE_CHOICES)
     read = models.BooleanField(default=False)
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='notifications')
+    # Repeats of an unread alert with the same key are collapsed into one row
+    dedup_key = models.CharField(max_length=255, null=True, blank=True)
+    occurrences = models.PositiveIntegerField(default=1)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'timestamp'], condition=models.Q(read=False), name='notification_unread_idx'),
+            models.Index(fields=['dedup_key', 'user'], condition=models.Q(read=False), name='notification_dedup_idx'),
+        ]
 
     def __str__(self):
         return self.title
@@ -517,6 +736,12 @@ class ReportEntry(models.Model):
     status = models.CharField(max_length=20, choices=MoistureSensor.SENSOR_STATUS_CHOICES)
     responsible = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['timestamp'], name='reportentry_timestamp_idx'),
+            models.Index(fields=['mfy', 'timestamp'], name='reportentry_mfy_ts_idx'),
+        ]
+
     def __str__(self):
         return f"Report: {self.location_name} - {self.metric_label}"
 
@@ -545,5 +770,75 @@ class UtilityNode(models.Model):
     capacity = models.CharField(max_length=50)
     active_tickets = models.IntegerField()
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['status'], name='utilitynode_status_idx'),
+            models.Index(fields=['type'], name='utilitynode_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} - {self.type}"
+
+class ReportEntryAggregate(models.Model):
+    """
+    Pre-computed ReportEntry counts per (day, mfy, category, status).
+    Kept up to date incrementally by signals; rebuilt with the
+    rebuild_report_aggregates management command.
+    """
+    id = models.BigAutoField(primary_key=True)
+    day = models.DateField()
+    mfy = models.CharField(max_length=100)
+    category = models.CharField(max_length=100)
+    status = models.CharField(max_length=20, choices=MoistureSensor.SENSOR_STATUS_CHOICES)
+    entry_count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['day', 'mfy', 'category', 'status'], name='unique_report_aggregate_key'),
+        ]
+        indexes = [
+            models.Index(fields=['mfy', 'day'], name='report_agg_mfy_day_idx'),
+            models.Index(fields=['category', 'day'], name='report_agg_category_day_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.day} {self.mfy} {self.category} {self.status}: {self.entry_count}"
+
+
+class SyncChange(models.Model):
+    """
+    Change journal for delta sync. Every save or delete of a syncable
+    object replaces its previous row in the same organization, so ``seq``
+    always holds the object's latest change and deletes remain as
+    tombstones. Moving an object to another organization leaves a
+    tombstone in the old one (see sync.py).
+    """
+    seq = models.BigAutoField(primary_key=True)
+    model = models.CharField(max_length=50)
+    object_id = models.CharField(max_length=64)
+    organization_id = models.UUIDField(null=True, blank=True)
+    # Owner of a per-user object (notifications), None for shared objects
+    user_id = models.UUIDField(null=True, blank=True)
+    deleted = models.BooleanField(default=False)
+    timestamp = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['model', 'object_id'], name='syncchange_object_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.seq} {self.model} {self.object_id}{' (deleted)' if self.deleted else ''}"
+
+
+class ModelVersion(models.Model):
+    """
+    Per-table change counter, bumped after every committed save or delete
+    of a model of this app. Used to build ETags without serializing.
+    """
+    model = models.CharField(max_length=100, primary_key=True)
+    version = models.BigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self):
-        return f"{self.name} - {self.type}"
\ No newline at end of file
+        return f"{self.model} v{self.version}"
@@ -0,0 +1,146 @@
+"""
+Notification service: fan-out, collapsing of repeated alerts and
+per-user reads.
+
+Notification.user points at smartcity_app.User while logins use Django's
+auth User; recipients are mirrored into smartcity_app.User by username.
+The users of an organization are its own login and the driver logins of
+its trucks.
+
+Notifications are fanned out with one bulk insert. A message with a
+``dedup_key`` that the recipient still has unread from the last
+NOTIFICATION_COLLAPSE_SECONDS is not inserted again: the existing row gets
+the new title/message and its ``occurrences`` count goes up. An alert
+storm therefore costs at most one row per recipient and key.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User as AuthUser
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Notification, Organization, Truck, User
+from .signals import bulk_saved
+
+
+class Message:
+    def __init__(self, title, message, type='INFO', dedup_key=None):
+        self.title = title
+        self.message = message
+        self.type = type
+        self.dedup_key = dedup_key
+
+
+def recipients_for(usernames):
+    """The smartcity_app.User of each username, created in bulk where missing"""
+    usernames = set(usernames)
+    users = list(User.objects.filter(username__in=usernames))
+    missing = usernames - {user.username for user in users}
+    if missing:
+        User.objects.bulk_create([User(username=username) for username in sorted(missing)], ignore_conflicts=True)
+        users = list(User.objects.filter(username__in=usernames))
+    return users
+
+
+def recipient_for(auth_user):
+    """The smartcity_app.User notifications of ``auth_user`` are addressed to"""
+    return recipients_for([auth_user.username])[0]
+
+
+def operator_recipients():
+    """City operators: the superadmin login plus Django staff and superusers"""
+    operators = AuthUser.objects.filter(Q(username='superadmin') | Q(is_staff=True) | Q(is_superuser=True), is_active=True)
+    return recipients_for(operators.values_list('username', flat=True))
+
+
+def organization_recipients(organization_id):
+    """The organization's own login and its trucks' driver logins"""
+    usernames = set(Organization.objects.filter(pk=organization_id).values_list('login', flat=True))
+    usernames.update(Truck.objects.filter(organization_id=organization_id).exclude(login='').values_list('login', flat=True))
+    return recipients_for(usernames)
+
+
+def _collapse_window():
+    return timedelta(seconds=getattr(settings, 'NOTIFICATION_COLLAPSE_SECONDS', 600))
+
+
+def deliver(recipients, messages):
+    """
+    Send every message to every recipient: repeats of unread messages with
+    the same dedup_key are collapsed, the rest inserted in one query.
+    Returns the number of new rows.
+    """
+    if not recipients or not messages:
+        return 0
+    user_ids = [user.pk for user in recipients]
+    since = timezone.now() - _collapse_window()
+    new_rows = []
+    collapsed = []
+
+    with transaction.atomic():
+        for message in messages:
+            pending_users = set(user_ids)
+            if message.dedup_key:
+                existing = list(
+                    Notification.objects.filter(dedup_key=message.dedup_key, user_id__in=user_ids, read=False,
+                                                timestamp__gte=since)
+                    .only('id', 'user_id')
+                )
+                if existing:
+                    Notification.objects.filter(pk__in=[row.pk for row in existing]).update(
+                        title=message.title,
+                        message=message.message,
+                        type=message.type,
+                        timestamp=timezone.now(),
+                        occurrences=F('occurrences') + 1,
+                    )
+                    collapsed.extend(existing)
+                    pending_users -= {row.user_id for row in existing}
+            new_rows.extend(
+                Notification(user_id=user_id, title=message.title, message=message.message, type=message.type,
+                             dedup_key=message.dedup_key)
+                for user_id in user_ids if user_id in pending_users
+            )
+
+        created = Notification.objects.bulk_create(new_rows, batch_size=500)
+        if created or collapsed:
+            bulk_saved(Notification, created + collapsed)
+    return len(created)
+
+
+def notify(recipients, title, message, type='INFO', dedup_key=None):
+    return deliver(recipients, [Message(title, message, type, dedup_key)])
+
+
+def notify_operators(messages):
+    """Send ``messages`` (a list of Message) to every operator"""
+    return deliver(operator_recipients(), messages)
+
+
+def notify_organization(organization_id, messages):
+    """Send ``messages`` (a list of Message) to every user of an organization"""
+    return deliver(organization_recipients(organization_id), messages)
+
+
+def unread_for(auth_user):
+    """Unread notifications of a login, newest first"""
+    return Notification.objects.filter(user__username=auth_user.username, read=False).order_by('-timestamp')
+
+
+def mark_read(auth_user, ids=None):
+    """
+    Mark the login's unread notifications as read, only those in ``ids``
+    when given. Returns the number of notifications marked.
+    """
+    notifications = unread_for(auth_user)
+    if ids is not None:
+        notifications = notifications.filter(pk__in=ids)
+    with transaction.atomic():
+        marked = list(notifications.only('id'))
+        if marked:
+            Notification.objects.filter(pk__in=[row.pk for row in marked]).update(read=True)
+            bulk_saved(Notification, marked)
+    return len(marked)
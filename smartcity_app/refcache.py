@@ -0,0 +1,106 @@
+"""
+Cache of pre-rendered JSON for read-heavy reference data (regions,
+districts, organizations, light ROIs, responsible organizations).
+
+Entries are keyed by the ModelVersion of every table they are built from,
+so a committed write (signals bump the version) makes the next request
+render and store a fresh entry; outdated entries simply expire. Serving a
+cached list costs one version lookup instead of the queries and nested
+serialization. Use a shared cache backend (REDIS_URL) to share entries
+between worker processes.
+"""
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .models import District, LightROI, Organization, Region, ResponsibleOrg
+from .serializers import (
+    DistrictSerializer, LightROISerializer, OrganizationSerializer,
+    RegionSerializer, ResponsibleOrgSerializer
+)
+from .streaming import json_encoder
+from .versioning import current_versions
+
+CACHE_KEY_PREFIX = 'refdata'
+
+
+class ReferenceData:
+    """
+    One cached reference list. ``queryset`` takes the scope (None, a
+    region id or an organization id) and returns the rows to render.
+    """
+
+    def __init__(self, models, serializer_class, queryset):
+        self.models = models
+        self.serializer_class = serializer_class
+        self.queryset = queryset
+
+
+REFERENCE_DATA = {
+    'regions': ReferenceData(
+        (Region,), RegionSerializer,
+        lambda scope: Region.objects.select_related('center'),
+    ),
+    'districts': ReferenceData(
+        (District, Region), DistrictSerializer,
+        lambda scope: District.objects.select_related('center', 'region__center'),
+    ),
+    'region-districts': ReferenceData(
+        (District, Region), DistrictSerializer,
+        lambda region_id: District.objects.filter(region_id=region_id).select_related('center', 'region__center'),
+    ),
+    'organizations': ReferenceData(
+        (Organization,), OrganizationSerializer,
+        lambda organization_id: (
+            Organization.objects.filter(id=organization_id) if organization_id else Organization.objects.all()
+        ).select_related('center'),
+    ),
+    'light-rois': ReferenceData(
+        (LightROI,), LightROISerializer,
+        lambda scope: LightROI.objects.all(),
+    ),
+    'responsible-orgs': ReferenceData(
+        (ResponsibleOrg,), ResponsibleOrgSerializer,
+        lambda scope: ResponsibleOrg.objects.all(),
+    ),
+}
+
+
+def _cache():
+    return caches[getattr(settings, 'REFERENCE_CACHE_ALIAS', 'default')]
+
+
+def cache_key(name, scope=None):
+    versions = current_versions(REFERENCE_DATA[name].models)
+    stamp = '.'.join(str(version) for version in versions.values())
+    return f'{CACHE_KEY_PREFIX}:{name}:{scope or "all"}:{stamp}'
+
+
+def render(name, scope=None):
+    """Return the JSON array of reference list ``name`` as bytes, from cache when current"""
+    reference = REFERENCE_DATA[name]
+    key = cache_key(name, scope)
+    cache = _cache()
+    body = cache.get(key)
+    if body is None:
+        data = reference.serializer_class(reference.queryset(scope), many=True).data
+        body = json_encoder().encode(data).encode('utf-8')
+        cache.set(key, body, getattr(settings, 'REFERENCE_CACHE_TIMEOUT', 24 * 60 * 60))
+    return body
+
+
+def reference_response(name, scope=None):
+    return HttpResponse(render(name, scope), content_type='application/json')
+
+
+def warm():
+    """Render every unscoped list and the districts of every region; returns the entry count"""
+    count = 0
+    for name in ('regions', 'districts', 'organizations', 'light-rois', 'responsible-orgs'):
+        render(name)
+        count += 1
+    for region_id in Region.objects.values_list('pk', flat=True):
+        render('region-districts', str(region_id))
+        count += 1
+    return count
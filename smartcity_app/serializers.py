@@ -5,8 +5,10 @@ from .models import (
     MoistureSensor, Room, Boiler, Facility, AirSensor, SOSColumn, 
     EcoViolation, ConstructionMission, ConstructionSite, LightROI, 
     LightPole, Bus, ResponsibleOrg, CallRequest, CallRequestTimeline, 
-    Notification, ReportEntry, UtilityNode, DeviceHealth, IoTDevice
+    Notification, ReportEntry, UtilityNode, DeviceHealth, IoTDevice, BusRoute, BusStop,
+    ConstructionObservation
 )
+from . import face_index
 
 
 class CoordinateSerializer(serializers.ModelSerializer):
@@ -521,15 +523,69 @@ class SOSColumnSerializer(serializers.ModelSerializer):
 
 
 class EcoViolationSerializer(serializers.ModelSerializer):
+    # Supplied by the detector; stored in the face index, never returned
+    face_embedding = serializers.ListField(child=serializers.FloatField(), write_only=True, required=False)
+
     class Meta:
         model = EcoViolation
         fields = '__all__'
 
+    def validate_face_embedding(self, value):
+        try:
+            return face_index.normalize(value)
+        except face_index.FaceIndexError as e:
+            raise serializers.ValidationError(str(e))
+
+    def _match_offender(self, validated_data, vector, exclude=()):
+        # A repeat offender takes the identity of the closest known face
+        if vector is None or validated_data.get('face_id') or (self.instance is not None and self.instance.face_id):
+            return
+        # Identities are only shared within the organization of the violation
+        organization = validated_data.get('organization', self.instance.organization if self.instance else None)
+        match = face_index.best_match(vector, exclude=exclude, organization_id=organization.pk if organization else None)
+        if match is None:
+            return
+        known = EcoViolation.objects.filter(pk=match[0]).values('face_id', 'offender_name').first()
+        if known and known['face_id']:
+            validated_data['face_id'] = known['face_id']
+            validated_data.setdefault('offender_name', known['offender_name'])
+            validated_data['match_score'] = match[1]
+
+    def create(self, validated_data):
+        vector = validated_data.pop('face_embedding', None)
+        self._match_offender(validated_data, vector)
+        violation = super().create(validated_data)
+        if vector is not None:
+            face_index.store(violation, vector)
+        return violation
+
+    def update(self, instance, validated_data):
+        vector = validated_data.pop('face_embedding', None)
+        self._match_offender(validated_data, vector, exclude=[instance.pk])
+        violation = super().update(instance, validated_data)
+        if vector is not None:
+            face_index.store(violation, vector)
+        return violation
+
 
 class ConstructionMissionSerializer(serializers.ModelSerializer):
     class Meta:
         model = ConstructionMission
         fields = '__all__'
+        read_only_fields = ['predicted_completion']
+
+
+class ConstructionObservationSerializer(serializers.ModelSerializer):
+    """An observation unpacked to the units of ConstructionSite"""
+    class Meta:
+        model = ConstructionObservation
+        fields = ['observed_at']
+
+    def to_representation(self, instance):
+        from .construction import decode
+        data = decode(instance)
+        data['observed_at'] = serializers.DateTimeField().to_representation(instance.observed_at)
+        return data
 
 
 class ConstructionSiteSerializer(serializers.ModelSerializer):
@@ -645,10 +701,35 @@ class BusSerializer(serializers.ModelSerializer):
         return instance
 
 
+class BusStopSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = BusStop
+        fields = ['id', 'sequence', 'name', 'lat', 'lng', 'travel_seconds_mean', 'travel_seconds_std', 'travel_samples']
+        read_only_fields = ['travel_seconds_mean', 'travel_seconds_std', 'travel_samples']
+
+
+class BusRouteSerializer(serializers.ModelSerializer):
+    stops = BusStopSerializer(many=True)
+
+    class Meta:
+        model = BusRoute
+        fields = ['id', 'route_number', 'name', 'stats_updated_at', 'stops']
+        read_only_fields = ['stats_updated_at']
+
+    def create(self, validated_data):
+        stops_data = validated_data.pop('stops')
+        route = BusRoute.objects.create(**validated_data)
+        for stop_data in stops_data:
+            BusStop.objects.create(route=route, **stop_data)
+        return route
+
+
 class ResponsibleOrgSerializer(serializers.ModelSerializer):
     class Meta:
         model = ResponsibleOrg
         fields = '__all__'
+        # Maintained by dispatch from the organization's open requests
+        read_only_fields = ['current_load']
 
 
 class CallRequestTimelineSerializer(serializers.ModelSerializer):
@@ -663,6 +744,21 @@ class CallRequestSerializer(serializers.ModelSerializer):
     class Meta:
         model = CallRequest
         fields = '__all__'
+        read_only_fields = ('triaged_at', 'triage_confidence', 'assigned_at', 'resolved_at')
+
+
+class CallRequestSLASerializer(CallRequestSerializer):
+    """CallRequest with the SLA annotations of sla.with_sla(), durations in seconds"""
+    time_to_assign = serializers.SerializerMethodField()
+    time_to_resolve = serializers.SerializerMethodField()
+    overdue = serializers.BooleanField(source='is_overdue', read_only=True, allow_null=True)
+    duplicate_count = serializers.IntegerField(read_only=True)
+
+    def get_time_to_assign(self, obj):
+        return obj.time_to_assign.total_seconds() if obj.time_to_assign is not None else None
+
+    def get_time_to_resolve(self, obj):
+        return obj.time_to_resolve.total_seconds() if obj.time_to_resolve is not None else None
 
 
 class NotificationSerializer(serializers.ModelSerializer):
@@ -0,0 +1,202 @@
+"""
+Model signal receivers for smartcity_app.
+Connected from SmartcityAppConfig.ready().
+"""
+
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, events, sync, versioning
+from .models import (
+    Boiler, Bus, CallRequest, ConstructionSite, Coordinate, District, EcoViolation, IoTDevice, Organization, Region,
+    ReportEntry, Room, Truck, WasteBin,
+)
+
+PUSH_MODELS = (WasteBin, Truck, IoTDevice, Room, Boiler)
+
+
+@receiver(pre_save, sender=ReportEntry)
+def remember_report_entry_key(sender, instance, **kwargs):
+    # Remember the aggregate key the row had before this save
+    instance._previous_aggregate_key = None
+    if not instance._state.adding:
+        old = sender.objects.filter(pk=instance.pk).values('timestamp', 'mfy', 'category', 'status').first()
+        if old:
+            instance._previous_aggregate_key = aggregates.aggregate_key(**old)
+
+
+@receiver(post_save, sender=ReportEntry)
+def update_report_aggregates_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    new_key = aggregates.entry_key(instance)
+    old_key = getattr(instance, '_previous_aggregate_key', None)
+    if created:
+        aggregates.apply_delta(new_key, 1)
+    elif old_key is not None and old_key != new_key:
+        aggregates.apply_delta(old_key, -1)
+        aggregates.apply_delta(new_key, 1)
+
+
+@receiver(post_delete, sender=ReportEntry)
+def update_report_aggregates_on_delete(sender, instance, **kwargs):
+    aggregates.apply_delta(aggregates.entry_key(instance), -1)
+
+
+def bulk_saved(model, instances):
+    """
+    Side effects the post_save receivers would have had for ``instances``,
+    for code paths that write with bulk_create/bulk_update/QuerySet.update()
+    """
+    if not instances:
+        return
+    versioning.bump_version(model)
+    if model in sync.SYNC_KEYS:
+        sync.record_changes(instances)
+    if model.__name__ in events.EVENT_SNAPSHOTS:
+        for instance in instances:
+            events.publish_instance(instance)
+
+
+def publish_change_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        events.publish_instance(instance)
+
+
+def publish_change_on_delete(sender, instance, **kwargs):
+    events.publish_instance(instance, deleted=True)
+
+
+for model in PUSH_MODELS:
+    post_save.connect(publish_change_on_save, sender=model, dispatch_uid=f'push_save_{model.__name__}')
+    post_delete.connect(publish_change_on_delete, sender=model, dispatch_uid=f'push_delete_{model.__name__}')
+
+
+def record_sync_change_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        sync.record_change(instance)
+
+
+def record_sync_change_on_delete(sender, instance, **kwargs):
+    sync.record_change(instance, deleted=True)
+
+
+for model in sync.SYNC_MODELS.values():
+    post_save.connect(record_sync_change_on_save, sender=model.model, dispatch_uid=f'sync_save_{model.model.__name__}')
+    post_delete.connect(record_sync_change_on_delete, sender=model.model, dispatch_uid=f'sync_delete_{model.model.__name__}')
+
+
+def bump_table_version(sender, **kwargs):
+    versioning.bump_version(sender)
+
+
+# Per model: a sender-less post_delete receiver would turn off fast deletes of every model
+for model in apps.get_app_config('smartcity_app').get_models():
+    if versioning.is_versioned(model):
+        post_save.connect(bump_table_version, sender=model, dispatch_uid=f'version_save_{model.__name__}')
+        post_delete.connect(bump_table_version, sender=model, dispatch_uid=f'version_delete_{model.__name__}')
+
+
+@receiver(m2m_changed, dispatch_uid='version_m2m')
+def bump_table_version_on_m2m_change(sender, instance, action, model, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        changed = [m for m in (type(instance), model) if versioning.is_versioned(m)]
+        if changed:
+            versioning.bump_version(*changed)
+
+
+@receiver(post_save, sender=Coordinate, dispatch_uid='version_center_coordinate')
+def bump_center_owner_version(sender, instance, created, raw=False, **kwargs):
+    # Region, district and organization responses embed their center. Version
+    # them on center edits instead of on every coordinate change (truck moves).
+    if created or raw:
+        return
+    owners = Coordinate.objects.filter(pk=instance.pk).values_list('region', 'district', 'organization').first()
+    changed = [model for model, owner in zip((Region, District, Organization), owners or ()) if owner]
+    if changed:
+        versioning.bump_version(*changed)
+
+
+@receiver(post_save, sender=Bus, dispatch_uid='bus_telemetry_details')
+def update_live_bus_details(sender, instance, raw=False, **kwargs):
+    # Imported here: bus_telemetry imports this module
+    from .bus_telemetry import loaded_store
+    store = loaded_store()
+    if store is not None and not raw:
+        store.set_details(instance)
+
+
+@receiver(post_delete, sender=Bus, dispatch_uid='bus_telemetry_delete')
+def remove_live_bus(sender, instance, **kwargs):
+    from .bus_telemetry import loaded_store
+    store = loaded_store()
+    if store is not None:
+        store.remove(instance.pk)
+
+
+@receiver(post_save, sender=CallRequest, dispatch_uid='call_request_triage')
+def triage_new_call_request(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.triaged_at is None:
+        from .triage import get_worker
+        transaction.on_commit(get_worker().wake)
+
+
+@receiver(pre_save, sender=CallRequest, dispatch_uid='call_request_load_before')
+def remember_call_request_load(sender, instance, raw=False, **kwargs):
+    from .dispatch import load_key
+    from .sla import stamp_progress
+    previous = None
+    if not instance._state.adding:
+        previous = CallRequest.objects.filter(pk=instance.pk).values_list('status', 'responsible_org_id').first()
+    instance._previous_load_key = load_key(*previous) if previous else None
+    instance._previous_status = previous[0] if previous else None
+    if not raw:
+        stamp_progress(instance, previous[0] if previous else None)
+
+
+@receiver(post_save, sender=CallRequest, dispatch_uid='call_request_load_after')
+def update_responsible_org_load(sender, instance, raw=False, **kwargs):
+    # Saves that open, close or move a dispatched request; the dispatcher
+    # itself bulk-updates and adjusts the load directly
+    from .dispatch import load_key, move_load
+    if not raw:
+        move_load(getattr(instance, '_previous_load_key', None), load_key(instance.status, instance.responsible_org_id))
+
+
+@receiver(post_delete, sender=CallRequest, dispatch_uid='call_request_load_delete')
+def release_responsible_org_load(sender, instance, **kwargs):
+    from .dispatch import load_key, move_load
+    move_load(load_key(instance.status, instance.responsible_org_id), None)
+
+
+@receiver(post_save, sender=CallRequest, dispatch_uid='call_request_close_duplicates')
+def close_call_request_duplicates(sender, instance, created, raw=False, **kwargs):
+    if not raw and not created and instance.status != getattr(instance, '_previous_status', instance.status):
+        from .dedup import close_duplicates
+        close_duplicates(instance)
+
+
+@receiver(post_delete, sender=EcoViolation, dispatch_uid='face_index_delete')
+def remove_violation_face(sender, instance, **kwargs):
+    from .face_index import loaded_index
+    index = loaded_index()
+    if index is not None:
+        index.remove(instance.pk)
+
+
+@receiver(pre_save, sender=ConstructionSite, dispatch_uid='construction_site_readings_before')
+def remember_construction_readings(sender, instance, **kwargs):
+    from .construction import OBSERVED_FIELDS
+    instance._previous_readings = None
+    if not instance._state.adding:
+        instance._previous_readings = sender.objects.filter(pk=instance.pk).values(*OBSERVED_FIELDS).first()
+
+
+@receiver(post_save, sender=ConstructionSite, dispatch_uid='construction_site_observation')
+def record_construction_observation(sender, instance, raw=False, **kwargs):
+    # Append-only history of the AI readings, see construction.py
+    from .construction import readings_changed, record
+    if not raw and readings_changed(instance, getattr(instance, '_previous_readings', None)):
+        record([instance])
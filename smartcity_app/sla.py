@@ -0,0 +1,81 @@
+"""
+Service-level metrics of call requests, computed in SQL.
+
+- time_to_assign: assigned_at - timestamp
+- time_to_resolve: resolved_at - timestamp
+- is_overdue: resolved after the deadline, or still open past it (null
+  without a deadline)
+- duplicate_count: repeat calls linked to the request (see dedup.py)
+
+assigned_at is stamped when a request leaves NEW (by the dispatcher or on
+save), resolved_at when it becomes RESOLVED or CLOSED; reopening clears
+it. ``sla_rollup()`` aggregates the same annotations over a filtered
+queryset in one query.
+"""
+
+from django.db.models import (
+    Avg, BooleanField, Case, Count, DateTimeField, DurationField, ExpressionWrapper, F, OuterRef, Q, Subquery,
+    Value, When,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import CallRequest
+
+OPEN_STATUSES = ('NEW', 'ASSIGNED', 'PROCESSING')
+DONE_STATUSES = ('RESOLVED', 'CLOSED')
+
+
+def stamp_progress(call_request, previous_status, now=None):
+    """Set assigned_at/resolved_at of a request about to be saved with a new status"""
+    if call_request.status == previous_status:
+        return
+    now = now or timezone.now()
+    if call_request.status != 'NEW' and call_request.assigned_at is None:
+        call_request.assigned_at = now
+    if call_request.status in DONE_STATUSES:
+        if call_request.resolved_at is None:
+            call_request.resolved_at = now
+    else:
+        call_request.resolved_at = None
+
+
+def with_sla(queryset, now=None):
+    """``queryset`` annotated with time_to_assign, time_to_resolve, is_overdue and duplicate_count"""
+    now = Value(now or timezone.now(), output_field=DateTimeField())
+    return queryset.annotate(
+        time_to_assign=ExpressionWrapper(F('assigned_at') - F('timestamp'), output_field=DurationField()),
+        time_to_resolve=ExpressionWrapper(F('resolved_at') - F('timestamp'), output_field=DurationField()),
+        duplicate_count=Coalesce(
+            Subquery(
+                CallRequest.objects.filter(duplicate_of=OuterRef('pk')).order_by()
+                .values('duplicate_of').annotate(count=Count('pk')).values('count')
+            ),
+            0,
+        ),
+        is_overdue=Case(
+            When(deadline__isnull=True, then=Value(None)),
+            When(resolved_at__isnull=False, then=Q(resolved_at__gt=F('deadline'))),
+            When(status__in=DONE_STATUSES, then=Value(False)),
+            default=Q(deadline__lt=now),
+            output_field=BooleanField(null=True),
+        ),
+    )
+
+
+def _seconds(duration):
+    return round(duration.total_seconds(), 1) if duration is not None else None
+
+
+def sla_rollup(queryset):
+    """Counts and averages of an annotated queryset (see with_sla)"""
+    totals = queryset.order_by().aggregate(
+        total=Count('pk'),
+        open=Count('pk', filter=Q(status__in=OPEN_STATUSES)),
+        overdue=Count('pk', filter=Q(is_overdue=True)),
+        avg_time_to_assign=Avg('time_to_assign'),
+        avg_time_to_resolve=Avg('time_to_resolve'),
+    )
+    totals['avg_time_to_assign'] = _seconds(totals['avg_time_to_assign'])
+    totals['avg_time_to_resolve'] = _seconds(totals['avg_time_to_resolve'])
+    return totals
@@ -0,0 +1,108 @@
+"""
+Streaming JSON responses for large list endpoints.
+
+Rows are pulled from the database with ``QuerySet.iterator()`` and serialized
+one chunk at a time, so memory per request stays proportional to the chunk
+size instead of the table size and the first bytes go out immediately.
+"""
+
+import zlib
+
+from asgiref.sync import sync_to_async
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+DEFAULT_CHUNK_SIZE = 500
+
+
+def json_encoder():
+    # Same output as DRF's JSONRenderer with UNICODE_JSON and COMPACT_JSON on
+    return JSONEncoder(ensure_ascii=False, separators=(',', ':'))
+
+
+def iter_queryset_chunks(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Yield lists of model instances of at most ``chunk_size`` items
+    """
+    chunk = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        chunk.append(obj)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def iter_json_array(queryset, serializer_class, context=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Serialize a queryset as a JSON array, yielding UTF-8 encoded pieces
+    """
+    encoder = json_encoder()
+    yield b'['
+    first = True
+    for chunk in iter_queryset_chunks(queryset, chunk_size):
+        data = serializer_class(chunk, many=True, context=context or {}).data
+        body = ','.join(encoder.encode(item) for item in data)
+        if not first:
+            body = ',' + body
+        first = False
+        yield body.encode('utf-8')
+    yield b']'
+
+
+def gzip_stream(chunks, level=6):
+    """
+    Compress an iterable of byte strings into a single gzip member on the fly
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31 -> gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+_EXHAUSTED = object()
+
+
+class IncrementalStreamingHttpResponse(StreamingHttpResponse):
+    """
+    StreamingHttpResponse that stays incremental under ASGI.
+
+    Django serves a synchronous iterator to an ASGI server by consuming it
+    into a list first, which buffers the whole body (and never finishes for
+    endless streams). Pull one chunk at a time from a worker thread instead.
+    """
+
+    async def __aiter__(self):
+        if self.is_async:
+            async for part in self.streaming_content:
+                yield part
+            return
+        iterator = self.streaming_content
+        next_chunk = sync_to_async(next, thread_sensitive=True)
+        while True:
+            part = await next_chunk(iterator, _EXHAUSTED)
+            if part is _EXHAUSTED:
+                break
+            yield part
+
+
+class StreamingJSONResponse(IncrementalStreamingHttpResponse):
+    """
+    StreamingHttpResponse carrying a JSON document
+    """
+
+    def __init__(self, streaming_content=(), *args, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(streaming_content, *args, **kwargs)
+
+
+def stream_json_list(queryset, serializer_class, context=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Build a streaming JSON array response for ``queryset``
+    """
+    return StreamingJSONResponse(
+        iter_json_array(queryset, serializer_class, context=context, chunk_size=chunk_size)
+    )
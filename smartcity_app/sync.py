@@ -0,0 +1,192 @@
+"""
+Delta sync for offline-capable clients (driver app, bot).
+
+Signals record every save and delete of a syncable object in the
+SyncChange journal. A client keeps the ``next_token`` of its last sync and
+asks only for what changed after it; deleted objects come back as
+tombstones (their ids). Token 0 returns the full dataset, page by page.
+
+Journal rows carry the object's scope: its organization (organization
+clients only see their own rows and unscoped ones) and, for per-user
+objects such as notifications, its owner (only that user sees them). When
+an object moves to another organization, the old one gets a tombstone.
+
+Sequence numbers are handed out when the journal row is written, inside
+the writing transaction. On SQLite writes are serialized, so seq order is
+commit order. On PostgreSQL two concurrent transactions can commit out of
+seq order; clients that must not miss such a change can re-sync from a
+slightly older token, since applying the same change twice is harmless.
+"""
+
+from django.db.models import Q
+
+from .models import CallRequest, IoTDevice, Notification, SyncChange, Truck, User, WasteBin
+from .serializers import (
+    CallRequestSerializer, IoTDeviceSerializer, NotificationSerializer,
+    TruckSerializer, WasteBinSerializer
+)
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 5000
+
+
+class SyncError(ValueError):
+    """Raised for invalid sync parameters"""
+
+
+class SyncModel:
+    def __init__(self, model, serializer_class, organization_field=None, user_field=None,
+                 select_related=(), prefetch_related=()):
+        self.model = model
+        self.serializer_class = serializer_class
+        self.organization_field = organization_field
+        self.user_field = user_field
+        self.select_related = select_related
+        self.prefetch_related = prefetch_related
+
+    def organization_id(self, instance):
+        if self.organization_field is None:
+            return None
+        return getattr(instance, self.organization_field)
+
+    def user_id(self, instance):
+        if self.user_field is None:
+            return None
+        return getattr(instance, self.user_field)
+
+    def queryset(self):
+        return (
+            self.model.objects.select_related(*self.select_related)
+            .prefetch_related(*self.prefetch_related)
+        )
+
+
+SYNC_MODELS = {
+    'waste_bins': SyncModel(WasteBin, WasteBinSerializer, 'organization_id',
+                            select_related=('organization', 'location')),
+    'trucks': SyncModel(Truck, TruckSerializer, 'organization_id', select_related=('location',)),
+    'call_requests': SyncModel(CallRequest, CallRequestSerializer, 'assigned_org_id',
+                               prefetch_related=('timeline',)),
+    'notifications': SyncModel(Notification, NotificationSerializer, user_field='user_id'),
+    'iot_devices': SyncModel(IoTDevice, IoTDeviceSerializer, select_related=('location',)),
+}
+
+SYNC_KEYS = {spec.model: key for key, spec in SYNC_MODELS.items()}
+
+
+def _scope(organization_id):
+    return Q(organization_id__isnull=True) if organization_id is None else Q(organization_id=organization_id)
+
+
+def record_change(instance, deleted=False):
+    """
+    Journal a change of ``instance``. Also to be called by bulk code paths
+    that bypass model signals.
+    """
+    record_changes([instance], deleted=deleted)
+
+
+def record_changes(instances, deleted=False):
+    """
+    Journal the changes of many instances of one model. The object's row
+    in its current organization is replaced; a live row in another
+    organization (the object moved) is replaced by a tombstone.
+    """
+    if not instances:
+        return
+    key = SYNC_KEYS[type(instances[0])]
+    spec = SYNC_MODELS[key]
+    scopes = {str(instance.pk): spec.organization_id(instance) for instance in instances}
+    moved = [
+        (object_id, organization_id)
+        for object_id, organization_id in SyncChange.objects.filter(
+            model=key, object_id__in=list(scopes), deleted=False,
+        ).values_list('object_id', 'organization_id')
+        if str(organization_id or '') != str(scopes[object_id] or '')
+    ]
+
+    # Rows to replace, grouped by organization to keep the condition short
+    by_scope = {}
+    for object_id, organization_id in list(scopes.items()) + moved:
+        by_scope.setdefault(organization_id, []).append(object_id)
+    replaced = Q()
+    for organization_id, object_ids in by_scope.items():
+        replaced |= _scope(organization_id) & Q(object_id__in=object_ids)
+    SyncChange.objects.filter(replaced, model=key).delete()
+    SyncChange.objects.bulk_create(
+        [SyncChange(model=key, object_id=object_id, organization_id=organization_id, deleted=True)
+         for object_id, organization_id in moved]
+        + [SyncChange(model=key, object_id=str(instance.pk), organization_id=spec.organization_id(instance),
+                      user_id=spec.user_id(instance), deleted=deleted)
+           for instance in instances],
+        batch_size=500,
+    )
+
+
+def _parse_int(value, name, default):
+    if value in (None, ''):
+        return default
+    try:
+        parsed = int(value)
+    except (TypeError, ValueError):
+        raise SyncError(f"'{name}' must be an integer")
+    if parsed < 0:
+        raise SyncError(f"'{name}' must not be negative")
+    return parsed
+
+
+def changes_since(params, organization_id=None, context=None, user=None):
+    """
+    Return the sync payload for query ``params`` (since, models, limit),
+    restricted to ``organization_id`` when given. Per-user objects are
+    limited to those of ``user`` (a login), none without one.
+    """
+    since = _parse_int(params.get('since'), 'since', 0)
+    limit = min(_parse_int(params.get('limit'), 'limit', DEFAULT_SYNC_LIMIT) or DEFAULT_SYNC_LIMIT, MAX_SYNC_LIMIT)
+
+    keys = list(SYNC_MODELS)
+    if params.get('models'):
+        keys = [key.strip() for key in params['models'].split(',') if key.strip()]
+        unknown = [key for key in keys if key not in SYNC_MODELS]
+        if unknown:
+            raise SyncError(f"Unknown model(s): {', '.join(unknown)}. Available: {', '.join(SYNC_MODELS)}")
+
+    journal = SyncChange.objects.filter(seq__gt=since, model__in=keys)
+    if organization_id:
+        journal = journal.filter(Q(organization_id=organization_id) | Q(organization_id__isnull=True))
+    per_user = [key for key in keys if SYNC_MODELS[key].user_field]
+    if per_user:
+        user_id = None
+        if user is not None and user.is_authenticated:
+            user_id = User.objects.filter(username=user.username).values_list('id', flat=True).first()
+        mine = Q(user_id=user_id) if user_id else Q(pk__in=[])
+        journal = journal.filter(~Q(model__in=per_user) | mine)
+    rows = list(journal.order_by('seq').values_list('seq', 'model', 'object_id', 'deleted')[:limit + 1])
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    changed_ids = {key: [] for key in keys}
+    deleted = {key: [] for key in keys}
+    for _, key, object_id, is_deleted in rows:
+        (deleted if is_deleted else changed_ids)[key].append(object_id)
+
+    changes = {}
+    for key in keys:
+        spec = SYNC_MODELS[key]
+        objects = list(spec.queryset().filter(pk__in=changed_ids[key])) if changed_ids[key] else []
+        # An object deleted after its change was journaled has a tombstone
+        # further on; report it as deleted already
+        found = {str(obj.pk) for obj in objects}
+        deleted[key].extend(object_id for object_id in changed_ids[key] if object_id not in found)
+        # An unscoped client sees both the tombstone of a moved object's old
+        # organization and its live row; the object still exists
+        deleted[key] = list(dict.fromkeys(object_id for object_id in deleted[key] if object_id not in found))
+        changes[key] = spec.serializer_class(objects, many=True, context=context or {}).data
+
+    return {
+        'next_token': rows[-1][0] if rows else since,
+        'has_more': has_more,
+        'changes': changes,
+        'deleted': deleted,
+    }
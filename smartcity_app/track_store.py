@@ -0,0 +1,280 @@
+"""
+Compressed location history of buses and trucks.
+
+Telemetry appends raw VehicleTrackPoint rows. The compact_tracks command
+(run it hourly) turns every complete hour of a vehicle's raw points into
+one VehicleTrackChunk and deletes the raw rows:
+
+- the track is simplified with Douglas-Peucker using the time-synchronized
+  distance (a point is dropped only if the vehicle's position at that time,
+  interpolated between the kept points, is within TRACK_SIMPLIFY_METERS),
+  so stops and speed changes survive replay, not just the shape;
+- the kept points are stored as zigzag varint deltas of the Unix time in
+  seconds and of lat/lng in 1e-5 degrees (about 1 m), a few bytes each.
+
+Speed and bearing are not kept in chunks; replay derives movement from
+consecutive positions. ``replay()`` merges chunks and not yet compacted
+raw points of a time window; ``densify()`` fills the straight runs back in
+for code that looks for a vehicle near a place (bus stop visits).
+"""
+
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .models import VehicleTrackChunk, VehicleTrackPoint
+
+FORMAT_VERSION = 1
+COORDINATE_SCALE = 100000  # 1e-5 degrees
+EARTH_RADIUS_METERS = 6371000.0
+
+
+class TrackError(ValueError):
+    """Raised for an invalid track request or an unreadable chunk"""
+
+
+# Douglas-Peucker
+
+def simplify(times, lat, lng, tolerance):
+    """
+    Indices of the points to keep of a time-ordered track, by
+    Douglas-Peucker on the time-synchronized distance in meters
+    """
+    count = len(times)
+    if count <= 2:
+        return np.arange(count)
+    times = np.asarray(times, dtype=float)
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    # Local equirectangular projection, accurate enough within an hour of driving
+    y = np.radians(lat) * EARTH_RADIUS_METERS
+    x = np.radians(lng) * EARTH_RADIUS_METERS * np.cos(np.radians(lat.mean()))
+
+    keep = np.zeros(count, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, count - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        inner = slice(first + 1, last)
+        span = times[last] - times[first]
+        ratio = (times[inner] - times[first]) / span if span > 0 else np.zeros(last - first - 1)
+        expected_x = x[first] + (x[last] - x[first]) * ratio
+        expected_y = y[first] + (y[last] - y[first]) * ratio
+        distances = np.hypot(x[inner] - expected_x, y[inner] - expected_y)
+        farthest = int(np.argmax(distances))
+        if distances[farthest] > tolerance:
+            split = first + 1 + farthest
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+# Varint encoding
+
+def _write_varint(out, value):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _zigzag(value):
+    return (value << 1) ^ (value >> 63)
+
+
+def _unzigzag(value):
+    return (value >> 1) ^ -(value & 1)
+
+
+def encode(points):
+    """Encode ``[(datetime, lat, lng)]`` (time-ordered) as bytes"""
+    out = bytearray([FORMAT_VERSION])
+    _write_varint(out, len(points))
+    previous = (0, 0, 0)
+    for timestamp, lat, lng in points:
+        current = (int(timestamp.timestamp()), round(lat * COORDINATE_SCALE), round(lng * COORDINATE_SCALE))
+        for value, before in zip(current, previous):
+            _write_varint(out, _zigzag(value - before))
+        previous = current
+    return bytes(out)
+
+
+def decode(data):
+    """Decode bytes from encode() back to ``[(datetime, lat, lng)]``"""
+    data = bytes(data)
+    if not data or data[0] != FORMAT_VERSION:
+        raise TrackError('Unknown track chunk format')
+    position = 1
+
+    def read():
+        nonlocal position
+        result = shift = 0
+        while True:
+            try:
+                byte = data[position]
+            except IndexError:
+                raise TrackError('Truncated track chunk')
+            position += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                return result
+            shift += 7
+
+    count = read()
+    points = []
+    seconds = lat = lng = 0
+    for _ in range(count):
+        seconds += _unzigzag(read())
+        lat += _unzigzag(read())
+        lng += _unzigzag(read())
+        points.append((
+            datetime.fromtimestamp(seconds, tz=dt_timezone.utc),
+            lat / COORDINATE_SCALE,
+            lng / COORDINATE_SCALE,
+        ))
+    return points
+
+
+# Compaction and replay
+
+def _hour(timestamp):
+    return timestamp.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def _compress(points, tolerance):
+    if not points:
+        return points
+    times, lat, lng = zip(*((timestamp.timestamp(), lat, lng) for timestamp, lat, lng in points))
+    return [points[index] for index in simplify(times, lat, lng, tolerance)]
+
+
+def compact(before=None, tolerance=None):
+    """
+    Move raw track points of complete hours before ``before`` (default: now)
+    into chunks. Returns ``(raw points removed, chunks written)``.
+    """
+    tolerance = tolerance if tolerance is not None else getattr(settings, 'TRACK_SIMPLIFY_METERS', 5.0)
+    cutoff = _hour(before or timezone.now())
+    raw = VehicleTrackPoint.objects.filter(timestamp__lt=cutoff)
+    vehicles = list(raw.order_by().values_list('vehicle_type', 'vehicle_id').distinct())
+
+    removed = written = 0
+    for vehicle_type, vehicle_id in vehicles:
+        rows = list(
+            raw.filter(vehicle_type=vehicle_type, vehicle_id=vehicle_id)
+            .order_by('timestamp').values_list('id', 'timestamp', 'lat', 'lng')
+        )
+        by_hour = {}
+        for _, timestamp, lat, lng in rows:
+            by_hour.setdefault(_hour(timestamp), []).append((timestamp, lat, lng))
+
+        with transaction.atomic():
+            existing = {
+                chunk.hour: chunk
+                for chunk in VehicleTrackChunk.objects.select_for_update().filter(
+                    vehicle_type=vehicle_type, vehicle_id=vehicle_id, hour__in=list(by_hour))
+            }
+            for hour, points in by_hour.items():
+                chunk = existing.get(hour)
+                raw_count = len(points)
+                if chunk is not None:
+                    # Late points of an hour compacted before
+                    points = sorted(decode(chunk.data) + points, key=lambda point: point[0])
+                    raw_count += chunk.raw_point_count
+                kept = _compress(points, tolerance)
+                VehicleTrackChunk.objects.update_or_create(
+                    vehicle_type=vehicle_type, vehicle_id=vehicle_id, hour=hour,
+                    defaults={'data': encode(kept), 'point_count': len(kept), 'raw_point_count': raw_count},
+                )
+                written += 1
+            ids = [row[0] for row in rows]
+            for start in range(0, len(ids), 1000):
+                # Nothing listens for track points, so each batch is a single DELETE
+                VehicleTrackPoint.objects.filter(pk__in=ids[start:start + 1000]).delete()
+        removed += len(rows)
+    return removed, written
+
+
+def replay(vehicle_type, vehicle_id, start, end):
+    """A vehicle's positions ``[(datetime, lat, lng)]`` between ``start`` and ``end``, in time order"""
+    points = []
+    chunks = VehicleTrackChunk.objects.filter(
+        vehicle_type=vehicle_type, vehicle_id=vehicle_id, hour__gte=_hour(start), hour__lte=end,
+    ).order_by('hour').values_list('data', flat=True)
+    for data in chunks:
+        points.extend(point for point in decode(data) if start <= point[0] <= end)
+    points.extend(
+        VehicleTrackPoint.objects.filter(
+            vehicle_type=vehicle_type, vehicle_id=vehicle_id, timestamp__gte=start, timestamp__lte=end,
+        ).order_by('timestamp').values_list('timestamp', 'lat', 'lng')
+    )
+    points.sort(key=lambda point: point[0])
+    return points
+
+
+def parse_window(params, max_hours):
+    """``(start, end)`` from ``start``/``end`` query parameters (ISO 8601 or Unix time); the last hour by default"""
+    def parse(value, default):
+        if value in (None, ''):
+            return default
+        try:
+            seconds = float(value)
+        except ValueError:
+            seconds = None
+        try:
+            if seconds is not None:
+                return datetime.fromtimestamp(seconds, tz=dt_timezone.utc)
+            parsed = datetime.fromisoformat(value)
+        except (ValueError, OverflowError, OSError):
+            raise TrackError(f"Invalid time: {value}")
+        return parsed if timezone.is_aware(parsed) else timezone.make_aware(parsed, dt_timezone.utc)
+
+    end = parse(params.get('end'), timezone.now())
+    try:
+        start = parse(params.get('start'), end - timedelta(hours=1))
+    except OverflowError:
+        raise TrackError(f"Invalid time: {params.get('end')}")
+    if start > end:
+        raise TrackError("'start' must be before 'end'")
+    if end - start > timedelta(hours=max_hours):
+        raise TrackError(f"The window must not be longer than {max_hours} hours")
+    return start, end
+
+
+def densify(points, spacing, max_gap):
+    """
+    ``(seconds, lat, lng)`` arrays of a replayed track with points
+    interpolated into every gap, so consecutive points are at most
+    ``spacing`` meters apart. Chunks only keep the points needed to follow
+    the vehicle within TRACK_SIMPLIFY_METERS, so a straight run comes back
+    as its two ends. Gaps longer than ``max_gap`` seconds (the tracker was
+    off) are left alone.
+    """
+    if not points:
+        return np.zeros(0), np.zeros(0), np.zeros(0)
+    seconds = np.array([timestamp.timestamp() for timestamp, _, _ in points])
+    lat = np.array([point[1] for point in points], dtype=float)
+    lng = np.array([point[2] for point in points], dtype=float)
+    if len(points) == 1:
+        return seconds, lat, lng
+
+    # Haversine length of every gap
+    phi = np.radians(lat)
+    a = (np.sin(np.diff(phi) / 2) ** 2
+         + np.cos(phi[:-1]) * np.cos(phi[1:]) * np.sin(np.radians(np.diff(lng)) / 2) ** 2)
+    length = 2 * EARTH_RADIUS_METERS * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    steps = np.where(np.diff(seconds) <= max_gap, np.maximum(np.ceil(length / spacing), 1), 1).astype(np.int64)
+
+    # Every gap i contributes its start plus steps[i] - 1 points in between
+    gap = np.repeat(np.arange(len(steps)), steps)
+    fraction = (np.arange(len(gap)) - np.repeat(np.cumsum(steps) - steps, steps)) / steps[gap]
+    return tuple(
+        np.append(values[gap] + (values[gap + 1] - values[gap]) * fraction, values[-1])
+        for values in (seconds, lat, lng)
+    )
@@ -0,0 +1,330 @@
+"""
+Server-side triage of citizen call requests.
+
+New call requests (triaged_at is null) are picked up by a background
+worker in batches of up to CALL_TRIAGE_BATCH_SIZE: a save only wakes the
+worker, which waits CALL_TRIAGE_INTERVAL_SECONDS so a surge of calls is
+collected into one model call, one bulk_update and one timeline insert.
+
+The model is pluggable: CALL_TRIAGE_MODEL is the dotted path of a
+TriageModel subclass whose ``triage(transcripts)`` returns one
+TriageResult per transcript. The default KeywordModel works offline: it
+weighs the words of a transcript by TF-IDF against the recent call
+history and scores the categories by their keyword stems (Uzbek, Russian
+and English).
+
+Values supplied by the client win: triage fills an empty ai_summary or
+keywords and sets the category when it is empty or OTHER. Before the
+model runs, near-duplicates are linked to their canonical request
+(dedup.py); after each run the worker hands the triaged requests to the
+dispatcher (dispatch.py).
+"""
+
+import math
+import re
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from .models import CallRequest, CallRequestTimeline
+from .signals import bulk_saved
+
+TIMELINE_STEP = 'AI tahlil'
+DUPLICATE_STEP = 'Takroriy murojaat'
+TIMELINE_ACTOR = 'AI'
+
+# Keyword stems per category; a word matches a stem it starts with, so
+# Uzbek and Russian suffixes need no stemmer
+CATEGORY_STEMS = {
+    'HEALTH': (
+        'kasal', 'shifokor', 'vrach', 'doktor', "og'ri", 'dori', 'poliklinika',
+        'shifoxona', 'kasalxona', 'bemor', 'isitma', 'больн', 'врач', 'скор', 'лекарств', 'поликлиник',
+        'hospital', 'doctor', 'ambulance', 'sick', 'medic', 'health',
+    ),
+    'INTERIOR': (
+        "o'g'ri", 'janjal', 'militsiya', 'politsiya', 'huquq', 'mushtlash', 'bezori', 'shovqin', "o'g'irla",
+        'tartib', 'xavfsiz', 'полици', 'милиц', 'краж', 'драк', 'хулиган', 'шум', 'police', 'theft', 'fight',
+        'noise', 'crime',
+    ),
+    'WASTE': (
+        'chiqindi', 'axlat', 'musor', 'konteyner', 'idish', 'tozala', 'iflos', 'hid', 'мусор', 'отход',
+        'контейнер', 'свалк', 'вонь', 'garbage', 'trash', 'waste', 'litter', 'dump',
+    ),
+    'ELECTRICITY': (
+        'elektr', 'svet', 'tok', 'chiroq', 'lampa', 'simyog', 'transformator', 'kuchlanish', 'rozetka',
+        'электр', 'свет', 'ток', 'фонар', 'трансформатор', 'electric', 'power', 'light', 'outage', 'voltage',
+    ),
+    'WATER': (
+        'suv', 'quvur', 'kanalizatsiya', 'oqava', 'vodoprovod', "jo'mrak", 'sizib', 'вода', 'воды', 'воду',
+        'водо', 'труб', 'канализац', 'кран', 'протеч', 'water', 'pipe', 'sewage', 'leak', 'flood',
+    ),
+    'GAS': (
+        'gaz', 'ballon', 'plita', 'pech', 'isitish', 'qozon', 'газ', 'плит', 'отоплен', 'котел', 'котёл',
+        'gas', 'heating', 'boiler', 'stove',
+    ),
+}
+
+STOPWORDS = frozenset((
+    # Uzbek
+    'va', 'bu', 'u', 'men', 'biz', 'siz', 'ular', 'bilan', 'uchun', 'ham', 'yoq', "yo'q", 'bor', 'edi', 'emas',
+    'da', 'de', 'ga', 'ni', 'ning', 'dan', 'lekin', 'ammo', 'juda', 'hali', 'endi', 'bizning', 'sizning',
+    'mening', 'shu', "o'sha", 'qachon', 'nima', 'nega', 'iltimos', 'kerak', "bo'ldi", "bo'lib", 'qildi',
+    'qilib', 'assalomu', 'alaykum', 'salom', 'rahmat', 'sizga', 'katta', 'bir', 'kun', 'kundan', 'beri', 'hech',
+    'kim', 'yana', 'keyin',
+    # Russian
+    'и', 'в', 'во', 'не', 'что', 'он', 'на', 'я', 'с', 'со', 'как', 'а', 'то', 'все', 'она', 'так', 'его',
+    'но', 'да', 'ты', 'к', 'у', 'же', 'вы', 'за', 'бы', 'по', 'только', 'ее', 'мне', 'было', 'вот', 'от',
+    'меня', 'еще', 'нет', 'о', 'из', 'ему', 'уже', 'для', 'мы', 'нас', 'пожалуйста', 'здравствуйте',
+    # English
+    'the', 'a', 'an', 'and', 'or', 'is', 'are', 'was', 'were', 'to', 'of', 'in', 'on', 'for', 'with', 'our',
+    'we', 'it', 'there', 'please', 'not', 'has', 'have', 'been', 'this', 'that', 'since', 'from', 'hello',
+))
+
+APOSTROPHES = str.maketrans({'ʻ': "'", 'ʼ': "'", '‘': "'", '’': "'", '`': "'"})
+WORD_RE = re.compile(r"[^\W\d_]+(?:'[^\W\d_]+)*")
+SENTENCE_RE = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def tokenize(text):
+    return WORD_RE.findall((text or '').lower().translate(APOSTROPHES))
+
+
+class TriageResult:
+    __slots__ = ('category', 'confidence', 'keywords', 'summary')
+
+    def __init__(self, category, confidence, keywords, summary):
+        self.category = category
+        self.confidence = confidence
+        self.keywords = keywords
+        self.summary = summary
+
+
+class TriageModel:
+    """Interface of a triage model; one call handles a whole batch"""
+
+    def triage(self, transcripts):
+        """One TriageResult per transcript, in order"""
+        raise NotImplementedError
+
+
+class KeywordModel(TriageModel):
+    """
+    Offline classifier: TF-IDF weighted keyword stems per category,
+    TF-IDF keywords and the highest weighted sentence as the summary
+    """
+
+    def __init__(self, keyword_count=5, summary_chars=200, corpus_size=5000):
+        self.keyword_count = keyword_count
+        self.summary_chars = summary_chars
+        self.corpus_size = corpus_size
+        self._document_frequency = Counter()
+        self._documents = 0
+        self._seeded = False
+        self._stem_matches = {}  # word -> categories, memoized
+
+    def _seed(self):
+        # Document frequencies of the recent call history, then updated with every batch
+        if self._seeded:
+            return
+        transcripts = (
+            CallRequest.objects.filter(triaged_at__isnull=False).order_by('-timestamp')
+            .values_list('transcript', flat=True)[:self.corpus_size]
+        )
+        for transcript in transcripts:
+            self._document_frequency.update(set(tokenize(transcript)))
+            self._documents += 1
+        self._seeded = True
+
+    def _idf(self, word):
+        return math.log((1 + self._documents) / (1 + self._document_frequency[word])) + 1
+
+    def _categories(self, word):
+        matches = self._stem_matches.get(word)
+        if matches is None:
+            matches = tuple(
+                category for category, stems in CATEGORY_STEMS.items()
+                if any(word.startswith(stem) for stem in stems)
+            )
+            self._stem_matches[word] = matches
+        return matches
+
+    def _summary(self, transcript, weights):
+        text = ' '.join((transcript or '').split())
+        if len(text) <= self.summary_chars:
+            return text
+        sentences = [sentence.strip() for sentence in SENTENCE_RE.split(transcript) if sentence.strip()]
+
+        def score(sentence):
+            # IDF rather than TF-IDF: a greeting repeated across the call must not win
+            words = tokenize(sentence)
+            if not words:
+                return 0
+            informative = sum(
+                self._idf(word) * (2 if self._categories(word) else 1) for word in set(words) if word in weights
+            )
+            return informative / math.sqrt(len(words))
+
+        summary = ' '.join(max(sentences, key=score).split()) if sentences else text
+        if len(summary) > self.summary_chars:
+            summary = summary[:self.summary_chars].rsplit(' ', 1)[0] + '…'
+        return summary
+
+    def triage(self, transcripts):
+        self._seed()
+        documents = [tokenize(transcript) for transcript in transcripts]
+        for words in documents:
+            self._document_frequency.update(set(words))
+            self._documents += 1
+
+        results = []
+        for transcript, words in zip(transcripts, documents):
+            counts = Counter(word for word in words if word not in STOPWORDS and len(word) > 2)
+            # Sublinear TF, so a word repeated throughout the call does not drown the rest
+            weights = {word: (1 + math.log(count)) * self._idf(word) for word, count in counts.items()}
+
+            scores = Counter()
+            for word, weight in weights.items():
+                for category in self._categories(word):
+                    scores[category] += weight
+            total = sum(scores.values())
+            if total:
+                category, best = scores.most_common(1)[0]
+                confidence = round(best / total, 3)
+            else:
+                category, confidence = 'OTHER', 0.0
+
+            keywords = [word for word, _ in sorted(weights.items(), key=lambda item: (-item[1], item[0]))]
+            results.append(TriageResult(
+                category, confidence, keywords[:self.keyword_count], self._summary(transcript, weights),
+            ))
+        return results
+
+
+_model = None
+_model_lock = threading.Lock()
+
+
+def get_model():
+    global _model
+    with _model_lock:
+        if _model is None:
+            _model = import_string(_setting('CALL_TRIAGE_MODEL', 'smartcity_app.triage.KeywordModel'))()
+        return _model
+
+
+def apply_result(call_request, result):
+    """Fill the fields the client left empty; returns the changed field names"""
+    changed = []
+    if not call_request.category or call_request.category == 'OTHER':
+        if result.category != call_request.category:
+            call_request.category = result.category
+            changed.append('category')
+    if not call_request.ai_summary and result.summary:
+        call_request.ai_summary = result.summary
+        changed.append('ai_summary')
+    if not call_request.keywords and result.keywords:
+        call_request.keywords = result.keywords
+        changed.append('keywords')
+    call_request.triage_confidence = result.confidence
+    return changed
+
+
+def triage_batch(limit=None):
+    """
+    Triage up to ``limit`` (default CALL_TRIAGE_BATCH_SIZE) untriaged call
+    requests, oldest first. Returns the number triaged.
+    """
+    limit = limit or _setting('CALL_TRIAGE_BATCH_SIZE', 64)
+    now = timezone.now()
+    with transaction.atomic():
+        # Workers in other processes skip the rows claimed here (PostgreSQL)
+        pending = list(
+            CallRequest.objects.select_for_update(skip_locked=True)
+            .filter(triaged_at__isnull=True).order_by('timestamp')[:limit]
+        )
+        if not pending:
+            return 0
+        fields = {'triaged_at', 'triage_confidence'}
+        timeline = []
+        if _setting('CALL_DEDUP_ENABLED', True):
+            # Imported here: dedup uses this module's tokenizer
+            from .dedup import get_index
+            for call_request in get_index().link_batch(pending, now):
+                fields.add('duplicate_of')
+                timeline.append(CallRequestTimeline(
+                    call_request=call_request, step=DUPLICATE_STEP, timestamp=now, actor=TIMELINE_ACTOR,
+                    status='DONE',
+                ))
+        results = get_model().triage([call_request.transcript for call_request in pending])
+
+        for call_request, result in zip(pending, results):
+            fields.update(apply_result(call_request, result))
+            call_request.triaged_at = now
+            timeline.append(CallRequestTimeline(
+                call_request=call_request, step=TIMELINE_STEP, timestamp=now, actor=TIMELINE_ACTOR, status='DONE',
+            ))
+        CallRequest.objects.bulk_update(pending, sorted(fields), batch_size=500)
+        created = CallRequestTimeline.objects.bulk_create(timeline, batch_size=500)
+        bulk_saved(CallRequest, pending)
+        bulk_saved(CallRequestTimeline, created)
+    return len(pending)
+
+
+def triage_pending():
+    """Triage every untriaged call request; returns the number triaged"""
+    total = 0
+    while True:
+        count = triage_batch()
+        total += count
+        if not count:
+            return total
+
+
+class TriageWorker:
+    def __init__(self, interval=2.0):
+        self.interval = interval
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def wake(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='call-triage', daemon=True)
+                self._thread.start()
+        self._wakeup.set()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            # Let a burst of calls accumulate into one batch
+            threading.Event().wait(self.interval)
+            self._wakeup.clear()
+            try:
+                triage_pending()
+                if _setting('CALL_DISPATCH_ENABLED', True):
+                    # Imported here: dispatch builds on triaged requests
+                    from .dispatch import dispatch_pending
+                    dispatch_pending()
+            except Exception as e:
+                print(f"Call request triage failed: {e}")
+
+
+_worker = None
+_worker_lock = threading.Lock()
+
+
+def get_worker():
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            _worker = TriageWorker(interval=_setting('CALL_TRIAGE_INTERVAL_SECONDS', 2.0))
+        return _worker
@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import views, async_views
 
 urlpatterns = [
     # Authentication URLs
@@ -11,6 +11,7 @@ urlpatterns = [
     path('waste-bins/<str:pk>/', views.WasteBinDetailView.as_view(), name='waste-bin-detail'),
     path('waste-bins/<str:pk>/update-image/', views.WasteBinImageUpdateView.as_view(), name='waste-bin-image-update'),
     path('waste-bins/<str:pk>/update-camera-image/', views.update_bin_with_camera_image, name='waste-bin-camera-image-update'),
+    path('waste-bins/<str:pk>/update-camera-image-async/', async_views.update_bin_with_camera_image_async, name='waste-bin-camera-image-update-async'),
     path('waste-bins/hudud/<str:toza_hudud>/', views.get_waste_bins_by_hudud, name='waste-bins-by-hudud'),
     
     # IoT Device endpoints
@@ -24,6 +25,7 @@ urlpatterns = [
     # Truck URLs
     path('trucks/', views.TruckListCreateView.as_view(), name='truck-list-create'),
     path('trucks/<str:pk>/', views.TruckDetailView.as_view(), name='truck-detail'),
+    path('trucks/<str:pk>/location/', views.update_truck_location, name='truck-location-update'),
     path('trucks/hudud/<str:toza_hudud>/', views.get_trucks_by_hudud, name='trucks-by-hudud'),
     
     # District URLs
@@ -64,8 +66,11 @@ urlpatterns = [
     
     # Eco Violation URLs
     path('eco-violations/', views.EcoViolationListCreateView.as_view(), name='eco-violation-list-create'),
-    path('eco-violations/<str:pk>/', views.EcoViolationDetailView.as_view(), name='eco-violation-detail'),
     path('eco-violations/date-range/', views.get_eco_violations_by_date_range, name='eco-violations-by-date-range'),
+    path('eco-violations/heatmap/', views.get_eco_violation_heatmap, name='eco-violations-heatmap'),
+    path('eco-violations/face-search/', views.search_eco_violation_faces, name='eco-violations-face-search'),
+    path('eco-violations/<str:pk>/', views.EcoViolationDetailView.as_view(), name='eco-violation-detail'),
+    path('eco-violations/<str:pk>/similar/', views.get_similar_eco_violations, name='eco-violation-similar'),
     
     # Construction Mission URLs
     path('construction-missions/', views.ConstructionMissionListCreateView.as_view(), name='construction-mission-list-create'),
@@ -74,6 +79,7 @@ urlpatterns = [
     # Construction Site URLs
     path('construction-sites/', views.ConstructionSiteListCreateView.as_view(), name='construction-site-list-create'),
     path('construction-sites/<str:pk>/', views.ConstructionSiteDetailView.as_view(), name='construction-site-detail'),
+    path('construction-sites/<str:pk>/observations/', views.get_construction_site_observations, name='construction-site-observations'),
     path('construction-sites/status/<str:status>/', views.get_construction_sites_by_status, name='construction-sites-by-status'),
     
     # Light ROI URLs
@@ -86,8 +92,14 @@ urlpatterns = [
     
     # Bus URLs
     path('buses/', views.BusListCreateView.as_view(), name='bus-list-create'),
+    path('buses/telemetry/', views.ingest_bus_telemetry, name='bus-telemetry'),
+    path('buses/live/', views.get_buses_live, name='buses-live'),
     path('buses/<str:pk>/', views.BusDetailView.as_view(), name='bus-detail'),
+    path('buses/<str:pk>/eta/', views.get_bus_eta, name='bus-eta'),
     path('buses/status/<str:status>/', views.get_buses_by_status, name='buses-by-status'),
+    path('bus-routes/', views.BusRouteListCreateView.as_view(), name='bus-route-list-create'),
+    path('bus-routes/<str:route_number>/eta/', views.get_route_etas, name='bus-route-etas'),
+    path('tracks/<str:vehicle_type>/<str:vehicle_id>/', views.get_vehicle_track, name='vehicle-track'),
     
     # Responsible Org URLs
     path('responsible-orgs/', views.ResponsibleOrgListCreateView.as_view(), name='responsible-org-list-create'),
@@ -99,6 +111,7 @@ urlpatterns = [
     
     # Call Request URLs
     path('call-requests/', views.CallRequestListCreateView.as_view(), name='call-request-list-create'),
+    path('call-requests/sla/', views.CallRequestSLAView.as_view(), name='call-request-sla'),
     path('call-requests/<str:pk>/', views.CallRequestDetailView.as_view(), name='call-request-detail'),
     path('call-requests/status/<str:status>/', views.get_call_requests_by_status, name='call-requests-by-status'),
     
@@ -108,12 +121,15 @@ urlpatterns = [
     
     # Notification URLs
     path('notifications/', views.NotificationListCreateView.as_view(), name='notification-list-create'),
-    path('notifications/<str:pk>/', views.NotificationDetailView.as_view(), name='notification-detail'),
     path('notifications/unread/', views.get_notifications_unread, name='notifications-unread'),
+    path('notifications/mark-read/', views.mark_notifications_read, name='notifications-mark-read'),
+    path('notifications/broadcast/', views.broadcast_notification, name='notifications-broadcast'),
+    path('notifications/<str:pk>/', views.NotificationDetailView.as_view(), name='notification-detail'),
     path('notifications/<str:notification_id>/read/', views.mark_notification_read, name='mark-notification-read'),
     
     # Report Entry URLs
     path('report-entries/', views.ReportEntryListCreateView.as_view(), name='report-entry-list-create'),
+    path('report-entries/aggregates/', views.get_report_entry_aggregates, name='report-entry-aggregates'),
     path('report-entries/<str:pk>/', views.ReportEntryDetailView.as_view(), name='report-entry-detail'),
     
     # Utility Node URLs
@@ -126,9 +142,19 @@ urlpatterns = [
     path('dashboard/stats/', views.dashboard_stats, name='dashboard-stats'),
     path('user/organizations/', views.get_user_organizations, name='user-organizations'),
     
+    # Real-time push channel
+    path('events/stream/', views.event_stream, name='event-stream'),
+    
+    # Delta sync
+    path('sync/', views.sync_changes, name='sync-changes'),
+    
+    # Export URLs
+    path('exports/<str:dataset>/', views.export_dataset, name='export-dataset'),
+    
     # Search URLs
     path('search/', views.search_entities, name='search-entities'),
     
     # Waste bin analysis
     path('waste-bins/analyze/', views.trigger_waste_bin_analysis, name='trigger-waste-bin-analysis'),
+    path('ai/analyze-bin-image/', async_views.analyze_bin_image, name='ai-analyze-bin-image'),
 ]
\ No newline at end of file
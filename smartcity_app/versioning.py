@@ -0,0 +1,139 @@
+"""
+Per-table version stamps and conditional GET.
+
+Every committed save/delete of a model of this app increments that
+table's ModelVersion. A view decorated with ``conditional_get(...)`` names
+the tables its response is built from; its ETag is a hash of their
+versions plus everything else the response depends on (URL, organization,
+user, Accept). A client sending the ETag back in If-None-Match gets a 304
+after a single small query, without the view running at all.
+
+Versions are table-wide, so any change in a table refreshes every
+response built from it. Code paths that bypass model signals
+(QuerySet.update(), bulk_create(), raw SQL) must call bump_version().
+Bumps are collected per transaction: however many rows of however many
+tables a transaction writes, its commit costs one UPDATE.
+"""
+
+import hashlib
+import threading
+import weakref
+from functools import wraps
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+from .models import ModelVersion
+
+VERSIONED_APP_LABEL = 'smartcity_app'
+# Internal bookkeeping and history tables that no response is versioned on
+UNVERSIONED_MODELS = {'modelversion', 'syncchange', 'reportentryaggregate', 'vehicletrackpoint', 'vehicletrackchunk',
+                     'callrequestband', 'faceembedding'}
+
+
+def model_label(model):
+    return model._meta.label_lower
+
+
+def is_versioned(model):
+    return model._meta.app_label == VERSIONED_APP_LABEL and model._meta.model_name not in UNVERSIONED_MODELS
+
+
+def _increment(labels):
+    now = timezone.now()
+    labels = sorted(labels)
+    updated = ModelVersion.objects.filter(model__in=labels).update(version=F('version') + 1, updated_at=now)
+    if updated == len(labels):
+        return
+    existing = set(ModelVersion.objects.filter(model__in=labels).values_list('model', flat=True))
+    for label in labels:
+        if label in existing:
+            continue
+        try:
+            with transaction.atomic():
+                ModelVersion.objects.create(model=label, version=1)
+        except IntegrityError:
+            # Created concurrently
+            ModelVersion.objects.filter(model=label).update(version=F('version') + 1, updated_at=now)
+
+
+class _PendingBump:
+    """The on_commit callback of a transaction, collecting its tables"""
+
+    def __init__(self):
+        self.labels = set()
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        _increment(self.labels)
+
+
+# Connection alias -> weak reference to the _PendingBump queued by its open transaction.
+# Connections are per thread. The reference dies with the callback: when it has
+# run, or when a rollback discarded it.
+_pending = threading.local()
+
+
+def bump_version(*models):
+    """Increment the version of ``models`` once the current transaction commits"""
+    labels = {model_label(model) for model in models}
+    if not labels:
+        return
+    connection = transaction.get_connection()
+    if not connection.in_atomic_block:
+        _increment(labels)
+        return
+    queued = getattr(_pending, 'bumps', None)
+    if queued is None:
+        queued = _pending.bumps = {}
+    ref = queued.get(connection.alias)
+    pending = ref() if ref is not None else None
+    if pending is None or pending.done:
+        pending = _PendingBump()
+        queued[connection.alias] = weakref.ref(pending)
+        transaction.on_commit(pending)
+    pending.labels |= labels
+
+
+def current_versions(models):
+    """Return ``{label: version}`` for ``models``, 0 for tables never changed"""
+    labels = sorted({model_label(model) for model in models})
+    versions = dict.fromkeys(labels, 0)
+    versions.update(ModelVersion.objects.filter(model__in=labels).values_list('model', 'version'))
+    return versions
+
+
+def conditional_get(*models):
+    """
+    View decorator adding an ETag derived from the versions of ``models``
+    and answering a matching If-None-Match with 304 Not Modified.
+    Works on function views and, through method_decorator, on APIView.get.
+    """
+    def etag_func(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+        parts = [
+            request.get_full_path(),
+            str(request.session.get('organization_id') or ''),
+            str(request.user.pk or ''),
+            request.META.get('HTTP_ACCEPT', ''),
+        ]
+        parts += [f'{label}:{version}' for label, version in current_versions(models).items()]
+        return '"%s"' % hashlib.md5('|'.join(parts).encode('utf-8')).hexdigest()
+
+    def decorator(view_func):
+        conditional_view = condition(etag_func=etag_func)(view_func)
+
+        @wraps(view_func)
+        def inner(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if request.method in ('GET', 'HEAD'):
+                # Cacheable, but always revalidate with the ETag
+                patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return inner
+    return decorator
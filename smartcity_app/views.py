@@ -1,5 +1,5 @@
 from django.shortcuts import get_object_or_404
-from django.http import JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
 from django.views import View
@@ -8,18 +8,25 @@ from django.contrib.auth.models import User
 from django.contrib.auth.decorators import login_required
 from django.utils import timezone
 from django.core.paginator import Paginator
-from rest_framework.decorators import api_view, permission_classes
+from django.core.handlers.asgi import ASGIRequest
+from django.core.exceptions import ValidationError
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Prefetch
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
+from rest_framework.renderers import BaseRenderer, JSONRenderer
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
 from rest_framework.views import APIView
+from rest_framework.pagination import PageNumberPagination
 from rest_framework.authtoken.models import Token
 from .models import (
     Organization, WasteBin, Truck, MoistureSensor, Facility, AirSensor, 
     SOSColumn, EcoViolation, ConstructionSite, LightPole, Bus, CallRequest,
     Coordinate, Region, District, Room, Boiler, ConstructionMission, LightROI,
     ResponsibleOrg, CallRequestTimeline, Notification, ReportEntry, UtilityNode,
-    DeviceHealth, IoTDevice
+    DeviceHealth, IoTDevice, BusRoute, BusStop, VehicleTrackPoint, ConstructionObservation
 )
 from .serializers import (
     OrganizationSerializer, WasteBinSerializer, TruckSerializer, 
@@ -29,9 +36,33 @@ from .serializers import (
     RegionSerializer, DistrictSerializer, RoomSerializer, BoilerSerializer,
     ConstructionMissionSerializer, LightROISerializer, ResponsibleOrgSerializer,
     CallRequestTimelineSerializer, NotificationSerializer, ReportEntrySerializer,
-    UtilityNodeSerializer, DeviceHealthSerializer, IoTDeviceSerializer
+    UtilityNodeSerializer, DeviceHealthSerializer, IoTDeviceSerializer, BusRouteSerializer,
+    CallRequestSLASerializer, ConstructionObservationSerializer
+)
+from .streaming import stream_json_list
+from .exports import ExportError, build_export_response
+from .aggregates import slice_aggregates
+from .events import aiter_event_stream, broker, iter_event_stream
+from .sync import SyncError, changes_since
+from .versioning import conditional_get
+from .refcache import reference_response
+from .iot_buffer import record_reading
+from .liveness import record_report
+from .alerting import check_reading
+from .bus_telemetry import get_store as get_bus_telemetry_store
+from .bus_eta import get_engine as get_eta_engine
+from .track_store import TrackError, parse_window as parse_track_window, replay as replay_track
+from .sla import sla_rollup, with_sla
+from .face_index import FaceIndexError, normalize as normalize_face, similar_violations, stored_face
+from .heatmap import HeatmapError, parse_params as parse_heatmap_params, render as render_heatmap
+from .signals import bulk_saved
+from .notifications import Message as NotificationMessage, mark_read, notify_organization, unread_for
+from .bin_analysis import (
+    AI_HEADERS, AI_REQUEST_TIMEOUT, IMAGE_DOWNLOAD_TIMEOUT, apply_analysis,
+    build_analysis_request, error_result, no_api_key_result, parse_analysis_response
 )
 import json
+import math
 import uuid
 import requests
 
@@ -181,6 +212,7 @@ def validate_token(request):
 
 # Class-based views for all models
 class WasteBinListCreateView(APIView):
+    @method_decorator(conditional_get(WasteBin, Organization, Coordinate))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -192,8 +224,8 @@ class WasteBinListCreateView(APIView):
             # For superadmin, return all bins
             bins = WasteBin.objects.all().select_related('location', 'organization')
         
-        serializer = WasteBinSerializer(bins, many=True, context={'request': request})
-        return Response(serializer.data)
+        # Stream the list so large fleets don't have to be rendered in memory first
+        return stream_json_list(bins, WasteBinSerializer, context={'request': request})
     
     def post(self, request):
     # 1. 'data'ni har doim requestdan nusxalab olamiz (IF dan tashqarida)
@@ -218,6 +250,7 @@ class WasteBinListCreateView(APIView):
 # Exempt CSRF for API views that use token authentication
 @method_decorator(csrf_exempt, name='dispatch')
 class WasteBinDetailView(APIView):
+    @method_decorator(conditional_get(WasteBin, Organization, Coordinate))
     def get(self, request, pk):
         bin = get_object_or_404(WasteBin, pk=pk)
         
@@ -309,6 +342,7 @@ class WasteBinImageUpdateView(APIView):
 
 
 class TruckListCreateView(APIView):
+    @method_decorator(conditional_get(Truck, Coordinate))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -339,6 +373,7 @@ class TruckListCreateView(APIView):
 
 
 class TruckDetailView(APIView):
+    @method_decorator(conditional_get(Truck, Coordinate))
     def get(self, request, pk):
         truck = get_object_or_404(Truck, pk=pk)
         
@@ -377,10 +412,9 @@ class TruckDetailView(APIView):
 
 
 class RegionListCreateView(APIView):
+    @method_decorator(conditional_get(Region))
     def get(self, request):
-        regions = Region.objects.all()
-        serializer = RegionSerializer(regions, many=True)
-        return Response(serializer.data)
+        return reference_response('regions')
     
     def post(self, request):
         serializer = RegionSerializer(data=request.data)
@@ -391,6 +425,7 @@ class RegionListCreateView(APIView):
 
 
 class RegionDetailView(APIView):
+    @method_decorator(conditional_get(Region))
     def get(self, request, pk):
         region = get_object_or_404(Region, pk=pk)
         serializer = RegionSerializer(region)
@@ -411,10 +446,9 @@ class RegionDetailView(APIView):
 
 
 class DistrictListCreateView(APIView):
+    @method_decorator(conditional_get(District, Region))
     def get(self, request):
-        districts = District.objects.all()
-        serializer = DistrictSerializer(districts, many=True)
-        return Response(serializer.data)
+        return reference_response('districts')
     
     def post(self, request):
         serializer = DistrictSerializer(data=request.data)
@@ -425,6 +459,7 @@ class DistrictListCreateView(APIView):
 
 
 class DistrictDetailView(APIView):
+    @method_decorator(conditional_get(District, Region))
     def get(self, request, pk):
         district = get_object_or_404(District, pk=pk)
         serializer = DistrictSerializer(district)
@@ -445,10 +480,9 @@ class DistrictDetailView(APIView):
 
 
 class OrganizationListCreateView(APIView):
+    @method_decorator(conditional_get(Organization))
     def get(self, request):
-        organizations = Organization.objects.all()
-        serializer = OrganizationSerializer(organizations, many=True)
-        return Response(serializer.data)
+        return reference_response('organizations')
     
     def post(self, request):
         serializer = OrganizationSerializer(data=request.data)
@@ -459,6 +493,7 @@ class OrganizationListCreateView(APIView):
 
 
 class OrganizationDetailView(APIView):
+    @method_decorator(conditional_get(Organization))
     def get(self, request, pk):
         # Try to get by ID first, then by login as fallback
         try:
@@ -582,6 +617,7 @@ class OrganizationDetailView(APIView):
 
 
 class MoistureSensorListCreateView(APIView):
+    @method_decorator(conditional_get(MoistureSensor, Coordinate))
     def get(self, request):
         sensors = MoistureSensor.objects.all()
         serializer = MoistureSensorSerializer(sensors, many=True)
@@ -596,6 +632,7 @@ class MoistureSensorListCreateView(APIView):
 
 
 class MoistureSensorDetailView(APIView):
+    @method_decorator(conditional_get(MoistureSensor, Coordinate))
     def get(self, request, pk):
         sensor = get_object_or_404(MoistureSensor, pk=pk)
         serializer = MoistureSensorSerializer(sensor)
@@ -616,6 +653,7 @@ class MoistureSensorDetailView(APIView):
 
 
 class RoomListCreateView(APIView):
+    @method_decorator(conditional_get(Room))
     def get(self, request):
         rooms = Room.objects.all()
         serializer = RoomSerializer(rooms, many=True)
@@ -630,6 +668,7 @@ class RoomListCreateView(APIView):
 
 
 class RoomDetailView(APIView):
+    @method_decorator(conditional_get(Room))
     def get(self, request, pk):
         room = get_object_or_404(Room, pk=pk)
         serializer = RoomSerializer(room)
@@ -650,6 +689,7 @@ class RoomDetailView(APIView):
 
 
 class BoilerListCreateView(APIView):
+    @method_decorator(conditional_get(Boiler, DeviceHealth, Room))
     def get(self, request):
         boilers = Boiler.objects.all()
         serializer = BoilerSerializer(boilers, many=True)
@@ -664,6 +704,7 @@ class BoilerListCreateView(APIView):
 
 
 class BoilerDetailView(APIView):
+    @method_decorator(conditional_get(Boiler, DeviceHealth, Room))
     def get(self, request, pk):
         boiler = get_object_or_404(Boiler, pk=pk)
         serializer = BoilerSerializer(boiler)
@@ -684,6 +725,7 @@ class BoilerDetailView(APIView):
 
 
 class FacilityListCreateView(APIView):
+    @method_decorator(conditional_get(Facility, Boiler, DeviceHealth, Room))
     def get(self, request):
         from django.db.models import Prefetch
         # Prefetch boilers and their connected rooms for efficient querying
@@ -701,6 +743,7 @@ class FacilityListCreateView(APIView):
 
 
 class FacilityDetailView(APIView):
+    @method_decorator(conditional_get(Facility, Boiler, DeviceHealth, Room))
     def get(self, request, pk):
         from django.db.models import Prefetch
         # Prefetch boilers and their connected rooms for efficient querying
@@ -724,6 +767,7 @@ class FacilityDetailView(APIView):
 
 
 class AirSensorListCreateView(APIView):
+    @method_decorator(conditional_get(AirSensor, Coordinate))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -754,6 +798,7 @@ class AirSensorListCreateView(APIView):
 
 
 class AirSensorDetailView(APIView):
+    @method_decorator(conditional_get(AirSensor, Coordinate))
     def get(self, request, pk):
         sensor = get_object_or_404(AirSensor, pk=pk)
         serializer = AirSensorSerializer(sensor)
@@ -774,6 +819,7 @@ class AirSensorDetailView(APIView):
 
 
 class SOSColumnListCreateView(APIView):
+    @method_decorator(conditional_get(SOSColumn, Coordinate, DeviceHealth))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -804,6 +850,7 @@ class SOSColumnListCreateView(APIView):
 
 
 class SOSColumnDetailView(APIView):
+    @method_decorator(conditional_get(SOSColumn, Coordinate, DeviceHealth))
     def get(self, request, pk):
         column = get_object_or_404(SOSColumn, pk=pk)
         serializer = SOSColumnSerializer(column)
@@ -824,6 +871,7 @@ class SOSColumnDetailView(APIView):
 
 
 class EcoViolationListCreateView(APIView):
+    @method_decorator(conditional_get(EcoViolation))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -854,6 +902,7 @@ class EcoViolationListCreateView(APIView):
 
 
 class EcoViolationDetailView(APIView):
+    @method_decorator(conditional_get(EcoViolation))
     def get(self, request, pk):
         violation = get_object_or_404(EcoViolation, pk=pk)
         serializer = EcoViolationSerializer(violation)
@@ -874,6 +923,7 @@ class EcoViolationDetailView(APIView):
 
 
 class ConstructionSiteListCreateView(APIView):
+    @method_decorator(conditional_get(ConstructionSite, ConstructionMission))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -904,6 +954,7 @@ class ConstructionSiteListCreateView(APIView):
 
 
 class ConstructionSiteDetailView(APIView):
+    @method_decorator(conditional_get(ConstructionSite, ConstructionMission))
     def get(self, request, pk):
         site = get_object_or_404(ConstructionSite, pk=pk)
         serializer = ConstructionSiteSerializer(site)
@@ -923,7 +974,39 @@ class ConstructionSiteDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+@api_view(['GET'])
+@conditional_get(ConstructionSite, ConstructionObservation)
+def get_construction_site_observations(request, pk):
+    """
+    History of a site's AI readings, oldest first.
+    Query params: start, end (ISO 8601)
+    """
+    from datetime import timezone as dt_timezone
+    from django.utils.dateparse import parse_datetime
+    site = get_object_or_404(ConstructionSite, pk=pk)
+    observations = ConstructionObservation.objects.filter(site=site).order_by('observed_at', 'id')
+    for param, lookup in (('start', 'observed_at__gte'), ('end', 'observed_at__lte')):
+        value = request.GET.get(param)
+        if not value:
+            continue
+        try:
+            # None when malformed, ValueError when well formed but out of range
+            moment = parse_datetime(value)
+            if moment is not None:
+                if timezone.is_naive(moment):
+                    moment = timezone.make_aware(moment)
+                moment = moment.astimezone(dt_timezone.utc)
+        except (ValueError, OverflowError):
+            moment = None
+        if moment is None:
+            return Response({'error': f"Invalid '{param}': expected an ISO 8601 date and time"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        observations = observations.filter(**{lookup: moment})
+    return stream_json_list(observations, ConstructionObservationSerializer)
+
+
 class LightPoleListCreateView(APIView):
+    @method_decorator(conditional_get(LightPole, Coordinate, LightROI))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -954,6 +1037,7 @@ class LightPoleListCreateView(APIView):
 
 
 class LightPoleDetailView(APIView):
+    @method_decorator(conditional_get(LightPole, Coordinate, LightROI))
     def get(self, request, pk):
         pole = get_object_or_404(LightPole, pk=pk)
         serializer = LightPoleSerializer(pole)
@@ -974,6 +1058,7 @@ class LightPoleDetailView(APIView):
 
 
 class BusListCreateView(APIView):
+    @method_decorator(conditional_get(Bus, Coordinate))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -1004,6 +1089,7 @@ class BusListCreateView(APIView):
 
 
 class BusDetailView(APIView):
+    @method_decorator(conditional_get(Bus, Coordinate))
     def get(self, request, pk):
         bus = get_object_or_404(Bus, pk=pk)
         serializer = BusSerializer(bus)
@@ -1024,8 +1110,9 @@ class BusDetailView(APIView):
 
 
 class CallRequestListCreateView(APIView):
+    @method_decorator(conditional_get(CallRequest, CallRequestTimeline))
     def get(self, request):
-        requests = CallRequest.objects.all()
+        requests = CallRequest.objects.prefetch_related('timeline')
         serializer = CallRequestSerializer(requests, many=True)
         return Response(serializer.data)
     
@@ -1038,6 +1125,7 @@ class CallRequestListCreateView(APIView):
 
 
 class CallRequestDetailView(APIView):
+    @method_decorator(conditional_get(CallRequest, CallRequestTimeline))
     def get(self, request, pk):
         request_obj = get_object_or_404(CallRequest, pk=pk)
         serializer = CallRequestSerializer(request_obj)
@@ -1057,10 +1145,67 @@ class CallRequestDetailView(APIView):
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+class CallRequestPagination(PageNumberPagination):
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+
+class CallRequestSLAView(APIView):
+    """
+    Call requests with their timelines and SLA metrics, newest first,
+    paginated. Filters: mfy, category and status (comma separated),
+    responsible_org, overdue (true/false). Repeat calls linked to another
+    request are left out unless include_duplicates=true. ``sla`` sums up
+    every page. No ETag: overdue changes with the clock, not only with
+    the data.
+    """
+    CHOICE_FILTERS = {
+        'category': {choice for choice, _ in CallRequest.REQUEST_CATEGORY_CHOICES},
+        'status': {choice for choice, _ in CallRequest.REQUEST_STATUS_CHOICES},
+    }
+
+    def get(self, request):
+        requests = with_sla(CallRequest.objects.all())
+        params = request.query_params
+        if params.get('include_duplicates') != 'true':
+            requests = requests.filter(duplicate_of__isnull=True)
+        if params.get('mfy'):
+            requests = requests.filter(mfy=params['mfy'])
+        for name, choices in self.CHOICE_FILTERS.items():
+            if params.get(name):
+                values = [value.strip().upper() for value in params[name].split(',') if value.strip()]
+                invalid = [value for value in values if value not in choices]
+                if invalid:
+                    return Response({'error': f"Invalid {name}: {', '.join(invalid)}"}, status=status.HTTP_400_BAD_REQUEST)
+                requests = requests.filter(**{f'{name}__in': values})
+        if params.get('responsible_org'):
+            try:
+                requests = requests.filter(responsible_org_id=params['responsible_org'])
+            except ValidationError:
+                return Response({'error': 'Invalid responsible_org'}, status=status.HTTP_400_BAD_REQUEST)
+        if params.get('overdue'):
+            if params['overdue'] not in ('true', 'false'):
+                return Response({'error': "overdue must be 'true' or 'false'"}, status=status.HTTP_400_BAD_REQUEST)
+            requests = requests.filter(is_overdue=params['overdue'] == 'true')
+
+        rollup = sla_rollup(requests)
+        paginator = CallRequestPagination()
+        page = paginator.paginate_queryset(
+            requests.order_by('-timestamp').prefetch_related(
+                Prefetch('timeline', queryset=CallRequestTimeline.objects.order_by('timestamp'))
+            ),
+            request, view=self,
+        )
+        response = paginator.get_paginated_response(CallRequestSLASerializer(page, many=True).data)
+        response.data['sla'] = rollup
+        return response
+
+
 # Add other class-based views as needed...
 
 # Additional functional views
 @api_view(['GET'])
+@conditional_get(WasteBin, Organization, Coordinate)
 def get_waste_bins_by_hudud(request, toza_hudud):
     """
     Get waste bins by toza hudud
@@ -1071,6 +1216,7 @@ def get_waste_bins_by_hudud(request, toza_hudud):
 
 
 @api_view(['GET'])
+@conditional_get(Truck, Coordinate)
 def get_trucks_by_hudud(request, toza_hudud):
     """
     Get trucks by toza hudud
@@ -1081,16 +1227,20 @@ def get_trucks_by_hudud(request, toza_hudud):
 
 
 @api_view(['GET'])
+@conditional_get(District, Region)
 def get_region_districts(request, region_id):
     """
     Get districts for a specific region
     """
-    districts = District.objects.filter(region_id=region_id)
-    serializer = DistrictSerializer(districts, many=True)
-    return Response(serializer.data)
+    try:
+        region_id = uuid.UUID(str(region_id))
+    except ValueError:
+        return Response({'error': 'Invalid region id'}, status=status.HTTP_400_BAD_REQUEST)
+    return reference_response('region-districts', str(region_id))
 
 
 @api_view(['GET'])
+@conditional_get(Facility, Boiler, DeviceHealth, Room)
 def get_facilities_by_type(request, facility_type):
     """
     Get facilities by type
@@ -1101,6 +1251,7 @@ def get_facilities_by_type(request, facility_type):
 
 
 @api_view(['GET'])
+@conditional_get(AirSensor, Coordinate)
 def get_air_sensors_by_status(request, status):
     """
     Get air sensors by status
@@ -1111,6 +1262,7 @@ def get_air_sensors_by_status(request, status):
 
 
 @api_view(['GET'])
+@conditional_get(SOSColumn, Coordinate, DeviceHealth)
 def get_sos_columns_by_status(request, status):
     """
     Get SOS columns by status
@@ -1121,6 +1273,7 @@ def get_sos_columns_by_status(request, status):
 
 
 @api_view(['GET'])
+@conditional_get(EcoViolation)
 def get_eco_violations_by_date_range(request):
     """
     Get eco violations by date range
@@ -1137,11 +1290,85 @@ def get_eco_violations_by_date_range(request):
         end_date = parse_date(end_date)
         violations = violations.filter(timestamp__lte=end_date)
     
-    serializer = EcoViolationSerializer(violations, many=True)
-    return Response(serializer.data)
+    return stream_json_list(violations, EcoViolationSerializer)
+
+
+@api_view(['GET'])
+@conditional_get(EcoViolation)
+def get_eco_violation_heatmap(request):
+    """
+    Violation counts per mfy (or location with group_by=location) by
+    weekday and hour of day.
+    Query params: start_date, end_date (YYYY-MM-DD, inclusive), group_by, mfy
+    """
+    try:
+        start, end, group_by, mfy = parse_heatmap_params(request.GET)
+    except HeatmapError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return HttpResponse(render_heatmap(start, end, group_by, mfy), content_type='application/json')
+
+
+def _face_search_params(params):
+    """``(k, min_score)`` from request parameters"""
+    k = int(params.get('k') or 10)
+    min_score = params.get('min_score')
+    min_score = float(min_score) if min_score not in (None, '') else None
+    if not 1 <= k <= 100:
+        raise ValueError('k must be between 1 and 100')
+    return k, min_score
+
+
+def _face_matches(matches):
+    return [dict(EcoViolationSerializer(violation).data, similarity=round(score, 4)) for violation, score in matches]
+
+
+@api_view(['GET'])
+@conditional_get(EcoViolation)
+def get_similar_eco_violations(request, pk):
+    """
+    Other violations whose offender's face is most similar to this one's,
+    best first (k, min_score); organization users only search their own
+    """
+    org_id = request.session.get('organization_id')
+    violations = EcoViolation.objects.filter(organization_id=org_id) if org_id else EcoViolation.objects.all()
+    violation = get_object_or_404(violations, pk=pk)
+    try:
+        k, min_score = _face_search_params(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    vector = stored_face(violation)
+    if vector is None:
+        return Response({'error': 'This violation has no face embedding'}, status=status.HTTP_400_BAD_REQUEST)
+
+    matches = similar_violations(vector, k=k, min_score=min_score, exclude=[violation.pk], organization_id=org_id)[0]
+    return Response(_face_matches(matches))
+
+
+@api_view(['POST'])
+def search_eco_violation_faces(request):
+    """
+    Batch face search: {"embeddings": [[...], ...], "k": 10, "min_score": 0.6}
+    returns the most similar violations of every embedding, in order;
+    organization users only search their own
+    """
+    embeddings = request.data.get('embeddings')
+    if not isinstance(embeddings, list) or not embeddings:
+        return Response({'error': 'embeddings must be a non-empty list'}, status=status.HTTP_400_BAD_REQUEST)
+    if len(embeddings) > 100:
+        return Response({'error': 'At most 100 embeddings per request'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        k, min_score = _face_search_params(request.data)
+        queries = [normalize_face(embedding) for embedding in embeddings]
+    except (FaceIndexError, TypeError, ValueError) as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    results = similar_violations(
+        queries, k=k, min_score=min_score, organization_id=request.session.get('organization_id'))
+    return Response({'results': [_face_matches(matches) for matches in results]})
 
 
 @api_view(['GET'])
+@conditional_get(ConstructionSite, ConstructionMission)
 def get_construction_sites_by_status(request, status):
     """
     Get construction sites by status
@@ -1152,6 +1379,7 @@ def get_construction_sites_by_status(request, status):
 
 
 @api_view(['GET'])
+@conditional_get(Bus, Coordinate)
 def get_buses_by_status(request, status):
     """
     Get buses by status
@@ -1161,26 +1389,209 @@ def get_buses_by_status(request, status):
     return Response(serializer.data)
 
 
+@api_view(['POST'])
+def ingest_bus_telemetry(request):
+    """
+    Accept tracker readings (one object or a list): bus_id, lat, lng and
+    optionally bearing, speed, rpm, engine_temp, fuel_level, passengers and
+    a Unix timestamp. Readings update the live state in memory and are
+    written to the database in batches.
+    """
+    readings = request.data if isinstance(request.data, list) else [request.data]
+    if not readings:
+        return Response({'error': 'No readings'}, status=status.HTTP_400_BAD_REQUEST)
+    accepted, errors = get_bus_telemetry_store().ingest(readings)
+    get_eta_engine().start()
+    if not accepted:
+        return Response({'error': 'No valid readings', 'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'accepted': accepted, 'errors': errors}, status=status.HTTP_202_ACCEPTED)
+
+
 @api_view(['GET'])
+def get_buses_live(request):
+    """
+    Live positions and telemetry of all buses, served from memory
+    """
+    return HttpResponse(get_bus_telemetry_store().live_json(), content_type='application/json')
+
+
+@api_view(['GET'])
+def get_bus_eta(request, pk):
+    """
+    Next stop, delay and ETA to every remaining stop of a bus, at most one
+    ETA tick old
+    """
+    eta = get_eta_engine().eta(pk)
+    if eta is None:
+        return Response({'error': 'No ETA for this bus: no recent position on a known route'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(eta)
+
+
+@api_view(['GET'])
+def get_route_etas(request, route_number):
+    """
+    ETAs of every bus currently running on a route
+    """
+    if not BusRoute.objects.filter(route_number=route_number).exists():
+        return Response({'error': f'Route {route_number} not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(get_eta_engine().route_etas(route_number))
+
+
+@api_view(['GET'])
+def get_vehicle_track(request, vehicle_type, vehicle_id):
+    """
+    Replay the path of a bus or truck: its positions between ``start`` and
+    ``end`` (ISO 8601 or Unix time, default the last hour)
+    """
+    vehicle_type = vehicle_type.upper()
+    model = {'BUS': Bus, 'TRUCK': Truck}.get(vehicle_type)
+    if model is None:
+        return Response({'error': 'vehicle_type must be bus or truck'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        vehicle = model.objects.filter(pk=vehicle_id).first()
+    except ValidationError:
+        vehicle = None
+    if vehicle is None:
+        return Response({'error': f'{vehicle_type.title()} not found'}, status=status.HTTP_404_NOT_FOUND)
+
+    # Organization users only see their own trucks
+    org_id = request.session.get('organization_id')
+    if org_id and vehicle_type == 'TRUCK' and str(vehicle.organization_id) != org_id:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        start, end = parse_track_window(request.query_params, getattr(settings, 'TRACK_REPLAY_MAX_HOURS', 24 * 7))
+    except TrackError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    points = replay_track(vehicle_type, vehicle.pk, start, end)
+    return Response({
+        'vehicle_type': vehicle_type,
+        'vehicle_id': str(vehicle.pk),
+        'start': start,
+        'end': end,
+        'points': [{'timestamp': timestamp, 'lat': lat, 'lng': lng} for timestamp, lat, lng in points],
+    })
+
+
+@api_view(['POST'])
+def update_truck_location(request, pk):
+    """
+    Report a truck's position: updates its location and appends it to the
+    truck's track history
+    """
+    truck = get_object_or_404(Truck.objects.select_related('location'), pk=pk)
+
+    # Check if user has permission to access this truck
+    org_id = request.session.get('organization_id')
+    if org_id and str(truck.organization_id) != org_id:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+
+    try:
+        lat = float(request.data.get('lat'))
+        lng = float(request.data.get('lng'))
+        speed = request.data.get('speed')
+        speed = float(speed) if speed not in (None, '') else None
+    except (TypeError, ValueError):
+        return Response({'error': 'lat and lng are required numbers, speed a number'}, status=status.HTTP_400_BAD_REQUEST)
+    if not (-90 <= lat <= 90 and -180 <= lng <= 180):
+        return Response({'error': 'lat/lng out of range'}, status=status.HTTP_400_BAD_REQUEST)
+
+    with transaction.atomic():
+        truck.location.lat = lat
+        truck.location.lng = lng
+        truck.location.save(update_fields=['lat', 'lng'])
+        VehicleTrackPoint.objects.create(
+            vehicle_type='TRUCK', vehicle_id=truck.pk, timestamp=timezone.now(), lat=lat, lng=lng, speed=speed,
+        )
+        # The truck row itself is unchanged; its location is part of its sync and push data
+        bulk_saved(Truck, [truck])
+    return Response({'id': str(truck.pk), 'location': {'lat': lat, 'lng': lng}})
+
+
+class BusRouteListCreateView(APIView):
+    @method_decorator(conditional_get(BusRoute, BusStop))
+    def get(self, request):
+        routes = BusRoute.objects.prefetch_related('stops')
+        serializer = BusRouteSerializer(routes, many=True)
+        return Response(serializer.data)
+
+    def post(self, request):
+        serializer = BusRouteSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save()
+            return Response(serializer.data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+@api_view(['GET'])
+@conditional_get(CallRequest, CallRequestTimeline)
 def get_call_requests_by_status(request, status):
     """
     Get call requests by status
     """
-    requests = CallRequest.objects.filter(status=status)
+    requests = CallRequest.objects.filter(status=status).prefetch_related('timeline')
     serializer = CallRequestSerializer(requests, many=True)
     return Response(serializer.data)
 
 
 @api_view(['GET'])
+@conditional_get(Notification)
 def get_notifications_unread(request):
     """
-    Get unread notifications
+    Get the unread notifications of the current user, newest first
     """
-    notifications = Notification.objects.filter(read=False)
+    notifications = unread_for(request.user)
     serializer = NotificationSerializer(notifications, many=True)
     return Response(serializer.data)
 
 
+@api_view(['POST'])
+def mark_notifications_read(request):
+    """
+    Mark the current user's notifications as read in one update: those in
+    ``ids``, or all unread ones when ``ids`` is omitted
+    """
+    ids = request.data.get('ids')
+    if ids is not None and not isinstance(ids, list):
+        return Response({'error': 'ids must be a list'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        count = mark_read(request.user, ids)
+    except ValidationError:
+        return Response({'error': 'ids must be notification ids'}, status=status.HTTP_400_BAD_REQUEST)
+    return Response({'marked': count})
+
+
+@api_view(['POST'])
+def broadcast_notification(request):
+    """
+    Send a notification to every user of an organization. Repeats with the
+    same ``dedup_key`` are collapsed into the recipients' unread one.
+    """
+    organization_id = request.data.get('organization_id') or request.session.get('organization_id')
+    title = request.data.get('title')
+    message = request.data.get('message')
+    notification_type = request.data.get('type', 'INFO')
+    if not organization_id or not title or not message:
+        return Response({'error': 'organization_id, title and message are required'}, status=status.HTTP_400_BAD_REQUEST)
+    if notification_type not in dict(Notification.NOTIFICATION_TYPE_CHOICES):
+        return Response({'error': f'Invalid type: {notification_type}'}, status=status.HTTP_400_BAD_REQUEST)
+
+    # Organization users can only notify their own organization
+    org_id = request.session.get('organization_id')
+    if org_id and str(organization_id) != org_id:
+        return Response({'error': 'Permission denied'}, status=status.HTTP_403_FORBIDDEN)
+    try:
+        if not Organization.objects.filter(pk=organization_id).exists():
+            return Response({'error': 'Organization not found'}, status=status.HTTP_404_NOT_FOUND)
+    except ValidationError:
+        return Response({'error': 'Invalid organization_id'}, status=status.HTTP_400_BAD_REQUEST)
+
+    created = notify_organization(organization_id, [
+        NotificationMessage(title, message, notification_type, request.data.get('dedup_key') or None)
+    ])
+    return Response({'created': created}, status=status.HTTP_201_CREATED)
+
+
 @api_view(['POST'])
 def mark_notification_read(request, notification_id):
     """
@@ -1194,6 +1605,7 @@ def mark_notification_read(request, notification_id):
 
 
 @api_view(['GET'])
+@conditional_get(UtilityNode, Coordinate)
 def get_utility_nodes_by_type(request, utility_type):
     """
     Get utility nodes by type
@@ -1204,6 +1616,7 @@ def get_utility_nodes_by_type(request, utility_type):
 
 
 @api_view(['GET'])
+@conditional_get(UtilityNode, Coordinate)
 def get_utility_nodes_by_status(request, status):
     """
     Get utility nodes by status
@@ -1213,6 +1626,60 @@ def get_utility_nodes_by_status(request, status):
     return Response(serializer.data)
 
 
+@api_view(['GET'])
+def export_dataset(request, dataset):
+    """
+    Stream a dataset as CSV or NDJSON.
+    Query params: output (csv|ndjson), gzip, mfy, category, status, start, end
+    """
+    try:
+        return build_export_response(dataset, request.GET)
+    except ExportError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class EventStreamRenderer(BaseRenderer):
+    media_type = 'text/event-stream'
+    format = 'sse'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return data
+
+
+@api_view(['GET'])
+@renderer_classes([EventStreamRenderer, JSONRenderer])
+def event_stream(request):
+    """
+    Server-sent events with coalesced changes of waste bins, trucks,
+    IoT devices, rooms and boilers, filtered to the user's organization
+    """
+    subscription = broker.subscribe(request.session.get('organization_id'))
+    if isinstance(request._request, ASGIRequest):
+        # Wait on the event loop instead of holding a thread per client
+        stream = aiter_event_stream(subscription)
+    else:
+        stream = iter_event_stream(subscription)
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # don't let nginx buffer the stream
+    return response
+
+
+@api_view(['GET'])
+def sync_changes(request):
+    """
+    Delta sync: objects changed and ids deleted since the client's token.
+    Query params: since (next_token of the previous sync, 0 for everything),
+    models (comma separated, default all), limit
+    """
+    try:
+        data = changes_since(request.query_params, request.session.get('organization_id'), {'request': request},
+                             user=request.user)
+    except SyncError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
+
+
 # Search functionality
 @api_view(['GET'])
 def search_entities(request):
@@ -1274,6 +1741,7 @@ def trigger_waste_bin_analysis(request):
 # Custom views for specific functionality
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(WasteBin, Truck)
 def dashboard_stats(request):
     """
     Get dashboard statistics
@@ -1305,25 +1773,17 @@ def dashboard_stats(request):
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
+@conditional_get(Organization)
 def get_user_organizations(request):
     """
     Get organizations for the logged-in user
     """
-    org_id = request.session.get('organization_id')
-    
-    if org_id:
-        # Return only the user's organization
-        org = Organization.objects.get(id=org_id)
-        serializer = OrganizationSerializer(org)
-        return Response([serializer.data])
-    else:
-        # For superadmin, return all organizations
-        organizations = Organization.objects.all()
-        serializer = OrganizationSerializer(organizations, many=True)
-        return Response(serializer.data)
+    # Organization users get only their organization, superadmin gets all
+    return reference_response('organizations', request.session.get('organization_id'))
 
 
 class ConstructionMissionListCreateView(APIView):
+    @method_decorator(conditional_get(ConstructionMission))
     def get(self, request):
         missions = ConstructionMission.objects.all()
         serializer = ConstructionMissionSerializer(missions, many=True)
@@ -1338,6 +1798,7 @@ class ConstructionMissionListCreateView(APIView):
 
 
 class ConstructionMissionDetailView(APIView):
+    @method_decorator(conditional_get(ConstructionMission))
     def get(self, request, pk):
         mission = get_object_or_404(ConstructionMission, pk=pk)
         serializer = ConstructionMissionSerializer(mission)
@@ -1358,10 +1819,9 @@ class ConstructionMissionDetailView(APIView):
 
 
 class LightROIListCreateView(APIView):
+    @method_decorator(conditional_get(LightROI))
     def get(self, request):
-        rois = LightROI.objects.all()
-        serializer = LightROISerializer(rois, many=True)
-        return Response(serializer.data)
+        return reference_response('light-rois')
     
     def post(self, request):
         serializer = LightROISerializer(data=request.data)
@@ -1372,6 +1832,7 @@ class LightROIListCreateView(APIView):
 
 
 class LightROIDetailView(APIView):
+    @method_decorator(conditional_get(LightROI))
     def get(self, request, pk):
         roi = get_object_or_404(LightROI, pk=pk)
         serializer = LightROISerializer(roi)
@@ -1392,10 +1853,9 @@ class LightROIDetailView(APIView):
 
 
 class ResponsibleOrgListCreateView(APIView):
+    @method_decorator(conditional_get(ResponsibleOrg))
     def get(self, request):
-        orgs = ResponsibleOrg.objects.all()
-        serializer = ResponsibleOrgSerializer(orgs, many=True)
-        return Response(serializer.data)
+        return reference_response('responsible-orgs')
     
     def post(self, request):
         serializer = ResponsibleOrgSerializer(data=request.data)
@@ -1406,6 +1866,7 @@ class ResponsibleOrgListCreateView(APIView):
 
 
 class ResponsibleOrgDetailView(APIView):
+    @method_decorator(conditional_get(ResponsibleOrg))
     def get(self, request, pk):
         org = get_object_or_404(ResponsibleOrg, pk=pk)
         serializer = ResponsibleOrgSerializer(org)
@@ -1426,6 +1887,7 @@ class ResponsibleOrgDetailView(APIView):
 
 
 class CallRequestTimelineListCreateView(APIView):
+    @method_decorator(conditional_get(CallRequestTimeline))
     def get(self, request):
         timelines = CallRequestTimeline.objects.all()
         serializer = CallRequestTimelineSerializer(timelines, many=True)
@@ -1440,6 +1902,7 @@ class CallRequestTimelineListCreateView(APIView):
 
 
 class CallRequestTimelineDetailView(APIView):
+    @method_decorator(conditional_get(CallRequestTimeline))
     def get(self, request, pk):
         timeline = get_object_or_404(CallRequestTimeline, pk=pk)
         serializer = CallRequestTimelineSerializer(timeline)
@@ -1460,6 +1923,7 @@ class CallRequestTimelineDetailView(APIView):
 
 
 class NotificationListCreateView(APIView):
+    @method_decorator(conditional_get(Notification))
     def get(self, request):
         notifications = Notification.objects.all()
         serializer = NotificationSerializer(notifications, many=True)
@@ -1474,6 +1938,7 @@ class NotificationListCreateView(APIView):
 
 
 class NotificationDetailView(APIView):
+    @method_decorator(conditional_get(Notification))
     def get(self, request, pk):
         notification = get_object_or_404(Notification, pk=pk)
         serializer = NotificationSerializer(notification)
@@ -1494,10 +1959,10 @@ class NotificationDetailView(APIView):
 
 
 class ReportEntryListCreateView(APIView):
+    @method_decorator(conditional_get(ReportEntry))
     def get(self, request):
         entries = ReportEntry.objects.all()
-        serializer = ReportEntrySerializer(entries, many=True)
-        return Response(serializer.data)
+        return stream_json_list(entries, ReportEntrySerializer)
     
     def post(self, request):
         serializer = ReportEntrySerializer(data=request.data)
@@ -1507,7 +1972,25 @@ class ReportEntryListCreateView(APIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
+@api_view(['GET'])
+@conditional_get(ReportEntry)
+def get_report_entry_aggregates(request):
+    """
+    Slice the pre-computed ReportEntry cube.
+    Query params: start, end (YYYY-MM-DD), mfy, category, status,
+    group_by (comma separated subset of day,mfy,category,status)
+    """
+    try:
+        result = slice_aggregates(request.GET)
+    except ValueError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    if isinstance(result, dict):
+        return Response(result)
+    return Response(list(result))
+
+
 class ReportEntryDetailView(APIView):
+    @method_decorator(conditional_get(ReportEntry))
     def get(self, request, pk):
         entry = get_object_or_404(ReportEntry, pk=pk)
         serializer = ReportEntrySerializer(entry)
@@ -1528,6 +2011,7 @@ class ReportEntryDetailView(APIView):
 
 
 class UtilityNodeListCreateView(APIView):
+    @method_decorator(conditional_get(UtilityNode, Coordinate))
     def get(self, request):
         # Get the user's organization if available
         org_id = request.session.get('organization_id')
@@ -1558,6 +2042,7 @@ class UtilityNodeListCreateView(APIView):
 
 
 class UtilityNodeDetailView(APIView):
+    @method_decorator(conditional_get(UtilityNode, Coordinate))
     def get(self, request, pk):
         node = get_object_or_404(UtilityNode, pk=pk)
         serializer = UtilityNodeSerializer(node)
@@ -1607,26 +2092,19 @@ def update_bin_with_camera_image(request, pk):
         # But we can enhance this to use AI analysis
         try:
             # Attempt to download and analyze the image with AI
-            import requests as req
             import base64
-            from io import BytesIO
             
             # Download image from URL
-            response = req.get(image_data)
+            response = requests.get(image_data, timeout=IMAGE_DOWNLOAD_TIMEOUT)
             if response.status_code == 200:
                 # Convert image to base64 for AI analysis
-                image_bytes = BytesIO(response.content).read()
-                image_base64 = base64.b64encode(image_bytes).decode('utf-8')
+                image_base64 = base64.b64encode(response.content).decode('utf-8')
                 
                 # Call backend AI service to analyze the image
                 ai_result = analyze_bin_image_backend(image_base64)
                 
-                # Update bin status based on AI analysis
-                bin.fill_level = ai_result['fillLevel']
-                bin.is_full = ai_result['isFull']
-                
-                # Update last analysis with AI results
-                bin.last_analysis = f"AI tahlili: {ai_result['notes']}, IsFull: {ai_result['isFull']}, FillLevel: {ai_result['fillLevel']}%, Conf: {ai_result['confidence']}%"
+                # Update bin status and last analysis based on AI analysis
+                apply_analysis(bin, ai_result)
                 
         except Exception as e:
             # If AI analysis fails, log the error but continue with existing values
@@ -1642,132 +2120,18 @@ def analyze_bin_image_backend(base64_image):
     """
     Backend function to analyze waste bin image using Google AI API
     """
-    import os
-    import requests
-    import json
-    
-    # Get API key from environment or use default
-    api_key = os.getenv('GEMINI_API_KEY', 'YOUR_API_KEY_HERE')
-    if api_key == 'YOUR_API_KEY_HERE':
-        # If no API key is set, return a basic response
-        return {
-            'isFull': True,
-            'fillLevel': 90,
-            'confidence': 70,
-            'notes': 'API kaliti ornatilmagan, oddiy tahlil amalga oshirildi'
-        }
-    
-    # Prepare the request to Google AI
-    ai_url = f'https://generativelanguage.googleapis.com/v1beta/models/gemini-pro-vision:generateContent?key={api_key}'
-    
-    # Create detailed prompt for AI with enhanced analysis
-    prompt = '''Siz tajriboli atrof-muhitni kuzatuv tizimi ekspertisiz. Rasmni tahlil qiling va quyidagilarni aniqlang:
-    1. Rasmda chiqindi konteyneri bormi? Javob: HA yoki YO'Q.
-    2. Agar HA bo'lsa, konteyner to'la bo'limi? Javob: HA yoki YO'Q.
-    3. Agar HA bo'lsa, to'ldirish darajasini % (0-100) ko'rsating.
-    4. Rasm sifatini baholang (yaxshi, o'rtacha, yomon).
-
-    Javobni quyidagi JSON formatda bering:
-    {
-        "isFull": boolean,
-        "fillLevel": number (0 dan 100 gacha foiz),
-        "confidence": number (O'z qaroringga ishonch darajasi 0-100),
-        "notes": string (Qisqa izoh o'zbek tilida: Masalan "Konteyner toshib ketgan" yoki "Yarmi bo'sh")
-    }
-    '''
-    
-    ai_headers = {
-        'Content-Type': 'application/json',
-    }
-    
-    ai_payload = {
-        'contents': [{
-            'parts': [
-                {'text': prompt},
-                {
-                    'inlineData': {
-                        'mimeType': 'image/jpeg',
-                        'data': base64_image
-                    }
-                }
-            ]
-        }]
-    }
-    
+    ai_request = build_analysis_request(base64_image)
+    if ai_request is None:
+        return no_api_key_result()
+    ai_url, ai_payload = ai_request
+
     try:
-        response = requests.post(ai_url, headers=ai_headers, data=json.dumps(ai_payload))
-        
-        if response.status_code == 200:
-            result = response.json()
-            
-            # Extract the AI response
-            if 'candidates' in result and len(result['candidates']) > 0:
-                candidate = result['candidates'][0]
-                if 'content' in candidate and 'parts' in candidate['content']:
-                    content_parts = candidate['content']['parts']
-                    for part in content_parts:
-                        if 'text' in part:
-                            # Try to parse the JSON response
-                            text_content = part['text'].strip()
-                            
-                            # Remove any markdown code block markers
-                            if text_content.startswith('```'):
-                                # Find the JSON part in the response
-                                import re
-                                json_match = re.search(r'\{.*\}', text_content, re.DOTALL)
-                                if json_match:
-                                    text_content = json_match.group()
-                                else:
-                                    # If no JSON found, return default values
-                                    return {
-                                        'isFull': True,
-                                        'fillLevel': 80,
-                                        'confidence': 60,
-                                        'notes': 'Tahlil natijasini tahlil qilishda xatolik yuz berdi'
-                                    }
-                            
-                            try:
-                                ai_result = json.loads(text_content)
-                                return {
-                                    'isFull': ai_result.get('isFull', False),
-                                    'fillLevel': ai_result.get('fillLevel', 50),
-                                    'confidence': ai_result.get('confidence', 50),
-                                    'notes': ai_result.get('notes', 'AI tahlili tugadi')
-                                }
-                            except json.JSONDecodeError:
-                                # If JSON parsing fails, return default values
-                                return {
-                                    'isFull': True,
-                                    'fillLevel': 75,
-                                    'confidence': 50,
-                                    'notes': 'JSON javobini tahlil qilishda xatolik yuz berdi'
-                                }
-            
-            # If no candidates found, return default values
-            return {
-                'isFull': True,
-                'fillLevel': 70,
-                'confidence': 40,
-                'notes': 'AI javob topilmadi'
-            }
-        else:
-            # If API call fails, return default values
-            print(f"AI API request failed: {response.status_code}, {response.text}")
-            return {
-                'isFull': True,
-                'fillLevel': 60,
-                'confidence': 30,
-                'notes': f'AI tahlilida xatolik: {response.status_code}'
-            }
+        response = requests.post(ai_url, headers=AI_HEADERS, data=json.dumps(ai_payload), timeout=AI_REQUEST_TIMEOUT)
+        body = response.json() if response.status_code == 200 else {}
+        return parse_analysis_response(response.status_code, body, response.text)
     except Exception as e:
         # If any error occurs, return default values
-        print(f"AI analysis error: {e}")
-        return {
-            'isFull': True,
-            'fillLevel': 50,
-            'confidence': 25,
-            'notes': f'AI tahlilida xatolik yuz berdi: {str(e)}'
-        }
+        return error_result(e)
 
 
 @api_view(['POST'])
@@ -1780,7 +2144,7 @@ def update_iot_sensor_data(request):
         device_id = request.data.get('device_id')
         temperature = request.data.get('temperature')
         humidity = request.data.get('humidity')
-        sleep_seconds = request.data.get('sleep_seconds', 2000)
+        sleep_seconds = request.data.get('sleep_seconds')
         timestamp = request.data.get('timestamp', int(timezone.now().timestamp()))
         
         if not device_id:
@@ -1788,30 +2152,41 @@ def update_iot_sensor_data(request):
         
         # Find the IoT device by device_id
         try:
-            iot_device = IoTDevice.objects.get(device_id=device_id)
+            iot_device = IoTDevice.objects.select_related('room', 'boiler').get(device_id=device_id)
         except IoTDevice.DoesNotExist:
             return Response({'error': f'Device with ID {device_id} not found'}, status=status.HTTP_404_NOT_FOUND)
-        
-        # Update device's last seen time and sensor readings
-        iot_device.last_seen = timezone.now()
-        iot_device.current_temperature = temperature
-        iot_device.current_humidity = humidity
-        iot_device.last_sensor_update = timezone.now()
-        iot_device.save()
-        
-        # Update associated room or boiler if available
-        if iot_device.room:
-            iot_device.room.temperature = temperature or iot_device.room.temperature
-            if humidity is not None:
-                iot_device.room.humidity = humidity
-            iot_device.room.last_updated = timezone.now()
-            iot_device.room.save()
-        elif iot_device.boiler:
-            iot_device.boiler.temperature = temperature or iot_device.boiler.temperature
-            if humidity is not None:
-                iot_device.boiler.humidity = humidity
-            iot_device.boiler.last_updated = timezone.now()
-            iot_device.boiler.save()
+
+        try:
+            # Devices that do not announce it keep their last known interval
+            sleep_seconds = int(sleep_seconds) if sleep_seconds not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({'error': 'sleep_seconds must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        max_interval = getattr(settings, 'LIVENESS_MAX_INTERVAL', 7 * 24 * 3600)
+        if sleep_seconds is not None and not 1 <= sleep_seconds <= max_interval:
+            return Response({'error': f'sleep_seconds must be between 1 and {max_interval}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        # Readings are buffered and written later, so they are checked here
+        readings = {}
+        for name, value in (('temperature', temperature), ('humidity', humidity)):
+            if value in (None, ''):
+                readings[name] = None
+                continue
+            try:
+                readings[name] = float(value)
+            except (TypeError, ValueError):
+                readings[name] = None
+            if readings[name] is None or not math.isfinite(readings[name]):
+                return Response({'error': f'{name} must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+        temperature, humidity = readings['temperature'], readings['humidity']
+        
+        # Update device's last seen time and sensor readings, and the associated
+        # room or boiler if available (coalesced and written in the background)
+        record_reading(iot_device, temperature, humidity)
+        # Derive the room or boiler status from the reading
+        check_reading(iot_device, temperature, humidity)
+        # The device is online until it misses its next report
+        record_report(iot_device, sleep_seconds)
         
         return Response({
             'message': 'Sensor data updated successfully',
@@ -0,0 +1,19 @@
+"""
+ASGI config for smartcity_backend project.
+
+It exposes the ASGI callable as a module-level variable named ``application``.
+Serve it with an ASGI server, e.g.::
+
+    uvicorn smartcity_backend.asgi:application --host 0.0.0.0 --port 8000
+
+For more information on this file, see
+https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
+"""
+
+import os
+
+from django.core.asgi import get_asgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'smartcity_backend.settings')
+
+application = get_asgi_application()
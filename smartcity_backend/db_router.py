@@ -0,0 +1,125 @@
+"""
+Primary / read-replica database routing.
+
+Reads issued while serving a safe (GET/HEAD/OPTIONS) request go to a
+replica picked at random once per request; everything else - writes, reads during unsafe
+requests, background threads and management commands - uses the primary.
+
+After a client performs a write, ``PrimaryPinningMiddleware`` sets a
+short-lived cookie so that client's following reads also hit the primary
+(read-your-writes) until the replicas have had time to catch up.
+
+Streamed bodies are produced after the middleware has returned, so their
+iteration is wrapped to read from the request's alias as well.
+"""
+
+import contextvars
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# Replica alias the current request reads from, None means the primary
+_read_alias = contextvars.ContextVar('read_alias', default=None)
+
+STICKY_COOKIE_NAME = 'db_primary_until'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+def replica_aliases():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def pin_to_primary():
+    """Route the remaining reads of the current request to the primary"""
+    _read_alias.set(None)
+
+
+class PrimaryReplicaRouter:
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        # Anything read after a write in the same request must see that write
+        pin_to_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Replicas hold the same data as the primary
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replicas receive schema changes through replication
+        if db in replica_aliases():
+            return False
+        return None
+
+
+def _iterate_with_alias(alias, content):
+    # Each step runs with the request's alias; steps may run in different contexts
+    iterator = iter(content)
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+async def _aiterate_with_alias(alias, content):
+    iterator = content.__aiter__()
+    while True:
+        token = _read_alias.set(alias)
+        try:
+            chunk = await iterator.__anext__()
+        except StopAsyncIteration:
+            return
+        finally:
+            _read_alias.reset(token)
+        yield chunk
+
+
+class PrimaryPinningMiddleware:
+    """
+    Decide per request whether reads may go to a replica, and keep clients
+    that just wrote something pinned to the primary for DATABASE_STICKY_SECONDS.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        sticky_until = request.COOKIES.get(STICKY_COOKIE_NAME)
+        try:
+            sticky = sticky_until is not None and float(sticky_until) > time.time()
+        except ValueError:
+            sticky = False
+
+        replicas = replica_aliases()
+        use_replica = replicas and request.method in SAFE_METHODS and not sticky
+        token = _read_alias.set(random.choice(replicas) if use_replica else None)
+        try:
+            response = self.get_response(request)
+            # A write during the view pins the rest of the request, body included
+            alias = _read_alias.get()
+        finally:
+            _read_alias.reset(token)
+
+        if response.streaming and alias:
+            if getattr(response, 'is_async', False):
+                response.streaming_content = _aiterate_with_alias(alias, response.streaming_content)
+            else:
+                response.streaming_content = _iterate_with_alias(alias, response.streaming_content)
+
+        if request.method not in SAFE_METHODS and replicas:
+            seconds = getattr(settings, 'DATABASE_STICKY_SECONDS', 10)
+            response.set_cookie(
+                STICKY_COOKIE_NAME, str(time.time() + seconds),
+                max_age=seconds, httponly=True, samesite='Lax',
+            )
+        return response
@@ -48,6 +48,7 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'smartcity_backend.db_router.PrimaryPinningMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -76,18 +77,82 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'smartcity_backend.wsgi.application'
+ASGI_APPLICATION = 'smartcity_backend.asgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# SQLITE_TUNING=0 falls back to the stock sqlite3 backend with default pragmas
+SQLITE_TUNING = os.environ.get('SQLITE_TUNING', '1') == '1'
+
 DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Keep connections open between requests instead of reconnecting each time
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
     }
 }
 
+# DB_ENGINE=postgresql switches the primary to PostgreSQL; the SQLite file stays
+# reachable as 'sqlite_legacy' for the migrate_sqlite_to_postgres command
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES['sqlite_legacy'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('SQLITE_LEGACY_PATH', str(BASE_DIR / 'db.sqlite3')),
+    }
+    DATABASES['default'] = {
+        'ENGINE': 'django.db.backends.postgresql',
+        'NAME': os.environ.get('DB_NAME', 'smartcity'),
+        'USER': os.environ.get('DB_USER', 'smartcity'),
+        'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+        'HOST': os.environ.get('DB_HOST', 'localhost'),
+        'PORT': os.environ.get('DB_PORT', '5432'),
+        'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', '60')),
+        'CONN_HEALTH_CHECKS': True,
+    }
+elif SQLITE_TUNING:
+    SQLITE_JOURNAL_MODE = os.environ.get('SQLITE_JOURNAL_MODE', '')
+    DATABASES['default']['ENGINE'] = 'smartcity_backend.sqlite_tuned'
+    DATABASES['default']['OPTIONS'] = {
+        'pragmas': {
+            # NORMAL is only durable on power loss with WAL; the rollback journal needs FULL
+            'synchronous': os.environ.get(
+                'SQLITE_SYNCHRONOUS', 'NORMAL' if SQLITE_JOURNAL_MODE.upper() == 'WAL' else 'FULL'),
+            'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', '5000')),
+            'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', str(256 * 1024 * 1024))),
+            'cache_size': int(os.environ.get('SQLITE_CACHE_SIZE', '-20000')),  # negative = KiB, i.e. ~20 MB
+        },
+        'transaction_mode': os.environ.get('SQLITE_TRANSACTION_MODE', ''),
+    }
+    # Opt-in for servers: journal_mode=WAL is persistent (it rewrites the database
+    # file, even from manage.py check), and IMMEDIATE makes every atomic() block,
+    # read-only ones included, take the write lock. Recommended for a deployed
+    # server: SQLITE_JOURNAL_MODE=WAL SQLITE_TRANSACTION_MODE=IMMEDIATE
+    if SQLITE_JOURNAL_MODE:
+        DATABASES['default']['OPTIONS']['pragmas']['journal_mode'] = SQLITE_JOURNAL_MODE
+
+# Read replicas: DB_REPLICA_HOSTS=host1,host2 (PostgreSQL, same credentials as the
+# primary) or DB_REPLICA_SQLITE_PATHS=/path/a.sqlite3,... for local testing
+DATABASE_REPLICAS = []
+for host in filter(None, os.environ.get('DB_REPLICA_HOSTS', '').split(',')):
+    alias = f'replica_{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'HOST': host, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+for path in filter(None, os.environ.get('DB_REPLICA_SQLITE_PATHS', '').split(',')):
+    alias = f'replica_{len(DATABASE_REPLICAS) + 1}'
+    DATABASES[alias] = {**DATABASES['default'], 'NAME': path, 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['smartcity_backend.db_router.PrimaryReplicaRouter']
+
+# Seconds a client stays pinned to the primary after a write (read-your-writes)
+DATABASE_STICKY_SECONDS = int(os.environ.get('DB_STICKY_SECONDS', '10'))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -147,6 +212,121 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 20
 }
 
+# Real-time push channel: changes are coalesced per entity within one tick
+EVENT_STREAM_TICK_SECONDS = float(os.environ.get('EVENT_STREAM_TICK_SECONDS', '1.0'))
+# Streams are closed after this long; EventSource clients reconnect automatically
+EVENT_STREAM_MAX_SECONDS = float(os.environ.get('EVENT_STREAM_MAX_SECONDS', '300'))
+
+# Cache (pre-rendered reference data). Set REDIS_URL to share it between
+# worker processes (needs the redis package); defaults to a per-process cache
+if os.environ.get('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ['REDIS_URL'],
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'smartcity',
+        }
+    }
+REFERENCE_CACHE_TIMEOUT = int(os.environ.get('REFERENCE_CACHE_TIMEOUT', str(24 * 60 * 60)))
+# Warm-up runs in the background on the first request each server process handles
+REFERENCE_CACHE_WARM_ON_STARTUP = os.environ.get('REFERENCE_CACHE_WARM_ON_STARTUP', 'True').lower() in ('1', 'true', 'yes')
+
+# IoT write-behind: sensor updates are coalesced in memory and written every
+# IOT_WRITE_BEHIND_INTERVAL seconds (0 = write through), see smartcity_app/iot_buffer.py
+IOT_WRITE_BEHIND_INTERVAL = float(os.environ.get('IOT_WRITE_BEHIND_INTERVAL', '5'))
+IOT_WRITE_BEHIND_MAX_PENDING = int(os.environ.get('IOT_WRITE_BEHIND_MAX_PENDING', '500'))
+IOT_WRITE_BEHIND_LOG_DIR = os.environ.get('IOT_WRITE_BEHIND_LOG_DIR', str(BASE_DIR / 'iot_buffer'))
+IOT_WRITE_BEHIND_FSYNC = os.environ.get('IOT_WRITE_BEHIND_FSYNC', 'False').lower() in ('1', 'true', 'yes')
+
+# Device liveness: a device is offline once it misses its next report by
+# sleep_seconds * LIVENESS_GRACE_FACTOR + LIVENESS_GRACE_SECONDS, see smartcity_app/liveness.py
+LIVENESS_GRACE_FACTOR = float(os.environ.get('LIVENESS_GRACE_FACTOR', '1.5'))
+LIVENESS_GRACE_SECONDS = int(os.environ.get('LIVENESS_GRACE_SECONDS', '120'))
+LIVENESS_DEFAULT_INTERVAL = int(os.environ.get('LIVENESS_DEFAULT_INTERVAL', '2000'))
+# Largest sleep_seconds a device may announce (a week)
+LIVENESS_MAX_INTERVAL = int(os.environ.get('LIVENESS_MAX_INTERVAL', str(7 * 24 * 3600)))
+LIVENESS_TICK_SECONDS = float(os.environ.get('LIVENESS_TICK_SECONDS', '30'))
+
+# Room/Boiler alert rules applied to every sensor reading, see smartcity_app/alerting.py
+ALERT_HUMIDITY_WARNING_DELTA = float(os.environ.get('ALERT_HUMIDITY_WARNING_DELTA', '10'))
+ALERT_HUMIDITY_CRITICAL_DELTA = float(os.environ.get('ALERT_HUMIDITY_CRITICAL_DELTA', '20'))
+ALERT_HYSTERESIS = float(os.environ.get('ALERT_HYSTERESIS', '2'))
+ALERT_ZSCORE = float(os.environ.get('ALERT_ZSCORE', '3'))
+ALERT_MIN_SAMPLES = int(os.environ.get('ALERT_MIN_SAMPLES', '10'))
+ALERT_EWMA_ALPHA = float(os.environ.get('ALERT_EWMA_ALPHA', '0.1'))
+# Largest normal change per minute (humidity points, degrees)
+ALERT_MAX_RATE = {
+    'humidity': float(os.environ.get('ALERT_MAX_HUMIDITY_RATE', '5')),
+    'temperature': float(os.environ.get('ALERT_MAX_TEMPERATURE_RATE', '2')),
+}
+
+# Unread notifications with the same dedup_key newer than this are updated instead of repeated
+NOTIFICATION_COLLAPSE_SECONDS = int(os.environ.get('NOTIFICATION_COLLAPSE_SECONDS', '600'))
+
+# Live bus state is kept in memory and persisted (with the track history) every
+# BUS_TELEMETRY_FLUSH_SECONDS, see smartcity_app/bus_telemetry.py
+BUS_TELEMETRY_FLUSH_SECONDS = float(os.environ.get('BUS_TELEMETRY_FLUSH_SECONDS', '5'))
+
+# Bus ETA and delay estimation, see smartcity_app/bus_eta.py
+BUS_ETA_TICK_SECONDS = float(os.environ.get('BUS_ETA_TICK_SECONDS', '30'))
+BUS_DELAY_SECONDS = float(os.environ.get('BUS_DELAY_SECONDS', '180'))
+BUS_OFF_ROUTE_METERS = float(os.environ.get('BUS_OFF_ROUTE_METERS', '300'))
+BUS_ETA_STALE_SECONDS = float(os.environ.get('BUS_ETA_STALE_SECONDS', '300'))
+BUS_DEFAULT_SPEED_KMH = float(os.environ.get('BUS_DEFAULT_SPEED_KMH', '20'))
+BUS_STOP_RADIUS_METERS = float(os.environ.get('BUS_STOP_RADIUS_METERS', '50'))
+
+# Vehicle track compression (compact_tracks command), see smartcity_app/track_store.py
+TRACK_SIMPLIFY_METERS = float(os.environ.get('TRACK_SIMPLIFY_METERS', '5'))
+TRACK_REPLAY_MAX_HOURS = int(os.environ.get('TRACK_REPLAY_MAX_HOURS', str(24 * 7)))
+
+# Call request triage: new requests are classified, summarized and given
+# keywords in batches by CALL_TRIAGE_MODEL, see smartcity_app/triage.py
+CALL_TRIAGE_MODEL = os.environ.get('CALL_TRIAGE_MODEL', 'smartcity_app.triage.KeywordModel')
+CALL_TRIAGE_BATCH_SIZE = int(os.environ.get('CALL_TRIAGE_BATCH_SIZE', '64'))
+CALL_TRIAGE_INTERVAL_SECONDS = float(os.environ.get('CALL_TRIAGE_INTERVAL_SECONDS', '2'))
+
+# New requests similar to an open one of the same mfy/address from the last
+# CALL_DEDUP_WINDOW_HOURS are linked to it as duplicates, see smartcity_app/dedup.py
+CALL_DEDUP_ENABLED = os.environ.get('CALL_DEDUP_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+CALL_DEDUP_THRESHOLD = float(os.environ.get('CALL_DEDUP_THRESHOLD', '0.5'))
+CALL_DEDUP_WINDOW_HOURS = float(os.environ.get('CALL_DEDUP_WINDOW_HOURS', '72'))
+
+# Triaged requests are dispatched to the least-loaded ResponsibleOrg of their
+# category, nearest first within CALL_DISPATCH_LOAD_SLACK requests per brigade,
+# see smartcity_app/dispatch.py
+CALL_DISPATCH_ENABLED = os.environ.get('CALL_DISPATCH_ENABLED', 'True').lower() in ('1', 'true', 'yes')
+CALL_DISPATCH_BATCH_SIZE = int(os.environ.get('CALL_DISPATCH_BATCH_SIZE', '200'))
+CALL_DISPATCH_LOAD_SLACK = float(os.environ.get('CALL_DISPATCH_LOAD_SLACK', '0.5'))
+# Organizations further away than this only get a request nobody closer can take (0 = no limit)
+CALL_DISPATCH_MAX_DISTANCE_KM = float(os.environ.get('CALL_DISPATCH_MAX_DISTANCE_KM', '0'))
+
+# Face embeddings of eco violations, searched by cosine similarity in memory;
+# IVF partitioning is used from FACE_IVF_MIN_SIZE faces when FACE_IVF_LISTS > 0,
+# see smartcity_app/face_index.py
+FACE_EMBEDDING_DIM = int(os.environ.get('FACE_EMBEDDING_DIM', '128'))
+FACE_MATCH_THRESHOLD = float(os.environ.get('FACE_MATCH_THRESHOLD', '0.6'))
+FACE_IVF_LISTS = int(os.environ.get('FACE_IVF_LISTS', '0'))
+FACE_IVF_MIN_SIZE = int(os.environ.get('FACE_IVF_MIN_SIZE', '50000'))
+FACE_IVF_PROBES = int(os.environ.get('FACE_IVF_PROBES', '8'))
+# Matches fetched per wanted one, since deleted violations and those of other
+# organizations are dropped afterwards
+FACE_SCOPE_OVERSAMPLE = int(os.environ.get('FACE_SCOPE_OVERSAMPLE', '4'))
+
+# Eco violation heatmaps are cached per range until a violation changes or
+# ECO_HEATMAP_CACHE_TIMEOUT seconds pass, see smartcity_app/heatmap.py
+ECO_HEATMAP_CACHE_TIMEOUT = int(os.environ.get('ECO_HEATMAP_CACHE_TIMEOUT', str(60 * 60)))
+
+# Construction mission delay prediction from the pace of each site's stages,
+# see smartcity_app/construction.py
+CONSTRUCTION_DEFAULT_STAGE_DAYS = float(os.environ.get('CONSTRUCTION_DEFAULT_STAGE_DAYS', '30'))
+CONSTRUCTION_DELAY_GRACE_DAYS = float(os.environ.get('CONSTRUCTION_DELAY_GRACE_DAYS', '3'))
+
 # CORS settings
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
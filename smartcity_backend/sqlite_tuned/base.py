@@ -0,0 +1,46 @@
+"""
+SQLite backend with production pragmas.
+
+Extends Django's sqlite3 backend so every new connection applies the
+pragmas listed in ``OPTIONS['pragmas']`` (WAL journaling, synchronous
+level, busy timeout, mmap and page cache size), and optionally opens
+transactions with ``BEGIN IMMEDIATE`` via ``OPTIONS['transaction_mode']``
+so writers queue on the busy timeout instead of failing with
+"database is locked" when a read transaction tries to upgrade.
+"""
+
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def _tuning_options(self):
+        options = self.settings_dict.get('OPTIONS', {})
+        pragmas = options.get('pragmas', {})
+        transaction_mode = options.get('transaction_mode')
+        if transaction_mode and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ValueError(f"Unsupported transaction_mode {transaction_mode!r}, expected one of {TRANSACTION_MODES}")
+        return pragmas, transaction_mode
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        # These are ours, sqlite3.connect() doesn't know them
+        kwargs.pop('pragmas', None)
+        kwargs.pop('transaction_mode', None)
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas, _ = self._tuning_options()
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        _, transaction_mode = self._tuning_options()
+        if transaction_mode:
+            self.cursor().execute(f'BEGIN {transaction_mode.upper()}')
+        else:
+            super()._start_transaction_under_autocommit()
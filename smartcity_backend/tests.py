@@ -0,0 +1,111 @@
+"""
+Tests of the primary / read-replica routing (db_router.py).
+
+The test database is the primary; a second SQLite file is registered as
+the replica. Both hold a ModelVersion row with the same label but a
+different version, so a read shows which database served it.
+"""
+
+import os
+import shutil
+import tempfile
+
+from django.db import connections
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+
+from smartcity_app.models import ModelVersion
+from smartcity_backend.db_router import STICKY_COOKIE_NAME, PrimaryPinningMiddleware
+
+REPLICA = 'replica_test'
+LABEL = 'router-test'
+PRIMARY_VERSION = 1
+REPLICA_VERSION = 2
+
+
+def read_version():
+    return ModelVersion.objects.get(model=LABEL).version
+
+
+def read_view(request):
+    return HttpResponse(str(read_version()))
+
+
+def write_then_read_view(request):
+    ModelVersion.objects.filter(model=LABEL).update(updated_at=ModelVersion.objects.get(model=LABEL).updated_at)
+    return HttpResponse(str(read_version()))
+
+
+def streaming_view(request):
+    return StreamingHttpResponse(str(read_version()) for _ in range(1))
+
+
+@override_settings(DATABASE_REPLICAS=[REPLICA])
+class PrimaryReplicaRoutingTests(SimpleTestCase):
+    # The replica is registered in setUpClass, after the runner set up its databases
+    databases = '__all__'
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        connections.settings[REPLICA] = {
+            **connections.settings['default'],
+            'NAME': os.path.join(cls.tmp, 'replica.sqlite3'),
+            'TEST': {},
+        }
+        with connections[REPLICA].schema_editor() as editor:
+            editor.create_model(ModelVersion)
+        ModelVersion.objects.using(REPLICA).create(model=LABEL, version=REPLICA_VERSION)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        connections[REPLICA].close()
+        del connections[REPLICA]
+        del connections.settings[REPLICA]
+        shutil.rmtree(cls.tmp)
+
+    def setUp(self):
+        ModelVersion.objects.using('default').create(model=LABEL, version=PRIMARY_VERSION)
+        self.addCleanup(ModelVersion.objects.using('default').filter(model=LABEL).delete)
+        self.factory = RequestFactory()
+
+    def serve(self, view, request):
+        response = PrimaryPinningMiddleware(view)(request)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, int(body)
+
+    def test_safe_request_reads_from_replica(self):
+        _, version = self.serve(read_view, self.factory.get('/'))
+        self.assertEqual(version, REPLICA_VERSION)
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(read_version(), PRIMARY_VERSION)
+
+    def test_unsafe_request_reads_from_primary(self):
+        _, version = self.serve(read_view, self.factory.post('/'))
+        self.assertEqual(version, PRIMARY_VERSION)
+
+    def test_read_after_write_is_pinned_to_primary(self):
+        _, version = self.serve(write_then_read_view, self.factory.get('/'))
+        self.assertEqual(version, PRIMARY_VERSION)
+
+    def test_sticky_cookie_pins_next_request(self):
+        response, _ = self.serve(read_view, self.factory.post('/'))
+        cookie = response.cookies[STICKY_COOKIE_NAME].value
+
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE_NAME] = cookie
+        _, version = self.serve(read_view, request)
+        self.assertEqual(version, PRIMARY_VERSION)
+
+    def test_expired_cookie_reads_from_replica(self):
+        request = self.factory.get('/')
+        request.COOKIES[STICKY_COOKIE_NAME] = '0'
+        _, version = self.serve(read_view, request)
+        self.assertEqual(version, REPLICA_VERSION)
+
+    def test_streamed_body_reads_from_replica(self):
+        _, version = self.serve(streaming_view, self.factory.get('/'))
+        self.assertEqual(version, REPLICA_VERSION)